@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ЗАПОЛНЕНИЕ MEDIA_FILE_ID У ПОСТОВ КАТАЛОГА
+Лента отправляет карточку без media_file_id текстом со ссылкой на пост и
+медиа по ссылке не запрашивает. Скрипт один раз разрешает ссылки t.me
+таких постов через catalog_media (кэш catalog_media_cache, пересылка в
+группу модерации только для промахов) и записывает file_id в сам пост.
+
+Запущенный бот подхватит новые file_id, когда истечёт кэш карточек
+(5 минут). Посты без медиа в исходном сообщении остаются текстовыми.
+
+Использование:
+    python backfill_catalog_media.py [--batch-size N] [--limit N]
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+from typing import Dict
+from sqlalchemy import select, update, and_
+from telegram import Bot
+from config import Config
+from services.db import db
+from services.catalog_media import catalog_media
+from models import CatalogPost
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def backfill_post_media(bot: Bot, batch_size: int = 50, limit: int = 0) -> Dict[str, int]:
+    """Записать медиа по ссылке в посты без media_file_id: {'checked', 'updated'}"""
+    stats = {'checked': 0, 'updated': 0}
+    last_id = 0
+
+    while not limit or stats['checked'] < limit:
+        size = min(batch_size, limit - stats['checked']) if limit else batch_size
+
+        async with db.get_session() as session:
+            rows = (await session.execute(
+                select(CatalogPost.id, CatalogPost.catalog_link)
+                .where(
+                    and_(
+                        CatalogPost.id > last_id,
+                        CatalogPost.media_file_id.is_(None),
+                        CatalogPost.catalog_link.like('%t.me/%')
+                    )
+                )
+                .order_by(CatalogPost.id)
+                .limit(size)
+            )).all()
+
+        if not rows:
+            break
+
+        last_id = rows[-1].id
+        stats['checked'] += len(rows)
+
+        resolved = await catalog_media.resolve_many(bot, [row.catalog_link for row in rows])
+
+        async with db.get_session() as session:
+            for row in rows:
+                media = resolved.get(row.catalog_link)
+                if not media or not media.get('success'):
+                    continue
+
+                await session.execute(
+                    update(CatalogPost)
+                    .where(and_(CatalogPost.id == row.id, CatalogPost.media_file_id.is_(None)))
+                    .values(
+                        media_type=media['type'],
+                        media_file_id=media['file_id'],
+                        media_group_id=media.get('media_group_id'),
+                        media_json=[media['file_id']]
+                    )
+                )
+                stats['updated'] += 1
+
+            await session.commit()
+
+        logger.info(f"  ... проверено {stats['checked']}, заполнено {stats['updated']}")
+
+    return stats
+
+
+async def main(args) -> bool:
+    try:
+        await db.init()
+
+        if not db.engine or not db.session_maker:
+            logger.error("❌ Database initialization failed")
+            return False
+
+        logger.info("🔄 Заполняю media_file_id по ссылкам постов...")
+        async with Bot(Config.BOT_TOKEN) as bot:
+            stats = await backfill_post_media(bot, args.batch_size, args.limit)
+
+        logger.info(f"✅ Проверено постов: {stats['checked']}, заполнено: {stats['updated']}")
+        logger.info(f"📊 Кэш медиа: {catalog_media.get_stats()}")
+        return True
+
+    except Exception as e:
+        logger.error(f"❌ Ошибка заполнения медиа: {e}", exc_info=True)
+        return False
+    finally:
+        await db.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Заполнение media_file_id постов каталога по ссылкам")
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--limit', type=int, default=0, help='не больше N постов (0 - все)')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    success = asyncio.run(main(parse_args()))
+    sys.exit(0 if success else 1)
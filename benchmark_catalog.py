@@ -0,0 +1,632 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+БЕНЧМАРКИ КАТАЛОГА
+Запускаются на временной SQLite-базе со сгенерированными данными
+(рабочая БД из DATABASE_URL не используется и не меняется)
+
+Использование:
+    python benchmark_catalog.py queries [--posts N] [--pages N]  - запросов к БД на страницу ленты/поиска/карточку
+    python benchmark_catalog.py viewed [--sizes N,N] [--turns N]   - просмотренные посты: JSON-список против упакованных id
+    python benchmark_catalog.py search [--posts N] [--repeat N]    - нечёткий поиск: полнота и задержка на корпусе названий
+    python benchmark_catalog.py toppeople [--posts N] [--cards N]  - рейтинг TopPeople для карточек: перебор против индекса
+    python benchmark_catalog.py delivery [--latency S] [--chats N] - отправка страницы каталога через бота с задержкой сети
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+# До импорта config: сервисы выбирают SQL по диалекту из DATABASE_URL
+_TEMP_DIR = tempfile.mkdtemp(prefix='catalog_bench_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_TEMP_DIR, 'bench.db')}"
+
+from sqlalchemy import event, insert, select, func
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from services.db import db
+from models import Base, CatalogPost, CatalogReview, CatalogSession
+from services.catalog_search import catalog_search, fuzzy_terms, trigrams, TRIGRAM_THRESHOLD
+from utils.packed_ids import pack_ids
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+REGULAR_CATEGORIES = ['Маникюр', 'Педикюр', 'Барбер', 'Массажист', 'Фотограф', 'Репетитор', 'Клининг']
+
+
+# ============= ВРЕМЕННАЯ БАЗА =============
+
+async def setup_database():
+    """Временная SQLite-база со схемой models.py для сервисов каталога"""
+    db.engine = create_async_engine(os.environ['DATABASE_URL'].replace('sqlite://', 'sqlite+aiosqlite://', 1))
+    db.session_maker = async_sessionmaker(db.engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with db.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def teardown_database():
+    await db.engine.dispose()
+    shutil.rmtree(_TEMP_DIR, ignore_errors=True)
+
+
+async def seed_posts(count: int, reviews_per_post: int = 3) -> List[int]:
+    """Посты обычных категорий с отзывами и сводкой рейтинга"""
+    rng = random.Random(1)
+    posts, reviews = [], []
+
+    for i in range(1, count + 1):
+        ratings = [rng.randint(1, 5) for _ in range(reviews_per_post)]
+        post = {
+            'id': i,
+            'user_id': i % 50,
+            'catalog_link': f'https://t.me/catalog/{i}',
+            'category': REGULAR_CATEGORIES[i % len(REGULAR_CATEGORIES)],
+            'name': f'Услуга {i}',
+            'tags': [f'тег{i % 13}'],
+            'catalog_number': i,
+            'is_active': True,
+            'rating_sum': sum(ratings),
+            'rating_count': len(ratings),
+        }
+        for star in range(1, 6):
+            post[f'rating_star_{star}'] = ratings.count(star)
+        posts.append(post)
+
+        reviews.extend(
+            {'catalog_post_id': i, 'user_id': 1000 + j, 'review_text': 'ok', 'rating': rating}
+            for j, rating in enumerate(ratings)
+        )
+
+    async with db.engine.begin() as conn:
+        await conn.execute(insert(CatalogPost), posts)
+        await conn.execute(insert(CatalogReview), reviews)
+
+    return [post['id'] for post in posts]
+
+
+# ============= СЧЁТЧИК ЗАПРОСОВ =============
+
+class QueryCounter:
+    """Число SQL-запросов к движку db.engine"""
+
+    def __init__(self):
+        self.count = 0
+        event.listen(db.engine.sync_engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+    @contextmanager
+    def measure(self, into: List[int]):
+        start = self.count
+        yield
+        into.append(self.count - start)
+
+
+async def settle():
+    """Дождаться фоновых задач (предзагрузка страницы), чтобы их запросы попали в замер"""
+    pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+def average(values: List[float]) -> float:
+    return round(sum(values) / len(values), 2) if values else 0
+
+
+def percentile(values: List[float], share: float) -> float:
+    if not values:
+        return 0
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * share))], 2)
+
+
+# ============= QUERIES: ЗАПРОСЫ НА СТРАНИЦУ =============
+
+async def per_card_ratings(post_ids: List[int]) -> Dict[int, tuple]:
+    """Рейтинг как до user-001: отдельный AVG/COUNT на каждую карточку"""
+    ratings = {}
+    async with db.get_session() as session:
+        for post_id in post_ids:
+            row = (await session.execute(
+                select(func.avg(CatalogReview.rating), func.count(CatalogReview.id))
+                .where(CatalogReview.catalog_post_id == post_id)
+            )).first()
+            ratings[post_id] = (round(row[0], 1) if row[0] else 0, row[1] or 0)
+    return ratings
+
+
+async def grouped_ratings(post_ids: List[int]) -> Dict[int, tuple]:
+    """Рейтинг как в user-001: один GROUP BY на страницу"""
+    async with db.get_session() as session:
+        rows = (await session.execute(
+            select(CatalogReview.catalog_post_id, func.avg(CatalogReview.rating), func.count(CatalogReview.id))
+            .where(CatalogReview.catalog_post_id.in_(post_ids))
+            .group_by(CatalogReview.catalog_post_id)
+        )).all()
+    return {row[0]: (round(row[1], 1), row[2]) for row in rows}
+
+
+async def bench_queries(args):
+    """Запросов к БД на страницу ленты, поиск и открытие карточки"""
+    from services.catalog_service import catalog_service
+
+    await setup_database()
+    try:
+        post_ids = await seed_posts(args.posts)
+        counter = QueryCounter()
+        page_size = catalog_service.max_posts_per_page
+
+        feed, search, card_cold, card_cached, per_card, grouped = [], [], [], [], [], []
+
+        for _ in range(args.pages):
+            with counter.measure(feed):
+                page = await catalog_service.get_random_posts_mixed(user_id=1, count=page_size)
+                await settle()
+
+            page_ids = [post['id'] for post in page]
+            with counter.measure(per_card):
+                await per_card_ratings(page_ids)
+            with counter.measure(grouped):
+                await grouped_ratings(page_ids)
+
+        for query in ('Маникюр', 'Услуга', 'тег3'):
+            with counter.measure(search):
+                await catalog_service.search_posts(query, limit=10)
+
+        for post_id in post_ids[:args.pages]:
+            with counter.measure(card_cold):
+                await catalog_service.get_post_by_id(post_id)
+            with counter.measure(card_cached):
+                await catalog_service.get_post_by_id(post_id)
+
+        logger.info(f"📊 Запросов к БД ({args.posts} постов, {args.pages} страниц по {page_size}):")
+        logger.info(f"  Рейтинг страницы, AVG/COUNT на карточку (до user-001): {average(per_card)}")
+        logger.info(f"  Рейтинг страницы, один GROUP BY (user-001):           {average(grouped)}")
+        logger.info("  Рейтинг страницы, сводка в catalog_posts (user-002):  0")
+        logger.info(f"  Страница ленты целиком (с предзагрузкой следующей):   {average(feed)}")
+        logger.info(f"  Поиск, 10 результатов:                                {average(search)}")
+        logger.info(f"  Карточка по id, холодная / из кэша:                   {average(card_cold)} / {average(card_cached)}")
+    finally:
+        await teardown_database()
+
+
+# ============= VIEWED: ПРОСМОТРЕННЫЕ ПОСТЫ =============
+
+async def json_page_turn(user_id: int, page_ids: List[int]):
+    """Перелистывание как до user-004: прочитать JSON-список, дописать, записать целиком"""
+    async with db.get_session() as session:
+        user_session = (await session.execute(
+            select(CatalogSession).where(CatalogSession.user_id == user_id)
+        )).scalar_one()
+        user_session.viewed_posts = list(user_session.viewed_posts or []) + page_ids
+        await session.commit()
+
+
+async def append_page_turn(user_id: int, page_ids: List[int]):
+    """Перелистывание ленты (user-004): страница дописывается сегментом"""
+    from services.catalog_service import catalog_service
+
+    async with db.get_session() as session:
+        user_session = (await session.execute(
+            select(CatalogSession).where(CatalogSession.user_id == user_id)
+        )).scalar_one()
+        catalog_service._append_viewed_ids(user_session, page_ids)
+        await session.commit()
+
+
+async def bench_viewed(args):
+    """Размер строки и время перелистывания для пользователей с тысячами просмотров"""
+    from services.catalog_service import catalog_service
+
+    await setup_database()
+    try:
+        sizes = [int(size) for size in args.sizes.split(',')]
+        rng = random.Random(1)
+
+        logger.info(f"📊 Просмотренные посты ({args.turns} перелистываний по 5 карточек):")
+        logger.info(
+            f"  {'просмотрено':>11} | {'JSON, байт':>10} | {'packed, байт':>12} | "
+            f"{'JSON, мс':>8} | {'перепаковка, мс':>15} | {'дописывание, мс':>15}"
+        )
+
+        for index, size in enumerate(sizes):
+            viewed = sorted(rng.sample(range(1, size * 4), size))
+            json_user, packed_user, append_user = 3 * index + 1, 3 * index + 2, 3 * index + 3
+
+            async with db.engine.begin() as conn:
+                await conn.execute(insert(CatalogSession), [
+                    {'user_id': json_user, 'viewed_posts': viewed, 'viewed_packed': None, 'viewed_count': 0},
+                    {'user_id': packed_user, 'viewed_posts': [], 'viewed_packed': pack_ids(viewed),
+                     'viewed_count': len(viewed)},
+                    {'user_id': append_user, 'viewed_posts': [], 'viewed_packed': pack_ids(viewed),
+                     'viewed_count': len(viewed)},
+                ])
+
+            pages = [[size * 4 + turn * 5 + i for i in range(5)] for turn in range(args.turns)]
+
+            started = time.perf_counter()
+            for page_ids in pages:
+                await json_page_turn(json_user, page_ids)
+            json_ms = (time.perf_counter() - started) * 1000 / args.turns
+
+            started = time.perf_counter()
+            for page_ids in pages:
+                await catalog_service.mark_posts_viewed(packed_user, page_ids)
+            packed_ms = (time.perf_counter() - started) * 1000 / args.turns
+
+            started = time.perf_counter()
+            for page_ids in pages:
+                await append_page_turn(append_user, page_ids)
+            append_ms = (time.perf_counter() - started) * 1000 / args.turns
+
+            async with db.get_session() as session:
+                rows = {
+                    row.user_id: row for row in (await session.execute(
+                        select(CatalogSession).where(
+                            CatalogSession.user_id.in_([json_user, packed_user, append_user])
+                        )
+                    )).scalars()
+                }
+            json_bytes = len(json.dumps(rows[json_user].viewed_posts))
+            packed_bytes = len(rows[append_user].viewed_packed)
+            assert rows[append_user].viewed_count == rows[packed_user].viewed_count
+
+            logger.info(
+                f"  {size:>11} | {json_bytes:>10} | {packed_bytes:>12} | "
+                f"{json_ms:>8.2f} | {packed_ms:>15.2f} | {append_ms:>15.2f}"
+            )
+    finally:
+        await teardown_database()
+
+
+# ============= SEARCH: НЕЧЁТКИЙ ПОИСК =============
+
+# Категория -> (слова для названий, теги)
+SEARCH_CORPUS = {
+    'Маникюр': (['Маникюр', 'Ногти', 'Гель-лак'], ['маникюр', 'ногти', 'наращивание', 'дизайн']),
+    'Педикюр': (['Педикюр', 'Аппаратный педикюр'], ['педикюр', 'стопы', 'уход']),
+    'Барбер': (['Барбершоп', 'Мужская стрижка', 'Барбер'], ['борода', 'стрижка', 'бритьё']),
+    'Массажист': (['Массаж', 'Массажистка', 'Лимфодренаж'], ['массаж', 'спина', 'релакс']),
+    'Фотограф': (['Фотограф', 'Фотосессия', 'Фотостудия'], ['фотосъёмка', 'портрет', 'свадьба']),
+    'Репетитор': (['Репетитор', 'Уроки математики', 'Английский язык'], ['репетитор', 'школа', 'экзамен']),
+    'Клининг': (['Клининг', 'Уборка квартир', 'Генеральная уборка'], ['уборка', 'чистота', 'квартира']),
+    'Ресницы': (['Наращивание ресниц', 'Ламинирование ресниц'], ['ресницы', 'ламинирование']),
+    'Брови': (['Брови', 'Коррекция бровей', 'Архитектура бровей'], ['брови', 'окрашивание']),
+    'Эпиляция': (['Эпиляция', 'Шугаринг', 'Лазерная эпиляция'], ['эпиляция', 'шугаринг', 'воск']),
+    'Психолог': (['Психолог', 'Психотерапевт'], ['психология', 'консультация', 'терапия']),
+    'Сантехник': (['Сантехник', 'Сантехнические работы'], ['сантехника', 'ремонт', 'трубы']),
+}
+
+SEARCH_NAME_SUFFIXES = ['у Анны', 'Будапешт', 'на дому', 'Premium', 'недорого', 'центр', 'с выездом', '']
+
+# Запрос с опечаткой или транслитом -> категория, посты которой считаются релевантными
+SEARCH_QUERIES: List[Tuple[str, str]] = [
+    ('manikur', 'Маникюр'), ('маникр', 'Маникюр'), ('manikyur', 'Маникюр'), ('ногт', 'Маникюр'),
+    ('pedikur', 'Педикюр'), ('педикурр', 'Педикюр'),
+    ('barber', 'Барбер'), ('барбр', 'Барбер'), ('boroda', 'Барбер'),
+    ('massazh', 'Массажист'), ('масаж', 'Массажист'), ('massaj', 'Массажист'),
+    ('fotograf', 'Фотограф'), ('фотогрф', 'Фотограф'), ('fotosessiya', 'Фотограф'),
+    ('repetitor', 'Репетитор'), ('репититор', 'Репетитор'),
+    ('klining', 'Клининг'), ('уборкa', 'Клининг'), ('uborka', 'Клининг'),
+    ('resnitsy', 'Ресницы'), ('ресници', 'Ресницы'),
+    ('brovi', 'Брови'), ('бравей', 'Брови'),
+    ('epilyatsiya', 'Эпиляция'), ('шугарин', 'Эпиляция'), ('shugaring', 'Эпиляция'),
+    ('psiholog', 'Психолог'), ('псхолог', 'Психолог'),
+    ('santehnik', 'Сантехник'), ('сантехнк', 'Сантехник'),
+]
+
+
+async def seed_search_corpus(count: int) -> Dict[int, str]:
+    """Посты из SEARCH_CORPUS: id -> категория"""
+    rng = random.Random(7)
+    categories = list(SEARCH_CORPUS)
+    posts, post_categories = [], {}
+
+    for i in range(1, count + 1):
+        category = categories[i % len(categories)]
+        names, tags = SEARCH_CORPUS[category]
+        posts.append({
+            'id': i,
+            'user_id': i % 50,
+            'catalog_link': f'https://t.me/catalog/{i}',
+            'category': category,
+            'name': f"{rng.choice(names)} {rng.choice(SEARCH_NAME_SUFFIXES)}".strip(),
+            'tags': rng.sample(tags, min(2, len(tags))),
+            'catalog_number': i,
+            'is_active': True,
+        })
+        post_categories[i] = category
+
+    async with db.engine.begin() as conn:
+        await conn.execute(insert(CatalogPost), posts)
+
+    return post_categories
+
+
+def scan_fuzzy_ids(post_words: Dict[int, List[str]], query: str, limit: int) -> List[int]:
+    """Нечёткий поиск полным перебором слов всех постов (без триграммного индекса)"""
+    query_words = fuzzy_terms(query)
+    scores = {}
+
+    for post_id, words in post_words.items():
+        score = 0
+        for query_word in query_words:
+            query_trigrams = trigrams(query_word)
+            best = 0
+            for word in words:
+                word_trigrams = trigrams(word)
+                shared = len(query_trigrams & word_trigrams)
+                similarity = shared / (len(query_trigrams) + len(word_trigrams) - shared)
+                if similarity >= TRIGRAM_THRESHOLD:
+                    best = max(best, similarity)
+            score += best
+        if score:
+            scores[post_id] = score
+
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    return [post_id for post_id, _ in ranked[:limit]]
+
+
+async def bench_search(args):
+    """Полнота (hit@10, precision@10) и задержка нечёткого поиска против точного и полного перебора"""
+    from services.catalog_service import catalog_service
+
+    await setup_database()
+    try:
+        post_categories = await seed_search_corpus(args.posts)
+        limit = 10
+
+        # Первый поиск строит индекс в памяти - не включаем его в замер
+        started = time.perf_counter()
+        await catalog_service.fuzzy_search_posts('warmup', limit=limit)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        post_words = {
+            post_id: list(words) for post_id, words in catalog_search._doc_words.items()
+        }
+
+        exact_hits, fuzzy_hits, precision = 0, 0, []
+        index_ms, service_ms, scan_ms = [], [], []
+
+        for query, category in SEARCH_QUERIES:
+            exact_ids = catalog_search._search_memory(query, limit)
+            if any(post_categories[post_id] == category for post_id in exact_ids):
+                exact_hits += 1
+
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                fuzzy_ids = catalog_search._fuzzy_search_memory(query, limit)
+                index_ms.append((time.perf_counter() - started) * 1000)
+
+            relevant = sum(1 for post_id in fuzzy_ids if post_categories[post_id] == category)
+            if relevant:
+                fuzzy_hits += 1
+            precision.append(relevant / limit)
+
+            started = time.perf_counter()
+            await catalog_service.fuzzy_search_posts(query, limit=limit)
+            service_ms.append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            scan_fuzzy_ids(post_words, query, limit)
+            scan_ms.append((time.perf_counter() - started) * 1000)
+
+        total = len(SEARCH_QUERIES)
+        logger.info(f"📊 Нечёткий поиск ({args.posts} постов, {total} запросов с опечатками/транслитом, top-{limit}):")
+        logger.info(f"  Построение индекса в памяти:             {build_ms:.1f} мс")
+        logger.info(f"  hit@{limit}, точный поиск (стемминг):          {exact_hits}/{total}")
+        logger.info(f"  hit@{limit}, нечёткий поиск (триграммы):       {fuzzy_hits}/{total}")
+        logger.info(f"  precision@{limit}, нечёткий поиск:             {average(precision)}")
+        logger.info(f"  Триграммный индекс, мс (среднее / p95):  {average(index_ms)} / {percentile(index_ms, 0.95)}")
+        logger.info(f"  fuzzy_search_posts с загрузкой карточек: {average(service_ms)} / {percentile(service_ms, 0.95)}")
+        logger.info(f"  Полный перебор без индекса, мс:          {average(scan_ms)} / {percentile(scan_ms, 0.95)}")
+    finally:
+        await teardown_database()
+
+
+# ============= TOPPEOPLE: РЕЙТИНГ КАРТОЧЕК TOPGIRLS/TOPBOYS =============
+
+def scan_toppeople_rating(rating_data: Dict, catalog_link: str) -> tuple:
+    """Рейтинг как до user-011: перебор всех постов и сумма всех голосов"""
+    for post_data in rating_data.get('posts', {}).values():
+        if post_data.get('published_link', '') == catalog_link:
+            votes = post_data.get('votes', {})
+            if not votes:
+                return (0.0, 0)
+
+            total_score = sum(votes.values())
+            vote_count = len(votes)
+            rating = max(0, min(5, (total_score / vote_count + 2) * 1.25))
+            return (round(rating, 1), vote_count)
+
+    return (0.0, 0)
+
+
+def seed_toppeople(rating_data: Dict, count: int, votes_per_post: int) -> List[str]:
+    """Опубликованные посты рейтинга с голосами; ссылки в порядке публикации"""
+    from handlers.rating_handler import record_vote, VOTE_VALUES
+
+    rng = random.Random(3)
+    links = []
+
+    for post_id in range(1, count + 1):
+        link = f"https://t.me/c/1000/{post_id}"
+        post = {'published_link': link, 'votes': {}}
+        for voter in range(votes_per_post):
+            record_vote(post, 10000 + voter, rng.choice(VOTE_VALUES))
+
+        rating_data['posts'][post_id] = post
+        rating_data['link_index'][link] = post_id
+        links.append(link)
+
+    return links
+
+
+async def bench_toppeople(args):
+    """Время рейтинга на карточку и на страницу ленты при args.posts постах рейтинга"""
+    from handlers.rating_handler import rating_data
+    from services.catalog_service import catalog_service
+
+    # БД не нужна: рейтинг TopPeople хранится в памяти
+    shutil.rmtree(_TEMP_DIR, ignore_errors=True)
+
+    links = seed_toppeople(rating_data, args.posts, args.votes)
+    rng = random.Random(5)
+    cards = [rng.choice(links) for _ in range(args.cards)]
+    page_size = catalog_service.max_posts_per_page
+
+    started = time.perf_counter()
+    scanned = [scan_toppeople_rating(rating_data, link) for link in cards]
+    scan_us = (time.perf_counter() - started) * 1e6 / args.cards
+
+    started = time.perf_counter()
+    indexed = [await catalog_service.get_rating_from_toppeople(link) for link in cards]
+    index_us = (time.perf_counter() - started) * 1e6 / args.cards
+
+    if scanned != indexed:
+        logger.warning("⚠️ Перебор и индекс дали разные рейтинги")
+
+    logger.info(f"📊 Рейтинг TopPeople ({args.posts} постов по {args.votes} голосов, {args.cards} карточек):")
+    logger.info(f"  Перебор постов (до user-011): {scan_us:>10.1f} мкс/карточка, {scan_us * page_size / 1000:.2f} мс/страница")
+    logger.info(f"  Индекс ссылок (user-011):     {index_us:>10.1f} мкс/карточка, {index_us * page_size / 1000:.2f} мс/страница")
+
+
+# ============= DELIVERY: ОТПРАВКА СТРАНИЦЫ =============
+
+class LatencyBot:
+    """Бот без сети: каждый вызов Bot API ждёт latency секунд"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    async def _call(self):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+
+    async def send_message(self, **kwargs):
+        await self._call()
+
+    async def send_photo(self, **kwargs):
+        await self._call()
+
+    send_video = send_document = send_animation = send_photo
+
+
+def delivery_posts(first_id: int, with_media: bool, count: int = 5) -> List[Dict]:
+    """Карточки страницы: с file_id или без него (уходят текстом со ссылкой)"""
+    return [
+        {
+            'id': post_id,
+            'catalog_number': post_id,
+            'category': 'Маникюр',
+            'name': f'Услуга {post_id}',
+            'tags': ['маникюр'],
+            'catalog_link': f'https://t.me/catalog_bench/{post_id}',
+            'media_type': 'photo' if with_media else None,
+            'media_file_id': f'photo-{post_id}' if with_media else None,
+        }
+        for post_id in range(first_id, first_id + count)
+    ]
+
+
+async def per_card_delivery(bot, chat_id: int, posts: List[Dict]):
+    """Отправка как до user-013: цикл send_catalog_post по карточкам страницы"""
+    from handlers.catalog_handler import send_catalog_post
+
+    for index, post in enumerate(posts, 1):
+        await send_catalog_post(bot, chat_id, post, index, len(posts))
+
+
+async def timed(coroutine) -> float:
+    started = time.perf_counter()
+    await coroutine
+    return (time.perf_counter() - started) * 1000
+
+
+async def bench_delivery(args):
+    """Время отправки страницы из 5 карточек: по одной карточке против send_catalog_page"""
+    from handlers.catalog_handler import send_catalog_page
+
+    await setup_database()
+    try:
+        bot = LatencyBot(args.latency)
+        rows = []
+
+        rows.append((
+            'file_id есть, 1 чат',
+            await timed(per_card_delivery(bot, 1, delivery_posts(1, True))),
+            await timed(send_catalog_page(bot, 1, delivery_posts(1, True)))
+        ))
+        rows.append((
+            'без file_id, 1 чат',
+            await timed(per_card_delivery(bot, 1, delivery_posts(100, False))),
+            await timed(send_catalog_page(bot, 1, delivery_posts(100, False)))
+        ))
+        rows.append((
+            f'file_id есть, {args.chats} чатов сразу',
+            await timed(asyncio.gather(*[
+                per_card_delivery(bot, chat_id, delivery_posts(1, True)) for chat_id in range(args.chats)
+            ])),
+            await timed(asyncio.gather(*[
+                send_catalog_page(bot, chat_id, delivery_posts(1, True)) for chat_id in range(args.chats)
+            ]))
+        ))
+
+        logger.info(f"📊 Страница из 5 карточек, задержка Bot API {args.latency * 1000:.0f} мс:")
+        logger.info(f"  {'сценарий':<28} | {'по карточке, мс':>15} | {'страница, мс':>12}")
+        for title, before_ms, after_ms in rows:
+            logger.info(f"  {title:<28} | {before_ms:>15.0f} | {after_ms:>12.0f}")
+    finally:
+        await teardown_database()
+
+
+# ============= ЗАПУСК =============
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарки каталога на временной SQLite-базе')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    queries = subparsers.add_parser('queries', help='запросов к БД на страницу')
+    queries.add_argument('--posts', type=int, default=200)
+    queries.add_argument('--pages', type=int, default=10)
+    queries.set_defaults(handler=bench_queries)
+
+    viewed = subparsers.add_parser('viewed', help='просмотренные посты: размер строки и перелистывание')
+    viewed.add_argument('--sizes', default='1000,5000,20000')
+    viewed.add_argument('--turns', type=int, default=50)
+    viewed.set_defaults(handler=bench_viewed)
+
+    search = subparsers.add_parser('search', help='нечёткий поиск: полнота и задержка')
+    search.add_argument('--posts', type=int, default=5000)
+    search.add_argument('--repeat', type=int, default=20)
+    search.set_defaults(handler=bench_search)
+
+    toppeople = subparsers.add_parser('toppeople', help='рейтинг TopPeople: перебор против индекса')
+    toppeople.add_argument('--posts', type=int, default=10000)
+    toppeople.add_argument('--votes', type=int, default=20)
+    toppeople.add_argument('--cards', type=int, default=500)
+    toppeople.set_defaults(handler=bench_toppeople)
+
+    delivery = subparsers.add_parser('delivery', help='отправка страницы каталога')
+    delivery.add_argument('--latency', type=float, default=0.05)
+    delivery.add_argument('--chats', type=int, default=4)
+    delivery.set_defaults(handler=bench_delivery)
+
+    args = parser.parse_args()
+    asyncio.run(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
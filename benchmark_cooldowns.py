@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+БЕНЧМАРК ОЧИСТКИ КУЛДАУНОВ
+Время cleanup_expired на большом кэше: полный обход кэша (как до
+user-022) против кучи сроков. Запускается на временной SQLite-базе
+(рабочая БД из DATABASE_URL не используется и не меняется)
+
+Использование:
+    python benchmark_cooldowns.py [--users N] [--expired-every N] [--runs N]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+from datetime import timedelta
+from typing import List
+
+# До импорта config: сервисы выбирают SQL по диалекту из DATABASE_URL
+_TEMP_DIR = tempfile.mkdtemp(prefix='cooldown_bench_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_TEMP_DIR, 'bench.db')}"
+
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from services.db import db
+from services.cooldown import CooldownService, CooldownType
+from models import Base
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+# ============= ВРЕМЕННАЯ БАЗА =============
+
+async def setup_database():
+    """Временная SQLite-база со схемой models.py (cleanup_expired чистит и таблицу cooldowns)"""
+    db.engine = create_async_engine(os.environ['DATABASE_URL'].replace('sqlite://', 'sqlite+aiosqlite://', 1))
+    db.session_maker = async_sessionmaker(db.engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with db.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def teardown_database():
+    await db.engine.dispose()
+    shutil.rmtree(_TEMP_DIR, ignore_errors=True)
+
+
+# ============= ДАННЫЕ =============
+
+def fill_cache(service: CooldownService, users: int, expired_every: int):
+    """Кулдаун 'post' у каждого пользователя (истёк у каждого expired_every-го) и DAILY 'rate' у части"""
+    now = datetime.utcnow()
+
+    for user_id in range(users):
+        expires_at = now - timedelta(seconds=1) if user_id % expired_every == 0 else now + timedelta(hours=1)
+        service._cache[user_id] = {'post': {'type': CooldownType.NORMAL, 'expires_at': expires_at, 'count': 1}}
+        service._schedule_expiry(expires_at, user_id, 'post')
+
+    daily_expiry = service._calculate_expiry(0, CooldownType.DAILY)
+    for user_id in range(0, users, expired_every):
+        service._cache[user_id]['rate'] = {'type': CooldownType.DAILY, 'expires_at': daily_expiry, 'count': 1}
+        service._schedule_expiry(daily_expiry, user_id, 'rate')
+
+
+def scan_cleanup(service: CooldownService) -> int:
+    """Очистка как до user-022: обход всех пользователей и команд"""
+    cleaned = 0
+
+    for user_id in list(service._cache.keys()):
+        commands = service._cache[user_id]
+        for command in list(commands.keys()):
+            data = commands[command]
+            if service._is_cooldown_expired(data, data['type']):
+                del commands[command]
+                cleaned += 1
+
+        if not commands:
+            del service._cache[user_id]
+
+    return cleaned
+
+
+def average(values: List[float]) -> float:
+    return round(sum(values) / len(values), 2) if values else 0
+
+
+# ============= ЗАПУСК =============
+
+async def bench_cleanup(args):
+    await setup_database()
+    try:
+        scan_ms, heap_ms, idle_ms = [], [], []
+        scan_cleaned = heap_cleaned = 0
+
+        for _ in range(args.runs):
+            service = CooldownService()
+            fill_cache(service, args.users, args.expired_every)
+            started = time.perf_counter()
+            scan_cleaned = scan_cleanup(service)
+            scan_ms.append((time.perf_counter() - started) * 1000)
+
+            service = CooldownService()
+            fill_cache(service, args.users, args.expired_every)
+            started = time.perf_counter()
+            heap_cleaned = await service.cleanup_expired()
+            heap_ms.append((time.perf_counter() - started) * 1000)
+
+            # Повторный проход: наступивших сроков нет
+            started = time.perf_counter()
+            await service.cleanup_expired()
+            idle_ms.append((time.perf_counter() - started) * 1000)
+
+        logger.info(
+            f"📊 Очистка кулдаунов ({args.users} пользователей, истёк каждый {args.expired_every}-й, "
+            f"{args.runs} прогонов):"
+        )
+        logger.info(f"  Полный обход кэша (до user-022): {average(scan_ms):>8} мс, очищено {scan_cleaned}")
+        logger.info(f"  Куча сроков (user-022):          {average(heap_ms):>8} мс, очищено {heap_cleaned}")
+        logger.info(f"  Куча, повторный проход:          {average(idle_ms):>8} мс")
+        logger.info("  (время кучи включает DELETE истекших строк в пустой таблице cooldowns)")
+    finally:
+        await teardown_database()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк очистки кулдаунов на временной SQLite-базе')
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--expired-every', type=int, default=100)
+    parser.add_argument('--runs', type=int, default=3)
+
+    args = parser.parse_args()
+    asyncio.run(bench_cleanup(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ВЫГРУЗКА И ЗАГРУЗКА КАТАЛОГА
+Потоковый перенос catalog_posts, catalog_reviews и catalog_subscriptions
+в файлы JSONL/CSV и обратно (в отличие от migrate_complete.py ничего не удаляет)
+
+Каталог выгрузки - по файлу на таблицу (catalog_posts.jsonl, ...).
+Чтение идёт серверным курсором, запись - пачками (COPY во временную
+таблицу на PostgreSQL, INSERT OR IGNORE на SQLite), память не зависит
+от размера каталога.
+
+При загрузке:
+- строки с уже существующим id пропускаются (повторный запуск безопасен)
+- занятый catalog_number заменяется свободным из пула номеров; номер
+  строки, которую БД отбросила (или пачки, которая не записалась),
+  возвращается в пул
+- пул номеров (services.catalog_numbers) у каждого процесса свой: уже
+  запущенный бот не знает о загруженных номерах, пока не перечитает их -
+  после загрузки перезапустите бота или вызовите в нём
+  catalog_numbers.reload() (до этого от повторов защищает только
+  unique-ограничение и одна повторная попытка в add_post)
+- отзывы к отсутствующим постам пропускаются
+- прогресс пишется в .import_progress.json, --resume продолжает с места остановки
+- в CSV пустое значение означает NULL
+
+Использование:
+    python catalog_io.py export <каталог> [--format jsonl|csv]
+    python catalog_io.py import <каталог> [--format jsonl|csv] [--resume] [--batch-size N]
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Set, Tuple
+from sqlalchemy import select, insert, text, Boolean, DateTime, Integer, JSON
+from config import Config
+from services.db import db
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Порядок важен: отзывы ссылаются на посты
+CATALOG_TABLES = ['catalog_posts', 'catalog_reviews', 'catalog_subscriptions']
+
+PROGRESS_FILE = '.import_progress.json'
+DEFAULT_BATCH_SIZE = 500
+
+csv.field_size_limit(sys.maxsize)
+
+
+# ============= КОДИРОВАНИЕ ЗНАЧЕНИЙ =============
+
+def encode_value(column, value, to_csv: bool):
+    """Значение из БД -> JSONL/CSV"""
+    if value is None:
+        return '' if to_csv else None
+
+    if isinstance(value, datetime):
+        return value.isoformat()
+
+    if to_csv:
+        if isinstance(column.type, JSON):
+            return json.dumps(value, ensure_ascii=False)
+        if isinstance(value, bool):
+            return 'true' if value else 'false'
+
+    return value
+
+
+def decode_value(column, value, from_csv: bool):
+    """Значение из JSONL/CSV -> БД"""
+    if value is None:
+        return None
+
+    if from_csv:
+        if value == '':
+            return None
+        if isinstance(column.type, JSON):
+            return json.loads(value)
+        if isinstance(column.type, Boolean):
+            return value.lower() in ('true', '1')
+        if isinstance(column.type, Integer):
+            return int(value)
+
+    if isinstance(column.type, DateTime) and isinstance(value, str):
+        return datetime.fromisoformat(value)
+
+    return value
+
+
+def column_default(column):
+    """Скалярный default колонки из models.py (для старых выгрузок без колонки)"""
+    if column.default is not None and column.default.is_scalar:
+        return column.default.arg
+    return None
+
+
+# ============= ФАЙЛЫ =============
+
+def table_path(directory: str, table_name: str, fmt: str) -> str:
+    return os.path.join(directory, f"{table_name}.{fmt}")
+
+
+def read_records(path: str, fmt: str) -> Iterator[Dict]:
+    """Построчное чтение записей файла выгрузки"""
+    with open(path, encoding='utf-8', newline='') as f:
+        if fmt == 'csv':
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def load_progress(directory: str) -> Dict[str, int]:
+    path = os.path.join(directory, PROGRESS_FILE)
+    if not os.path.exists(path):
+        return {}
+
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_progress(directory: str, progress: Dict[str, int]):
+    """Атомарная запись прогресса (после каждой закоммиченной пачки)"""
+    path = os.path.join(directory, PROGRESS_FILE)
+    tmp_path = f"{path}.tmp"
+
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(progress, f)
+    os.replace(tmp_path, path)
+
+
+class RateReporter:
+    """Счётчик строк со скоростью в строках/сек"""
+
+    def __init__(self, table_name: str):
+        self.table_name = table_name
+        self.rows = 0
+        self.started = time.monotonic()
+
+    def add(self, count: int):
+        self.rows += count
+
+    @property
+    def rate(self) -> float:
+        elapsed = time.monotonic() - self.started
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+    def report(self, prefix: str = ''):
+        logger.info(f"  {prefix}{self.table_name}: {self.rows} строк ({self.rate:.0f} строк/с)")
+
+
+# ============= ВЫГРУЗКА =============
+
+async def export_table(table, path: str, fmt: str, batch_size: int) -> int:
+    """Выгрузить таблицу серверным курсором"""
+    columns = list(table.columns)
+    reporter = RateReporter(table.name)
+
+    async with db.engine.connect() as conn:
+        result = await conn.stream(
+            select(table).order_by(table.c.id).execution_options(yield_per=batch_size)
+        )
+
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = None
+            if fmt == 'csv':
+                writer = csv.writer(f)
+                writer.writerow([column.name for column in columns])
+
+            async for rows in result.partitions():
+                for row in rows:
+                    values = [encode_value(column, value, fmt == 'csv') for column, value in zip(columns, row)]
+                    if writer:
+                        writer.writerow(values)
+                    else:
+                        record = {column.name: value for column, value in zip(columns, values)}
+                        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+                reporter.add(len(rows))
+                reporter.report()
+
+    reporter.report('✅ ')
+    return reporter.rows
+
+
+async def export_catalog(directory: str, fmt: str, batch_size: int) -> bool:
+    from models import Base
+
+    os.makedirs(directory, exist_ok=True)
+
+    for table_name in CATALOG_TABLES:
+        table = Base.metadata.tables[table_name]
+        await export_table(table, table_path(directory, table_name, fmt), fmt, batch_size)
+
+    return True
+
+
+# ============= ЗАГРУЗКА =============
+
+async def filter_batch(conn, table, rows: List[Dict]) -> List[Dict]:
+    """Убрать строки с существующим id и отзывы к отсутствующим постам"""
+    from models import Base
+
+    ids = [row['id'] for row in rows if row.get('id') is not None]
+    if ids:
+        result = await conn.execute(select(table.c.id).where(table.c.id.in_(ids)))
+        existing = set(result.scalars().all())
+        rows = [row for row in rows if row.get('id') not in existing]
+
+    if table.name == 'catalog_reviews' and rows:
+        posts = Base.metadata.tables['catalog_posts']
+        post_ids = {row['catalog_post_id'] for row in rows if row.get('catalog_post_id') is not None}
+        result = await conn.execute(select(posts.c.id).where(posts.c.id.in_(post_ids)))
+        known = set(result.scalars().all())
+        rows = [
+            row for row in rows
+            if row.get('catalog_post_id') is None or row['catalog_post_id'] in known
+        ]
+
+    return rows
+
+
+async def assign_numbers(rows: List[Dict]) -> Tuple[List[int], int]:
+    """Занять номера каталога; занятые заменяются свободными. (номера, заменено)"""
+    from services.catalog_numbers import catalog_numbers
+
+    claimed = []
+    renumbered = 0
+
+    for row in rows:
+        number = row.get('catalog_number')
+        if number is None:
+            continue
+
+        if not await catalog_numbers.claim(number):
+            row['catalog_number'] = await catalog_numbers.allocate()
+            logger.warning(f"  ⚠️ Пост {row.get('id')}: номер {number} занят, выдан {row['catalog_number']}")
+            renumbered += 1
+
+        claimed.append(row['catalog_number'])
+
+    return claimed, renumbered
+
+
+async def stored_numbers(conn, table, numbers: List[int]) -> Set[int]:
+    """Какие из номеров уже есть в таблице (строка вставлена или номер занят другим постом)"""
+    if not numbers:
+        return set()
+
+    result = await conn.execute(select(table.c.catalog_number).where(table.c.catalog_number.in_(numbers)))
+    return set(result.scalars().all())
+
+
+async def write_batch(conn, table, names: List[str], rows: List[Dict], is_postgres: bool) -> int:
+    """Записать пачку: COPY + INSERT ... ON CONFLICT DO NOTHING на PostgreSQL"""
+    if is_postgres:
+        json_columns = {name for name in names if isinstance(table.c[name].type, JSON)}
+        records = [
+            tuple(
+                json.dumps(row[name]) if name in json_columns and row[name] is not None else row[name]
+                for name in names
+            )
+            for row in rows
+        ]
+
+        stage = f"{table.name}_import"
+        column_list = ', '.join(names)
+        await conn.execute(text(f"CREATE TEMP TABLE IF NOT EXISTS {stage} (LIKE {table.name})"))
+
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(stage, records=records, columns=names)
+
+        result = await conn.execute(text(
+            f"INSERT INTO {table.name} ({column_list}) "
+            f"SELECT {column_list} FROM {stage} ON CONFLICT DO NOTHING"
+        ))
+        await conn.execute(text(f"TRUNCATE {stage}"))
+        return result.rowcount
+
+    result = await conn.execute(insert(table).prefix_with('OR IGNORE'), rows)
+    return result.rowcount if result.rowcount >= 0 else len(rows)
+
+
+async def import_table(table, directory: str, fmt: str, batch_size: int, start: int,
+                       progress: Dict[str, int], is_postgres: bool) -> Dict[str, int]:
+    """Загрузить таблицу пачками, пропустив первые start записей"""
+    from services.catalog_numbers import catalog_numbers
+
+    path = table_path(directory, table.name, fmt)
+    reporter = RateReporter(table.name)
+    stats = {'read': 0, 'inserted': 0, 'skipped': 0, 'renumbered': 0}
+
+    records = read_records(path, fmt)
+    names = None
+    consumed = 0
+
+    async with db.engine.connect() as conn:
+        while True:
+            raw_batch = []
+            for record in records:
+                consumed += 1
+                if consumed <= start:
+                    continue
+                raw_batch.append(record)
+                if len(raw_batch) >= batch_size:
+                    break
+
+            if not raw_batch:
+                break
+
+            if names is None:
+                names = [
+                    column.name for column in table.columns
+                    if column.name in raw_batch[0] or column_default(column) is not None
+                ]
+
+            rows = [
+                {
+                    name: decode_value(table.c[name], record[name], fmt == 'csv')
+                    if name in record else column_default(table.c[name])
+                    for name in names
+                }
+                for record in raw_batch
+            ]
+
+            claimed = []
+            try:
+                async with conn.begin():
+                    rows = await filter_batch(conn, table, rows)
+
+                    if table.name == 'catalog_posts':
+                        claimed, renumbered = await assign_numbers(rows)
+                        stats['renumbered'] += renumbered
+
+                    inserted = await write_batch(conn, table, names, rows, is_postgres) if rows else 0
+                    stored = await stored_numbers(conn, table, claimed)
+            except Exception:
+                # Пачка не записана - занятые под неё номера возвращаются в пул
+                for number in claimed:
+                    await catalog_numbers.release(number)
+                raise
+
+            # INSERT OR IGNORE / ON CONFLICT DO NOTHING мог отбросить строку:
+            # её номер в БД не попал и снова свободен
+            for number in claimed:
+                if number in stored:
+                    catalog_numbers.confirm(number)
+                else:
+                    await catalog_numbers.release(number)
+
+            stats['read'] += len(raw_batch)
+            stats['inserted'] += inserted
+            stats['skipped'] += len(raw_batch) - inserted
+
+            progress[table.name] = start + stats['read']
+            save_progress(directory, progress)
+
+            reporter.add(len(raw_batch))
+            reporter.report()
+
+        if is_postgres and stats['inserted']:
+            async with conn.begin():
+                await conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                    f"(SELECT MAX(id) FROM {table.name}))"
+                ))
+
+    reporter.report('✅ ')
+    return stats
+
+
+async def import_catalog(directory: str, fmt: str, batch_size: int, resume: bool) -> bool:
+    from models import Base
+    from services.catalog_service import catalog_service
+
+    progress = load_progress(directory) if resume else {}
+    is_postgres = 'postgres' in Config.DATABASE_URL
+    reviews_inserted = 0
+
+    for table_name in CATALOG_TABLES:
+        if not os.path.exists(table_path(directory, table_name, fmt)):
+            logger.warning(f"  ⚠️ {table_name}: файл не найден, пропускаю")
+            continue
+
+        start = progress.get(table_name, 0)
+        if start:
+            logger.info(f"  ↪️ {table_name}: продолжаю с записи {start + 1}")
+
+        stats = await import_table(
+            Base.metadata.tables[table_name], directory, fmt, batch_size, start, progress, is_postgres
+        )
+        logger.info(
+            f"  {table_name}: добавлено {stats['inserted']}, пропущено {stats['skipped']}, "
+            f"перенумеровано {stats['renumbered']}"
+        )
+
+        if table_name == 'catalog_reviews':
+            reviews_inserted = stats['inserted']
+
+    if reviews_inserted:
+        logger.info("🔄 Пересчитываю сводку рейтингов...")
+        rebuilt = await catalog_service.rebuild_rating_summaries()
+        logger.info(f"✅ Пересчитано постов с отзывами: {rebuilt}")
+
+    logger.info("ℹ️ Если бот запущен - перезапустите его (или catalog_numbers.reload()), чтобы он увидел новые номера")
+    return True
+
+
+# ============= ЗАПУСК =============
+
+async def main(args) -> bool:
+    try:
+        logger.info(f"📊 Database: {Config.DATABASE_URL[:50]}...")
+
+        await db.init()
+
+        if not db.engine or not db.session_maker:
+            logger.error("❌ Database initialization failed")
+            return False
+
+        if args.command == 'export':
+            logger.info(f"📤 Выгрузка каталога в {args.directory} ({args.format})")
+            return await export_catalog(args.directory, args.format, args.batch_size)
+
+        logger.info(f"📥 Загрузка каталога из {args.directory} ({args.format})")
+        return await import_catalog(args.directory, args.format, args.batch_size, args.resume)
+
+    except Exception as e:
+        logger.error(f"❌ Ошибка переноса каталога: {e}", exc_info=True)
+        return False
+    finally:
+        await db.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Выгрузка и загрузка каталога")
+    parser.add_argument('command', choices=['export', 'import'])
+    parser.add_argument('directory')
+    parser.add_argument('--format', choices=['jsonl', 'csv'], default='jsonl')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--resume', action='store_true', help="продолжить загрузку по .import_progress.json")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    success = asyncio.run(main(parse_args()))
+    exit(0 if success else 1)
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ПРОВЕРКА ХРАНИЛИЩ КУЛДАУНОВ
+Гонка нескольких воркеров за один кулдаун: три экземпляра CooldownService
+одновременно вызывают try_acquire, занять кулдаун должен ровно один.
+Так же проверяются глобальный кулдаун (виден другому воркеру) и корзина
+защиты от флуда: все воркеры вместе пропускают не больше burst обновлений
+
+- redis    - поддельный RESP-сервер на asyncio (SET NX PX, PTTL,
+             EVAL/EVALSHA, SCAN, DEL) на случайном порту localhost,
+             настоящий Redis не нужен
+- database - временная SQLite-база со схемой models.py
+
+Дополнительно: сброс всех кулдаунов пользователя через SCAN + DEL,
+отсутствие повторной отправки команды после таймаута ответа и сброс
+кулдауна декоратором, если команда упала с исключением.
+Рабочая БД из DATABASE_URL не используется и не меняется.
+
+Использование:
+    python check_cooldown_backends.py [--workers N] [--calls N]
+"""
+
+import argparse
+import asyncio
+import fnmatch
+import hashlib
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+
+# До импорта config: сервисы выбирают SQL по диалекту из DATABASE_URL
+_TEMP_DIR = tempfile.mkdtemp(prefix='cooldown_check_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_TEMP_DIR, 'check.db')}"
+
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from services.db import db
+from services.cooldown import CooldownService
+from services.cooldown_backends import (
+    DatabaseCooldownBackend, RedisCooldownBackend, ACQUIRE_SCRIPT, TAKE_TOKEN_SCRIPT
+)
+from services.flood_control import FloodControl, CALLBACK
+from models import Base
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+USER_ID = 424242
+COMMAND = 'report'
+DURATION = 3600
+FLOOD_BURST = 5
+
+
+# ============= ПОДДЕЛЬНЫЙ REDIS =============
+
+class FakeRedisServer:
+    """
+    RESP-сервер с командами, которые использует RedisCooldownBackend
+
+    EVAL/EVALSHA не исполняют Lua: понимаются только ACQUIRE_SCRIPT
+    (SET NX PX, иначе PTTL) и TAKE_TOKEN_SCRIPT (GCRA), повторённые на
+    Python. Команды выполняются по очереди в event loop, то есть атомарно -
+    как в настоящем Redis. reply_delay задерживает ответы (таймаут клиента).
+    """
+
+    def __init__(self):
+        self.data: Dict[str, str] = {}
+        self.expires: Dict[str, float] = {}
+        self.scripts: Dict[str, Callable] = {}
+        self.commands: List[str] = []
+        self.reply_delay = 0.0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._known_scripts = {ACQUIRE_SCRIPT: self._acquire, TAKE_TOKEN_SCRIPT: self._take_token}
+
+    async def start(self) -> str:
+        """Запустить на свободном порту, вернуть REDIS_URL"""
+        self._server = await asyncio.start_server(self._handle, '127.0.0.1', 0)
+        port = self._server.sockets[0].getsockname()[1]
+        return f"redis://127.0.0.1:{port}/0"
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                args = await self._read_command(reader)
+                reply = self.execute(args)
+                if self.reply_delay:
+                    await asyncio.sleep(self.reply_delay)
+                writer.write(self._encode(reply))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_command(reader: asyncio.StreamReader) -> List[str]:
+        line = await reader.readexactly(1) + await reader.readline()
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int((await reader.readline())[1:-2])
+            args.append((await reader.readexactly(length + 2))[:-2].decode())
+        return args
+
+    @classmethod
+    def _encode(cls, reply) -> bytes:
+        if reply is None:
+            return b'$-1\r\n'
+        if isinstance(reply, Exception):
+            return b'-%s\r\n' % str(reply).encode()
+        if isinstance(reply, int):
+            return b':%d\r\n' % reply
+        if isinstance(reply, list):
+            return b'*%d\r\n' % len(reply) + b''.join(cls._encode(item) for item in reply)
+        if reply == 'OK':
+            return b'+OK\r\n'
+        payload = reply.encode()
+        return b'$%d\r\n%s\r\n' % (len(payload), payload)
+
+    def _alive(self, key: str) -> bool:
+        """Есть ли ключ (истёкший удаляется при обращении)"""
+        if key in self.expires and self.expires[key] <= time.time() * 1000:
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def execute(self, args: List[str]):
+        command = args[0].upper()
+        self.commands.append(command)
+
+        if command == 'SET':
+            key, value = args[1], args[2]
+            options = [arg.upper() for arg in args[3:]]
+            if 'NX' in options and self._alive(key):
+                return None
+            self.data[key] = value
+            self.expires.pop(key, None)
+            if 'PX' in options:
+                self.expires[key] = time.time() * 1000 + int(args[3 + options.index('PX') + 1])
+            return 'OK'
+
+        if command == 'PTTL':
+            key = args[1]
+            if not self._alive(key):
+                return -2
+            return int(self.expires[key] - time.time() * 1000) if key in self.expires else -1
+
+        if command == 'DEL':
+            deleted = 0
+            for key in args[1:]:
+                if self._alive(key):
+                    del self.data[key]
+                    self.expires.pop(key, None)
+                    deleted += 1
+            return deleted
+
+        if command == 'SCAN':
+            pattern = args[args.index('MATCH') + 1] if 'MATCH' in args else '*'
+            keys = [key for key in list(self.data) if self._alive(key) and fnmatch.fnmatchcase(key, pattern)]
+            return ['0', keys]
+
+        if command == 'EVALSHA':
+            if args[1] not in self.scripts:
+                return Exception('NOSCRIPT No matching script. Please use EVAL.')
+            return self.scripts[args[1]](*args[3:])
+
+        if command == 'EVAL':
+            script = self._known_scripts[args[1]]
+            self.scripts[hashlib.sha1(args[1].encode()).hexdigest()] = script
+            return script(*args[3:])
+
+        return Exception(f"ERR unknown command '{args[0]}'")
+
+    def _acquire(self, key: str, value: str, ttl_ms: str) -> int:
+        """ACQUIRE_SCRIPT: 0 - ключ занят нами, иначе оставшиеся миллисекунды"""
+        if self.execute(['SET', key, value, 'NX', 'PX', ttl_ms]):
+            return 0
+        return max(1, self.execute(['PTTL', key]))
+
+    def _take_token(self, key: str, interval_ms: str, capacity_ms: str) -> int:
+        """TAKE_TOKEN_SCRIPT: 1 - токен взят, 0 - корзина пуста"""
+        now = int(time.time() * 1000)
+        full_at = max(int(self.data[key]) if self._alive(key) else now, now) + int(interval_ms)
+        if full_at - now > int(capacity_ms):
+            return 0
+        self.data[key] = str(full_at)
+        self.expires[key] = full_at
+        return 1
+
+
+# ============= ВРЕМЕННАЯ БАЗА =============
+
+async def setup_database():
+    db.engine = create_async_engine(os.environ['DATABASE_URL'].replace('sqlite://', 'sqlite+aiosqlite://', 1))
+    db.session_maker = async_sessionmaker(db.engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with db.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def teardown_database():
+    await db.engine.dispose()
+    shutil.rmtree(_TEMP_DIR, ignore_errors=True)
+
+
+# ============= ПРОВЕРКИ =============
+
+async def race(services: List[CooldownService], calls: int) -> int:
+    """Все воркеры одновременно занимают один кулдаун; сколько заняли"""
+    results = await asyncio.gather(*[
+        service.try_acquire(USER_ID, COMMAND, DURATION)
+        for service in services
+        for _ in range(calls)
+    ])
+    return sum(1 for can_use, _ in results if can_use)
+
+
+async def flood_race(services: List[CooldownService], calls: int) -> int:
+    """Все воркеры одновременно берут токены одной корзины; сколько взяли"""
+    floods = [
+        FloodControl(limits={kind: (FLOOD_BURST, 0.001) for kind in range(3)}, backend=service.backend)
+        for service in services
+    ]
+    results = await asyncio.gather(*[
+        flood.consume_shared(USER_ID, CALLBACK)
+        for flood in floods
+        for _ in range(calls)
+    ])
+    return sum(results)
+
+
+async def global_cooldown_shared(services: List[CooldownService]) -> bool:
+    """Глобальный кулдаун, поставленный одним воркером, останавливает команды на другом"""
+    await services[0].set_global_cooldown(USER_ID + 2, 60)
+    can_use, remaining = await services[-1].try_acquire(USER_ID + 2, COMMAND, DURATION)
+    return not can_use and remaining > 0
+
+
+def report(name: str, ok: bool, details: str = '') -> bool:
+    logger.info(f"  {'✅' if ok else '❌'} {name}{': ' + details if details else ''}")
+    return ok
+
+
+async def check_redis(workers: int, calls: int) -> bool:
+    server = FakeRedisServer()
+    url = await server.start()
+    services = [CooldownService(backend=RedisCooldownBackend(url)) for _ in range(workers)]
+
+    try:
+        logger.info("🔍 redis (поддельный RESP-сервер):")
+        results = []
+
+        winners = await race(services, calls)
+        results.append(report(f"гонка {workers}x{calls}", winners == 1, f"заняли {winners}"))
+        results.append(report(
+            "NOSCRIPT -> EVAL -> EVALSHA",
+            'EVAL' in server.commands and server.commands.count('EVALSHA') > 1
+        ))
+
+        can_use, remaining = await services[-1].check_cooldown(USER_ID, COMMAND, DURATION)
+        results.append(report("другой воркер видит кулдаун", not can_use and remaining > 0, f"{remaining} с"))
+
+        await services[0].set_cooldown(USER_ID, 'rate', DURATION)
+        await services[1].reset_cooldown(USER_ID)
+        results.append(report("сброс всех команд через SCAN + DEL", not server.data, f"ключей {len(server.data)}"))
+
+        winners = await race(services, calls)
+        results.append(report("после сброса снова один", winners == 1, f"заняли {winners}"))
+
+        results.append(report("глобальный кулдаун виден другому воркеру", await global_cooldown_shared(services)))
+
+        taken = await flood_race(services, calls)
+        results.append(report(f"корзина флуда {workers}x{calls}", taken == FLOOD_BURST, f"пропущено {taken} из {FLOOD_BURST}"))
+
+        # Ответ не пришёл за timeout: EVAL мог выполниться, повторять нельзя
+        client = services[0].backend.client
+        client.timeout = 0.2
+        server.reply_delay = 0.5
+        sent_before = len(server.commands)
+        try:
+            await services[0].backend.acquire(USER_ID + 3, COMMAND, datetime.utcnow() + timedelta(hours=1), 'normal')
+            timed_out = False
+        except asyncio.TimeoutError:
+            timed_out = True
+        await asyncio.sleep(server.reply_delay)
+        server.reply_delay = 0.0
+        sent = sum(1 for command in server.commands[sent_before:] if command in ('EVAL', 'EVALSHA'))
+        results.append(report("таймаут ответа без повторной отправки", timed_out and sent == 1, f"отправок {sent}"))
+
+        remaining = await services[0].backend.acquire(USER_ID + 3, COMMAND, datetime.utcnow() + timedelta(hours=1), 'normal')
+        results.append(report("новое соединение после таймаута", remaining > 0, f"{remaining} с"))
+
+        return all(results)
+    finally:
+        for service in services:
+            await service.backend.close()
+        await server.stop()
+
+
+async def check_database(workers: int, calls: int) -> bool:
+    services = [CooldownService(backend=DatabaseCooldownBackend()) for _ in range(workers)]
+
+    logger.info("🔍 database (временная SQLite):")
+    results = []
+
+    winners = await race(services, calls)
+    results.append(report(f"гонка {workers}x{calls}", winners == 1, f"заняли {winners}"))
+
+    can_use, remaining = await services[-1].check_cooldown(USER_ID, COMMAND, DURATION)
+    results.append(report("другой воркер видит кулдаун", not can_use and remaining > 0, f"{remaining} с"))
+
+    await services[0].reset_cooldown(USER_ID, COMMAND)
+    winners = await race(services, calls)
+    results.append(report("после сброса снова один", winners == 1, f"заняли {winners}"))
+
+    results.append(report("глобальный кулдаун виден другому воркеру", await global_cooldown_shared(services)))
+
+    taken = await flood_race(services, calls)
+    results.append(report(f"корзина флуда {workers}x{calls}", taken <= FLOOD_BURST, f"пропущено {taken} из {FLOOD_BURST}"))
+
+    return all(results)
+
+
+async def check_decorator_reset() -> bool:
+    """Упавшая команда не оставляет кулдаун (как до user-025)"""
+    service = CooldownService(backend=DatabaseCooldownBackend())
+    update = SimpleNamespace(effective_user=SimpleNamespace(id=USER_ID + 1))
+
+    @service.cooldown(seconds=DURATION, command_name='failing')
+    async def failing(update, context):
+        raise ValueError("command failed")
+
+    logger.info("🔍 декоратор:")
+    try:
+        await failing(update, None)
+    except ValueError:
+        pass
+
+    can_use, _ = await service.check_cooldown(USER_ID + 1, 'failing', DURATION)
+    return report("исключение в команде сбрасывает кулдаун", can_use)
+
+
+async def check_cooldown_backends(args) -> bool:
+    await setup_database()
+    try:
+        results = [
+            await check_redis(args.workers, args.calls),
+            await check_database(args.workers, args.calls),
+            await check_decorator_reset(),
+        ]
+    finally:
+        await teardown_database()
+
+    if all(results):
+        logger.info("✅ Все проверки хранилищ кулдаунов пройдены")
+        return True
+
+    logger.error("❌ Есть непройденные проверки")
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Гонка воркеров за кулдаун на redis и database хранилищах')
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--calls', type=int, default=5, help='вызовов try_acquire на воркер')
+
+    args = parser.parse_args()
+    success = asyncio.run(check_cooldown_backends(args))
+    sys.exit(0 if success else 1)
+
+
+if __name__ == "__main__":
+    main()
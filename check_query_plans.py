@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ПРОВЕРКА ПЛАНОВ ГОРЯЧИХ ЗАПРОСОВ КАТАЛОГА
+Запускает EXPLAIN для запросов CatalogService и завершается с ошибкой,
+если какой-то из них читает таблицу целиком (нет подходящего индекса)
+
+- SQLite: схема из models.py во временной БД в памяти с тестовыми данными,
+  полный просмотр - строка плана "SCAN <таблица>"
+- PostgreSQL (если DATABASE_URL указывает на него): схема рабочей БД,
+  enable_seqscan = off, полный просмотр - "Seq Scan" в плане
+  (при выключенном seqscan он остаётся только когда индекса нет)
+
+Использование:
+    python check_query_plans.py
+"""
+
+import asyncio
+import logging
+import sys
+from datetime import datetime, timedelta
+from typing import Callable, List, Tuple
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from config import Config
+from models import (
+    Base, CatalogPost, CatalogReview, CatalogSubscription, CatalogSession, CatalogNotification
+)
+from services.catalog_service import CatalogService
+from services.catalog_notifier import CatalogNotifier
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# ============= ГОРЯЧИЕ ЗАПРОСЫ =============
+# (название, построитель запроса) - построители самих CatalogService и CatalogNotifier
+
+NOW = datetime(2030, 1, 1)
+
+HOT_QUERIES: List[Tuple[str, Callable]] = [
+    ('сессия ленты', lambda: CatalogService._feed_session_query(1)),
+    ('лента: активные посты', lambda: CatalogService._feed_candidates_query()),
+    ('страница ленты по id', lambda: CatalogService._feed_page_query([3, 14, 15, 92, 65])),
+    ('статистика по категориям', lambda: CatalogService._category_stats_query()),
+    ('пост по номеру', lambda: CatalogService._post_by_number_query(1234)),
+    ('посты автора', lambda: CatalogService._user_posts_query(1)),
+    ('страница отзывов', lambda: CatalogService._reviews_page_query(1, 5)),
+    ('страница отзывов по курсору', lambda: CatalogService._reviews_page_query(1, 5, (NOW, 100))),
+    ('уникальные зрители', lambda: CatalogService._unique_viewers_query()),
+    ('подписчики категории', lambda: CatalogNotifier._subscribers_query(
+        1, 'cat1', 7, NOW, NOW + timedelta(minutes=2)
+    )),
+    ('очередь уведомлений', lambda: CatalogNotifier._due_users_query(NOW, 50)),
+]
+
+
+def compile_query(statement, dialect) -> str:
+    return str(statement.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+
+
+# ============= SQLITE =============
+
+async def seed_sqlite(conn):
+    """Несколько строк в каждой таблице, чтобы планировщик видел непустую схему"""
+    now = datetime.utcnow()
+
+    await conn.execute(insert(CatalogPost), [
+        {'user_id': i % 5, 'catalog_link': f'https://t.me/c/{i}', 'category': f'cat{i % 7}',
+         'name': f'post {i}', 'catalog_number': i, 'is_active': i % 10 != 0}
+        for i in range(1, 201)
+    ])
+    await conn.execute(insert(CatalogReview), [
+        {'catalog_post_id': i % 50 + 1, 'user_id': i, 'review_text': 'ok', 'rating': i % 5 + 1, 'created_at': now}
+        for i in range(200)
+    ])
+    await conn.execute(insert(CatalogSubscription), [
+        {'user_id': i, 'subscription_type': 'category', 'subscription_value': f'cat{i % 7}'}
+        for i in range(200)
+    ])
+    await conn.execute(insert(CatalogSession), [
+        {'user_id': i, 'session_active': i % 2 == 0, 'viewed_count': i % 3} for i in range(200)
+    ])
+    await conn.execute(insert(CatalogNotification), [
+        {'user_id': i, 'post_id': i % 50 + 1, 'category': 'cat1', 'next_attempt_at': now} for i in range(200)
+    ])
+    await conn.execute(text("ANALYZE"))
+
+
+async def check_sqlite() -> List[str]:
+    """Планы на схеме models.py в SQLite; возвращает список проблем"""
+    engine = create_async_engine('sqlite+aiosqlite:///:memory:')
+    problems = []
+
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await seed_sqlite(conn)
+
+            for name, build in HOT_QUERIES:
+                sql = compile_query(build(), conn.dialect)
+                plan = [row[3] for row in (await conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))).all()]
+
+                scans = [line for line in plan if line.startswith('SCAN ')]
+                if scans:
+                    problems.append(f"SQLite / {name}: {'; '.join(scans)}")
+                    logger.error(f"  ❌ {name}: {' | '.join(plan)}")
+                else:
+                    logger.info(f"  ✅ {name}: {' | '.join(plan)}")
+    finally:
+        await engine.dispose()
+
+    return problems
+
+
+# ============= POSTGRESQL =============
+
+async def check_postgres(db_url: str) -> List[str]:
+    """Планы на схеме рабочей БД PostgreSQL; возвращает список проблем"""
+    if db_url.startswith('postgresql://'):
+        db_url = db_url.replace('postgresql://', 'postgresql+asyncpg://', 1)
+    elif db_url.startswith('postgres://'):
+        db_url = db_url.replace('postgres://', 'postgresql+asyncpg://', 1)
+
+    engine = create_async_engine(db_url)
+    problems = []
+
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SET enable_seqscan = off"))
+
+            for name, build in HOT_QUERIES:
+                sql = compile_query(build(), conn.dialect)
+                plan = [row[0] for row in (await conn.execute(text(f"EXPLAIN {sql}"))).all()]
+
+                scans = [line.strip() for line in plan if 'Seq Scan' in line]
+                if scans:
+                    problems.append(f"PostgreSQL / {name}: {'; '.join(scans)}")
+                    logger.error(f"  ❌ {name}:\n" + "\n".join(plan))
+                else:
+                    logger.info(f"  ✅ {name}: {plan[0].strip()}")
+
+            await conn.rollback()
+    finally:
+        await engine.dispose()
+
+    return problems
+
+
+# ============= ЗАПУСК =============
+
+async def check_query_plans() -> bool:
+    logger.info("🔍 SQLite (схема models.py)...")
+    problems = await check_sqlite()
+
+    if 'postgres' in Config.DATABASE_URL:
+        logger.info("🔍 PostgreSQL (рабочая схема)...")
+        problems += await check_postgres(Config.DATABASE_URL)
+    else:
+        logger.info("⏭️ PostgreSQL пропущен: DATABASE_URL не указывает на PostgreSQL")
+
+    if problems:
+        logger.error(f"❌ Полный просмотр таблицы в {len(problems)} запросах:")
+        for problem in problems:
+            logger.error(f"  • {problem}")
+        return False
+
+    logger.info("✅ Все горячие запросы используют индексы")
+    return True
+
+
+if __name__ == "__main__":
+    success = asyncio.run(check_query_plans())
+    sys.exit(0 if success else 1)
@@ -71,6 +71,19 @@ class Config:
     
     COOLDOWN_SECONDS = int(os.getenv("COOLDOWN_SECONDS", "3600"))  # 1 час по умолчанию
     
+    # Хранилище кулдаунов и корзин защиты от флуда: memory (в процессе) | database | redis (общие для нескольких воркеров)
+    COOLDOWN_BACKEND = os.getenv("COOLDOWN_BACKEND", "memory").lower()
+    REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    
+    # Защита от флуда: ёмкость корзины (всплеск) и пополнение (токенов в секунду)
+    FLOOD_CONTROL_ENABLED = os.getenv("FLOOD_CONTROL_ENABLED", "true").lower() == "true"
+    FLOOD_CALLBACK_BURST = int(os.getenv("FLOOD_CALLBACK_BURST", "10"))
+    FLOOD_CALLBACK_RATE = float(os.getenv("FLOOD_CALLBACK_RATE", "2"))
+    FLOOD_COMMAND_BURST = int(os.getenv("FLOOD_COMMAND_BURST", "5"))
+    FLOOD_COMMAND_RATE = float(os.getenv("FLOOD_COMMAND_RATE", "0.5"))
+    FLOOD_MESSAGE_BURST = int(os.getenv("FLOOD_MESSAGE_BURST", "20"))
+    FLOOD_MESSAGE_RATE = float(os.getenv("FLOOD_MESSAGE_RATE", "1"))
+    
     # ============= АВТОПОСТИНГ =============
     
     SCHEDULER_MIN_INTERVAL = int(os.getenv("SCHEDULER_MIN", "120"))
@@ -37,6 +37,7 @@ ADMIN_CALLBACKS = {
     'stats_day': 'adm_st_d',
     'stats_week': 'adm_st_w',
     'stats_month': 'adm_st_m',
+    'stats_catalog_refresh': 'adm_st_cr',
 }
 
 # ============= SILENCE LIST =============
@@ -301,6 +302,7 @@ async def handle_admin_callback(update: Update, context: ContextTypes.DEFAULT_TY
         ADMIN_CALLBACKS['stats_day']: lambda q, c: show_period_stats(q, c, 'day'),
         ADMIN_CALLBACKS['stats_week']: lambda q, c: show_period_stats(q, c, 'week'),
         ADMIN_CALLBACKS['stats_month']: lambda q, c: show_period_stats(q, c, 'month'),
+        ADMIN_CALLBACKS['stats_catalog_refresh']: refresh_catalog_stats,
     }
     
     handler = handlers.get(action)
@@ -320,6 +322,7 @@ async def show_trixbot_stats(query, context):
             InlineKeyboardButton("📅 Неделя", callback_data=ADMIN_CALLBACKS['stats_week']),
             InlineKeyboardButton("📅 Месяц", callback_data=ADMIN_CALLBACKS['stats_month']),
         ],
+        [InlineKeyboardButton("🔄 Обновить каталог", callback_data=ADMIN_CALLBACKS['stats_catalog_refresh'])],
         [InlineKeyboardButton("◀️ Назад", callback_data=ADMIN_CALLBACKS['back'])]
     ]
     
@@ -340,12 +343,36 @@ async def show_trixbot_stats(query, context):
         for i, (cmd, count) in enumerate(top_commands)
     ])
     
+    # Снимок статистики, буфер счётчиков и кэш карточек каталога
+    from services.catalog_composer import catalog_composer
+    from services.catalog_counters import catalog_counters
+    from services.catalog_service import catalog_service
+    from services.catalog_stats import catalog_stats
+    from services.flood_control import flood_control
+    await catalog_stats.get()
+    counters = catalog_counters.get_stats()
+    post_cache = catalog_service.get_cache_stats()
+    ad_impressions = catalog_composer.get_stats()
+    flood = flood_control.get_stats()
+    
     text = (
         f"⚙️ **СТАТИСТИКА TRIXBOT**\n\n"
         f"👥 Всего пользователей: {total_users}\n"
         f"🟢 Активных 24ч: {active_24h}\n"
-        f"⌨️ Всего команд: {total_commands}\n\n"
-        f"🔝 **Топ-5 команд:**\n{top_text}"
+        f"⌨️ Всего команд: {total_commands}\n"
+        f"🚦 Отброшено флуда: {flood['throttled_total']} "
+        f"(кнопки {flood['throttled']['callback']}, команды {flood['throttled']['command']}, "
+        f"сообщения {flood['throttled']['message']})\n\n"
+        f"🔝 **Топ-5 команд:**\n{top_text}\n\n"
+        f"📂 **Каталог:**\n"
+        f"{catalog_stats.format_summary()}\n"
+        f"• Буфер счётчиков: {counters['pending_posts']} постов "
+        f"({counters['pending_views']} просм., {counters['pending_clicks']} кликов)\n"
+        f"• Задержка записи: {counters['flush_lag_seconds']}с\n"
+        f"• Кэш карточек: {post_cache['size']}/{post_cache['max_size']}, "
+        f"попаданий {post_cache['hits']}, промахов {post_cache['misses']} ({post_cache['hit_rate']}%)\n"
+        f"• Показы рекламы в ленте: {ad_impressions['impressions']} "
+        f"({ad_impressions['ads_shown']} объявл., {ad_impressions['sessions']} сессий)"
     )
     
     await query.edit_message_text(
@@ -354,6 +381,13 @@ async def show_trixbot_stats(query, context):
         parse_mode='Markdown'
     )
 
+async def refresh_catalog_stats(query, context):
+    """Принудительно обновить снимок статистики каталога"""
+    from services.catalog_stats import catalog_stats
+    
+    await catalog_stats.refresh()
+    await show_trixbot_stats(query, context)
+
 async def show_channels_stats(query, context):
     """Статистика каналов"""
     keyboard = [
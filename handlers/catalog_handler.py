@@ -1,12 +1,16 @@
+import asyncio
 import logging
 import re
-from typing import Optional, Dict
-from datetime import datetime
+import time
+from typing import Optional, Dict, List, Tuple
+from datetime import datetime, timedelta
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, Bot
 from telegram.ext import ContextTypes
-from telegram.error import TelegramError, BadRequest, Forbidden
+from telegram.error import TelegramError
+from telegram.helpers import escape_markdown
 from config import Config
 from services.catalog_service import catalog_service, CATALOG_CATEGORIES
+from services.catalog_media import catalog_media
 from services.cooldown import cooldown_service, CooldownType
 
 logger = logging.getLogger(__name__)
@@ -40,6 +44,8 @@ CATALOG_CALLBACKS = {
 REVIEW_COOLDOWN_HOURS = 8  # 8 часов кулдаун на ВСЕ отзывы
 REVIEW_MAX_LENGTH = 500
 REVIEW_MIN_LENGTH = 3
+REVIEWS_PAGE_SIZE = 5
+REVIEW_ACTIONS = {'reviews_menu', 'view_reviews', 'write_review'}
 
 # ============= REVIEW TRACKING =============
 # Хранит информацию о том, кто и какие карточки уже оценил
@@ -87,174 +93,282 @@ def get_navigation_keyboard() -> InlineKeyboardMarkup:
         [InlineKeyboardButton("🔍 Поиск", callback_data=CATALOG_CALLBACKS['search'])]
     ]
     return InlineKeyboardMarkup(keyboard)
-# ============= MEDIA EXTRACTION =============
+# ============= REVIEWS MENU =============
+# Курсор страницы отзывов (created_at, id) передаётся в callback_data как
+# "микросекунды:id" - следующая страница читается по индексу без OFFSET
 
-async def extract_media_from_link(bot: Bot, telegram_link: str) -> Optional[Dict]:
-    """Извлечение медиа из Telegram поста"""
-    try:
-        if not telegram_link or 't.me/' not in telegram_link:
-            return {'success': False, 'message': '❌ Неверная ссылка'}
-        
-        match = re.search(r't\.me/([^/]+)/(\d+)', telegram_link)
-        if not match:
-            return {'success': False, 'message': '❌ Не удалось извлечь данные'}
-        
-        channel_username = match.group(1).lstrip('@')
-        message_id = int(match.group(2))
-        
-        if channel_username.startswith('-'):
-            chat_id = int(channel_username)
-        elif channel_username.isdigit():
-            chat_id = int(f"-100{channel_username}")
-        else:
-            chat_id = f"@{channel_username}"
-        
-        logger.info(f"📥 Extracting from: {chat_id}/{message_id}")
-        
-        try:
-            await bot.get_chat(chat_id)
-        except (Forbidden, BadRequest) as e:
-            logger.error(f"❌ No access: {e}")
-            return {
-                'success': False,
-                'message': '❌ Бот не имеет доступа к каналу'
-            }
-        
+REVIEW_CURSOR_EPOCH = datetime(1970, 1, 1)
+
+def encode_review_cursor(cursor: Tuple[datetime, int]) -> str:
+    created_at, review_id = cursor
+    return f"{(created_at - REVIEW_CURSOR_EPOCH) // timedelta(microseconds=1)}:{review_id}"
+
+def decode_review_cursor(parts: List[str]) -> Optional[Tuple[datetime, int]]:
+    if len(parts) < 2 or not parts[0].isdigit() or not parts[1].isdigit():
+        return None
+    return REVIEW_CURSOR_EPOCH + timedelta(microseconds=int(parts[0])), int(parts[1])
+
+def format_rating_histogram(histogram: Dict[int, int], total: int) -> str:
+    """Гистограмма оценок: строка на каждую звезду"""
+    if not total:
+        return "Оценок пока нет"
+    
+    average = sum(star * count for star, count in histogram.items()) / total
+    peak = max(histogram.values()) or 1
+    
+    lines = [f"⭐ {average:.1f} ({total})"]
+    for star in sorted(histogram, reverse=True):
+        count = histogram[star]
+        filled = round(count / peak * 10)
+        lines.append(f"{star} ⭐ {'█' * filled}{'░' * (10 - filled)} {count}")
+    return "\n".join(lines)
+
+def build_reviews_menu(page: Dict) -> Tuple[str, InlineKeyboardMarkup]:
+    """Меню отзывов поста: гистограмма и действия"""
+    post = page['post']
+    
+    text = (
+        f"💬 Отзывы о #{post['catalog_number']}\n"
+        f"📝 {escape_markdown(post.get('name') or 'Без названия')}\n"
+        f"────────────────────\n"
+        f"{format_rating_histogram(page['histogram'], page['total'])}"
+    )
+    
+    keyboard = []
+    if page['reviews']:
+        keyboard.append([InlineKeyboardButton("📖 Читать отзывы", callback_data=f"{CATALOG_CALLBACKS['view_reviews']}:{post['id']}")])
+    keyboard.append([InlineKeyboardButton("✍️ Написать отзыв", callback_data=f"{CATALOG_CALLBACKS['write_review']}:{post['id']}")])
+    keyboard.append([InlineKeyboardButton("❌ Закрыть", callback_data=CATALOG_CALLBACKS['close_menu'])])
+    
+    return text, InlineKeyboardMarkup(keyboard)
+
+def build_reviews_page(page: Dict) -> Tuple[str, InlineKeyboardMarkup]:
+    """Страница отзывов с кнопкой перехода к следующей"""
+    post = page['post']
+    
+    lines = [f"💬 Отзывы о #{post['catalog_number']}", "────────────────────"]
+    for review in page['reviews']:
+        author = f"@{review['username']}" if review.get('username') else "Аноним"
+        date = datetime.fromisoformat(review['created_at']).strftime('%d.%m.%Y') if review.get('created_at') else ""
+        lines.append(f"{'⭐' * (review.get('rating') or 0)} {escape_markdown(author)} {date}")
+        lines.append(f"{escape_markdown(review.get('review_text') or '')}\n")
+    
+    if not page['reviews']:
+        lines.append("Больше отзывов нет")
+    
+    navigation = []
+    if page['next_cursor']:
+        navigation.append(InlineKeyboardButton(
+            "➡️ Дальше",
+            callback_data=f"{CATALOG_CALLBACKS['view_reviews']}:{post['id']}:{encode_review_cursor(page['next_cursor'])}"
+        ))
+    navigation.append(InlineKeyboardButton("↩️ Назад", callback_data=f"{CATALOG_CALLBACKS['reviews_menu']}:{post['id']}:e"))
+    
+    keyboard = [navigation, [InlineKeyboardButton("❌ Закрыть", callback_data=CATALOG_CALLBACKS['close_menu'])]]
+    
+    return "\n".join(lines), InlineKeyboardMarkup(keyboard)
+
+async def begin_review(context: ContextTypes.DEFAULT_TYPE, user_id: int, post: Dict) -> Tuple[str, Optional[InlineKeyboardMarkup]]:
+    """Начать отзыв: проверки и выбор оценки. (текст, клавиатура)"""
+    post_id = post['id']
+    catalog_number = post.get('catalog_number')
+    
+    if check_user_reviewed_post(user_id, post_id):
+        return "❌ Вы уже оценили этот пост", None
+    
+    can_review, remaining = await cooldown_service.check_cooldown(
+        user_id=user_id,
+        command='review',
+        duration=REVIEW_COOLDOWN_HOURS * 3600,
+        cooldown_type=CooldownType.NORMAL
+    )
+    
+    if not can_review:
+        hours = remaining // 3600
+        minutes = (remaining % 3600) // 60
+        return f"⏳ Следующий отзыв через {hours}ч {minutes}м", None
+    
+    context.user_data['catalog_review'] = {
+        'post_id': post_id,
+        'catalog_number': catalog_number,
+        'step': 'rating'
+    }
+    
+    keyboard = [
+        [
+            InlineKeyboardButton("1 ⭐", callback_data=f"{CATALOG_CALLBACKS['rate']}:1"),
+            InlineKeyboardButton("2 ⭐⭐", callback_data=f"{CATALOG_CALLBACKS['rate']}:2"),
+            InlineKeyboardButton("3 ⭐⭐⭐", callback_data=f"{CATALOG_CALLBACKS['rate']}:3")
+        ],
+        [
+            InlineKeyboardButton("4 ⭐⭐⭐⭐", callback_data=f"{CATALOG_CALLBACKS['rate']}:4"),
+            InlineKeyboardButton("5 ⭐⭐⭐⭐⭐", callback_data=f"{CATALOG_CALLBACKS['rate']}:5")
+        ],
+        [InlineKeyboardButton("↩️ Назад", callback_data=CATALOG_CALLBACKS['cancel_review'])]
+    ]
+    
+    text = (
+        f"⭐ Оценка поста #{catalog_number}\n"
+        f"────────────────────\n"
+        f"📝 {safe_markdown(post.get('name', 'Без названия'))}\n\n"
+        "Выберите оценку:"
+    )
+    
+    return text, InlineKeyboardMarkup(keyboard)
+
+# ============= SEND POST WITH MEDIA =============
+
+# ============= ДОСТАВКА КАРТОЧЕК =============
+
+# Одновременных отправок карточек во все чаты (лимиты Bot API)
+CATALOG_SEND_CONCURRENCY = 8
+
+_send_semaphore = asyncio.Semaphore(CATALOG_SEND_CONCURRENCY)
+_chat_sequences: Dict[int, list] = {}  # {chat_id: [Lock, страниц в очереди]}
+
+def prepare_catalog_card(post: Dict, index: int, total: int) -> Dict:
+    """Подготовка карточки каталога: текст, кнопки и медиа"""
+    catalog_number = post.get('catalog_number', '????')
+    
+    card_text = (
+        f"📄 Пост {catalog_number}\n"
+        f"├ 📁 {post.get('category', 'Не указана')}\n"
+        f"├ 📝 {post.get('name', 'Без названия')}\n"
+    )
+    
+    tags = post.get('tags', [])
+    if tags and isinstance(tags, list):
+        pattern = r'[^\w\-]'
+        clean_tags = [
+            f"#{re.sub(pattern, '', str(tag).replace(' ', '_'))}"
+            for tag in tags[:3]
+            if tag
+        ]
+        if clean_tags:
+            card_text += f"├ 🏷️ {' '.join(clean_tags)}\n"
+    
+    review_count = post.get('review_count', 0)
+    if review_count >= 5:
+        rating = post.get('rating', 0)
+        stars = "⭐" * min(5, int(rating))
+        card_text += f"├ ⭐ {stars} {rating:.1f} ({review_count})\n"
+    else:
+        card_text += f"├ ⭐ —\n"
+    
+    card_text += f"└ 📍 {index}/{total}"
+
+    keyboard = [
+        [
+            InlineKeyboardButton("🔗 Перейти", url=post.get('catalog_link', '#')),
+            InlineKeyboardButton("💬 Отзывы", 
+                               callback_data=f"{CATALOG_CALLBACKS['reviews_menu']}:{post.get('id')}")
+        ]
+    ]
+    
+    return {
+        'post_id': post.get('id'),
+        'text': card_text,
+        'reply_markup': InlineKeyboardMarkup(keyboard),
+        'is_ad': bool(post.get('is_ad')),
+        'media_type': post.get('media_type'),
+        'media_file_id': post.get('media_file_id')
+    }
+
+async def _send_card(bot: Bot, chat_id: int, card: Dict) -> bool:
+    """Отправка подготовленной карточки (медиа, при ошибке - текстом)"""
+    async with _send_semaphore:
         try:
-            forwarded = await bot.forward_message(
-                chat_id=Config.MODERATION_GROUP_ID,
-                from_chat_id=chat_id,
-                message_id=message_id
-            )
-            
-            result = None
-            media_map = {
-                'photo': lambda m: {'type': 'photo', 'file_id': m.photo[-1].file_id},
-                'video': lambda m: {'type': 'video', 'file_id': m.video.file_id},
-                'document': lambda m: {'type': 'document', 'file_id': m.document.file_id},
-                'animation': lambda m: {'type': 'animation', 'file_id': m.animation.file_id},
-            }
-            
-            for media_type, extractor in media_map.items():
-                if getattr(forwarded, media_type, None):
-                    media_data = extractor(forwarded)
-                    result = {
-                        'success': True,
-                        **media_data,
-                        'media_group_id': forwarded.media_group_id,
-                        'media_json': [media_data['file_id']],
-                        'message': f'✅ {media_type.title()} импортировано'
-                    }
-                    break
+            media_type = card['media_type']
+            media_file_id = card['media_file_id']
             
-            if not result:
-                result = {
-                    'success': False,
-                    'message': '⚠️ Медиа не найдено в посте'
+            if media_file_id and media_type:
+                send_funcs = {
+                    'photo': bot.send_photo,
+                    'video': bot.send_video,
+                    'document': bot.send_document,
+                    'animation': bot.send_animation,
                 }
+                
+                send_func = send_funcs.get(media_type)
+                if send_func:
+                    try:
+                        await send_func(
+                            chat_id=chat_id,
+                            **{media_type: media_file_id},
+                            caption=card['text'],
+                            reply_markup=card['reply_markup']
+                        )
+                        return True
+                    except TelegramError:
+                        pass
             
-            try:
-                await bot.delete_message(
-                    chat_id=Config.MODERATION_GROUP_ID,
-                    message_id=forwarded.message_id
-                )
-            except Exception:
-                pass
-            
-            return result
-            
-        except (BadRequest, Forbidden) as e:
-            logger.error(f"❌ Forward failed: {e}")
-            return {
-                'success': False,
-                'message': '❌ Не удалось импортировать медиа'
-            }
+            await bot.send_message(
+                chat_id=chat_id,
+                text=card['text'],
+                reply_markup=card['reply_markup'],
+                disable_web_page_preview=True
+            )
+            return True
             
-    except Exception as e:
-        logger.error(f"❌ Media extraction error: {e}", exc_info=True)
-        return {'success': False, 'message': f'❌ Ошибка: {str(e)[:100]}'}
-
-# ============= SEND POST WITH MEDIA =============
+        except Exception as e:
+            logger.error(f"Error sending catalog post: {e}")
+            return False
 
-async def send_catalog_post(bot: Bot, chat_id: int, post: Dict, index: int, total: int) -> bool:
-    """Отправка карточки каталога"""
+async def send_catalog_page(bot: Bot, chat_id: int, posts: List[Dict]) -> int:
+    """
+    Отправка страницы каталога
+    
+    Все карточки готовятся заранее из данных поста, без запросов к Bot API:
+    карточка без media_file_id уходит текстом со ссылкой на пост (file_id
+    записывается в пост при добавлении или backfill_catalog_media.py).
+    Очередь чата держится только на время самих send_*: Telegram
+    показывает сообщения в порядке получения, поэтому внутри чата
+    карточки идут последовательно, а страницы разных чатов - параллельно
+    (не больше CATALOG_SEND_CONCURRENCY отправок одновременно).
+    
+    Returns:
+        int: сколько карточек отправлено
+    """
+    cards = [prepare_catalog_card(post, i, len(posts)) for i, post in enumerate(posts, 1)]
+    started = time.monotonic()
+    
+    sequence = _chat_sequences.setdefault(chat_id, [asyncio.Lock(), 0])
+    sequence[1] += 1
+    
+    sent_ids = []
     try:
-        catalog_number = post.get('catalog_number', '????')
-        
-        card_text = (
-            f"📄 Пост {catalog_number}\n"
-            f"├ 📁 {post.get('category', 'Не указана')}\n"
-            f"├ 📝 {post.get('name', 'Без названия')}\n"
-        )
-        
-        tags = post.get('tags', [])
-        if tags and isinstance(tags, list):
-            pattern = r'[^\w\-]'
-            clean_tags = [
-                f"#{re.sub(pattern, '', str(tag).replace(' ', '_'))}"
-                for tag in tags[:3]
-                if tag
-            ]
-            if clean_tags:
-                card_text += f"├ 🏷️ {' '.join(clean_tags)}\n"
-        
-        review_count = post.get('review_count', 0)
-        if review_count >= 5:
-            rating = post.get('rating', 0)
-            stars = "⭐" * min(5, int(rating))
-            card_text += f"├ ⭐ {stars} {rating:.1f} ({review_count})\n"
-        else:
-            card_text += f"├ ⭐ —\n"
-        
-        card_text += f"└ 📍 {index}/{total}"
+        async with sequence[0]:
+            for card in cards:
+                if await _send_card(bot, chat_id, card):
+                    sent_ids.append(card['post_id'])
+    finally:
+        sequence[1] -= 1
+        if sequence[1] == 0:
+            _chat_sequences.pop(chat_id, None)
+    
+    for post_id in sent_ids:
+        await catalog_service.increment_views(post_id, chat_id)
+    
+    sent = set(sent_ids)
+    catalog_service.record_ad_impressions(
+        chat_id, [card['post_id'] for card in cards if card['is_ad'] and card['post_id'] in sent]
+    )
+    
+    elapsed_ms = int((time.monotonic() - started) * 1000)
+    logger.info(f"Catalog page sent to {chat_id}: {len(sent_ids)}/{len(cards)} cards in {elapsed_ms}ms")
+    return len(sent_ids)
 
-        keyboard = [
-            [
-                InlineKeyboardButton("🔗 Перейти", url=post.get('catalog_link', '#')),
-                InlineKeyboardButton("💬 Отзывы", 
-                                   callback_data=f"{CATALOG_CALLBACKS['reviews_menu']}:{post.get('id')}")
-            ]
-        ]
-        # ... остальной код без изменений
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        media_type = post.get('media_type')
-        media_file_id = post.get('media_file_id')
-        
-        if media_file_id and media_type:
-            send_funcs = {
-                'photo': bot.send_photo,
-                'video': bot.send_video,
-                'document': bot.send_document,
-                'animation': bot.send_animation,
-            }
-            
-            send_func = send_funcs.get(media_type)
-            if send_func:
-                try:
-                    await send_func(
-                        chat_id=chat_id,
-                        **{media_type: media_file_id},
-                        caption=card_text,
-                        reply_markup=reply_markup
-                    )
-                    await catalog_service.increment_views(post.get('id'), chat_id)
-                    return True
-                except TelegramError:
-                    pass
-        
-        await bot.send_message(
-            chat_id=chat_id,
-            text=card_text,
-            reply_markup=reply_markup,
-            disable_web_page_preview=True
-        )
-        await catalog_service.increment_views(post.get('id'), chat_id)
-        return True
-        
-    except Exception as e:
-        logger.error(f"Error sending catalog post: {e}")
+async def send_catalog_post(bot: Bot, chat_id: int, post: Dict, index: int, total: int) -> bool:
+    """Отправка одной карточки каталога"""
+    card = prepare_catalog_card(post, index, total)
+    if not await _send_card(bot, chat_id, card):
         return False
+    
+    await catalog_service.increment_views(post.get('id'), chat_id)
+    if card['is_ad']:
+        catalog_service.record_ad_impressions(chat_id, [card['post_id']])
+    return True
+
 # ============= COMMANDS =============
 
 async def catalog_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -275,8 +389,7 @@ async def catalog_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
     
-    for i, post in enumerate(posts, 1):
-        await send_catalog_post(context.bot, update.effective_chat.id, post, i, len(posts))
+    await send_catalog_page(context.bot, update.effective_chat.id, posts)
     
     await update.message.reply_text(
         f"### Результаты\n\n"
@@ -324,52 +437,8 @@ async def review_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(f"❌ Пост #{catalog_number} не найден")
         return
     
-    post_id = post['id']
-    
-    if check_user_reviewed_post(user_id, post_id):
-        await update.message.reply_text(f"❌ Вы уже оценили этот пост")
-        return
-    
-    can_review, remaining = await cooldown_service.check_cooldown(
-        user_id=user_id,
-        command='review',
-        duration=REVIEW_COOLDOWN_HOURS * 3600,
-        cooldown_type=CooldownType.NORMAL
-    )
-    
-    if not can_review:
-        hours = remaining // 3600
-        minutes = (remaining % 3600) // 60
-        await update.message.reply_text(f"⏳ Следующий отзыв через {hours}ч {minutes}м")
-        return
-    
-    context.user_data['catalog_review'] = {
-        'post_id': post_id,
-        'catalog_number': catalog_number,
-        'step': 'rating'
-    }
-    
-    keyboard = [
-        [
-            InlineKeyboardButton("1 ⭐", callback_data=f"{CATALOG_CALLBACKS['rate']}:1"),
-            InlineKeyboardButton("2 ⭐⭐", callback_data=f"{CATALOG_CALLBACKS['rate']}:2"),
-            InlineKeyboardButton("3 ⭐⭐⭐", callback_data=f"{CATALOG_CALLBACKS['rate']}:3")
-        ],
-        [
-            InlineKeyboardButton("4 ⭐⭐⭐⭐", callback_data=f"{CATALOG_CALLBACKS['rate']}:4"),
-            InlineKeyboardButton("5 ⭐⭐⭐⭐⭐", callback_data=f"{CATALOG_CALLBACKS['rate']}:5")
-        ],
-        [InlineKeyboardButton("↩️ Назад", callback_data=CATALOG_CALLBACKS['cancel_review'])]
-    ]
-    
-    await update.message.reply_text(
-        f"⭐ Оценка поста #{catalog_number}\n"
-        f"────────────────────\n"
-        f"📝 {safe_markdown(post.get('name', 'Без названия'))}\n\n"
-        "Выберите оценку:",
-        reply_markup=InlineKeyboardMarkup(keyboard),
-        parse_mode='Markdown'
-    )
+    text, keyboard = await begin_review(context, user_id, post)
+    await update.message.reply_text(text, reply_markup=keyboard, parse_mode='Markdown')
 
 async def categoryfollow_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
@@ -492,7 +561,6 @@ async def handle_catalog_media(update: Update, context: ContextTypes.DEFAULT_TYP
 async def handle_catalog_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработка всех callback каталога"""
     query = update.callback_query
-    await query.answer()
     
     data_parts = query.data.split(":")
     
@@ -501,6 +569,11 @@ async def handle_catalog_callback(update: Update, context: ContextTypes.DEFAULT_
     else:
         action = data_parts[0]
     
+    # Отзывы отвечают на callback сами - при ошибке alert'ом
+    # (второй query.answer() Telegram игнорирует)
+    if action not in REVIEW_ACTIONS:
+        await query.answer()
+    
     user_id = update.effective_user.id
     
     async def safe_edit(text, keyboard=None):
@@ -523,8 +596,7 @@ async def handle_catalog_callback(update: Update, context: ContextTypes.DEFAULT_
             ]
             await safe_edit("✅ Все посты просмотрены!\n\nНажмите 🔄 для сброса", InlineKeyboardMarkup(keyboard))
         else:
-            for i, post in enumerate(posts, 1):
-                await send_catalog_post(context.bot, query.message.chat_id, post, i, len(posts))
+            await send_catalog_page(context.bot, query.message.chat_id, posts)
             await query.message.delete()
     
     elif action == 'finish':
@@ -581,6 +653,47 @@ async def handle_catalog_callback(update: Update, context: ContextTypes.DEFAULT_
         context.user_data.pop('catalog_review', None)
         await safe_edit("❌ Отзыв отменён")
     
+    elif action == 'reviews_menu':
+        post_id = int(data_parts[1]) if len(data_parts) > 1 and data_parts[1].isdigit() else None
+        page = await catalog_service.get_reviews_page(post_id, limit=1) if post_id else None
+        if not page:
+            await query.answer("❌ Пост не найден", show_alert=True)
+            return
+        
+        await query.answer()
+        text, keyboard = build_reviews_menu(page)
+        if len(data_parts) > 2 and data_parts[2] == 'e':
+            await safe_edit(text, keyboard)
+        else:
+            await query.message.reply_text(text, reply_markup=keyboard, parse_mode='Markdown')
+    
+    elif action == 'view_reviews':
+        post_id = int(data_parts[1]) if len(data_parts) > 1 and data_parts[1].isdigit() else None
+        before = decode_review_cursor(data_parts[2:])
+        page = await catalog_service.get_reviews_page(post_id, limit=REVIEWS_PAGE_SIZE, before=before) if post_id else None
+        if not page:
+            await query.answer("❌ Пост не найден", show_alert=True)
+            return
+        
+        await query.answer()
+        await safe_edit(*build_reviews_page(page))
+    
+    elif action == 'write_review':
+        post_id = int(data_parts[1]) if len(data_parts) > 1 and data_parts[1].isdigit() else None
+        post = await catalog_service.get_post_by_id(post_id) if post_id else None
+        if not post:
+            await query.answer("❌ Пост не найден", show_alert=True)
+            return
+        
+        await query.answer()
+        await safe_edit(*await begin_review(context, user_id, post))
+    
+    elif action == 'close_menu':
+        try:
+            await query.message.delete()
+        except TelegramError:
+            pass
+    
     elif action == 'cancel':
         context.user_data.pop('catalog_add', None)
         await safe_edit("❌ Добавление отменено")
@@ -623,8 +736,7 @@ async def handle_catalog_text(update: Update, context: ContextTypes.DEFAULT_TYPE
         posts = await catalog_service.search_posts(query_text, limit=10)
         
         if posts:
-            for i, post in enumerate(posts, 1):
-                await send_catalog_post(context.bot, update.effective_chat.id, post, i, len(posts))
+            await send_catalog_page(context.bot, update.effective_chat.id, posts)
             
             # ПОСТОЯННАЯ НАВИГАЦИЯ
             await update.message.reply_text(
@@ -699,20 +811,27 @@ async def handle_catalog_text(update: Update, context: ContextTypes.DEFAULT_TYPE
         
         if step == 'link':
             if text.startswith('https://t.me/'):
-                data['catalog_link'] = text
+                # Несколько ссылок (альбом из нескольких сообщений): карточка - по первой,
+                # медиа всех - одной пачкой через кэш
+                links = [link for link in text.split() if link.startswith('https://t.me/')]
+                data['catalog_link'] = links[0]
                 
                 await update.message.reply_text("⏳ Импортирую медиа...")
                 
-                media_result = await extract_media_from_link(context.bot, text)
+                resolved = await catalog_media.resolve_many(context.bot, links)
+                media = [resolved[link] for link in links if resolved[link].get('success')]
                 
-                if media_result and media_result.get('success'):
+                if media:
                     data.update({
-                        'media_type': media_result['type'],
-                        'media_file_id': media_result['file_id'],
-                        'media_group_id': media_result.get('media_group_id'),
-                        'media_json': media_result.get('media_json', [])
+                        'media_type': media[0]['type'],
+                        'media_file_id': media[0]['file_id'],
+                        'media_group_id': media[0].get('media_group_id'),
+                        'media_json': [item['file_id'] for item in media]
                     })
-                    await update.message.reply_text(f"✅ Медиа импортировано: {media_result['type']}")
+                    await update.message.reply_text(
+                        f"✅ Медиа импортировано: {media[0]['type']}"
+                        + (f" (+{len(media) - 1})" if len(media) > 1 else "")
+                    )
                 
                 data['step'] = 'category'
                 
@@ -39,8 +39,11 @@ rating_data = {
     'posts': {},
     'profiles': {},
     'user_votes': {},  # {user_id: {post_id: vote_value}}
+    'link_index': {},  # {published_link: post_id} - для рейтинга в каталоге
 }
 
+VOTE_VALUES = (-2, -1, 0, 1, 2)
+
 # ============= HELPER FUNCTIONS =============
 
 def safe_markdown(text: str) -> str:
@@ -136,28 +139,42 @@ async def check_vote_limit(user_id: int, post_id: int) -> bool:
     
     return post_id not in rating_data['user_votes'][user_id]
 
+def record_vote(post: Dict, user_id: int, vote_value: int) -> Optional[int]:
+    """Записать голос в пост и обновить накопленные итоги; возвращает прежний голос"""
+    votes = post.setdefault('votes', {})
+    vote_counts = post.setdefault('vote_counts', {value: 0 for value in VOTE_VALUES})
+    previous = votes.get(user_id)
+    
+    if previous is not None:
+        post['total_score'] = post.get('total_score', 0) - previous
+        if previous in vote_counts:
+            vote_counts[previous] -= 1
+    else:
+        post['vote_count'] = post.get('vote_count', 0) + 1
+    
+    votes[user_id] = vote_value
+    post['total_score'] = post.get('total_score', 0) + vote_value
+    if vote_value in vote_counts:
+        vote_counts[vote_value] += 1
+    
+    return previous
+
+def get_rating_totals(published_link: str) -> Optional[tuple]:
+    """Итоги голосования по ссылке на опубликованный пост: (total_score, vote_count)"""
+    post_id = rating_data['link_index'].get(published_link)
+    post = rating_data['posts'].get(post_id) if post_id is not None else None
+    
+    if not post:
+        return None
+    
+    return post.get('total_score', 0), post.get('vote_count', 0)
+
 async def generate_catalog_number() -> int:
-    """Генерация уникального номера каталога"""
-    from services.catalog_service import catalog_service
-    from services.db import db
-    from models import CatalogPost
-    from sqlalchemy import select
+    """Резервирование уникального номера каталога (до одобрения заявки)"""
+    from services.catalog_numbers import catalog_numbers
     
     try:
-        async with db.get_session() as session:
-            for _ in range(100):
-                number = random.randint(1, 9999)
-                
-                result = await session.execute(
-                    select(CatalogPost.id).where(CatalogPost.catalog_number == number)
-                )
-                
-                if not result.scalar_one_or_none():
-                    used = any(p.get('catalog_number') == number for p in rating_data['posts'].values())
-                    if not used:
-                        return number
-            
-            raise Exception("Could not generate number")
+        return await catalog_numbers.allocate()
     except Exception as e:
         logger.error(f"Error generating number: {e}")
         return random.randint(1000, 9999)
@@ -406,6 +423,9 @@ async def publish_rate_post(update: Update, context: ContextTypes.DEFAULT_TYPE):
             'catalog_number': catalog_number,
             'created_at': datetime.now(),
             'votes': {},
+            'total_score': 0,
+            'vote_count': 0,
+            'vote_counts': {value: 0 for value in VOTE_VALUES},
             'status': 'pending'
         }
         
@@ -610,13 +630,14 @@ async def approve_rating_post(update: Update, context: ContextTypes.DEFAULT_TYPE
         post['published_channel_id'] = BUDAPEST_PEOPLE_ID
         post['status'] = 'published'
         post['published_link'] = f"https://t.me/c/{str(BUDAPEST_PEOPLE_ID)[4:]}/{msg.message_id}"
+        rating_data['link_index'][post['published_link']] = post_id
         
         # Добавляем в каталог
         from services.catalog_service import catalog_service
         
         category = '👱🏻‍♀️ TopGirls' if post['gender'] == 'girl' else '🤵🏼‍♂️ TopBoys'
         
-        catalog_post_id = await catalog_service.add_post(
+        await catalog_service.add_post(
             user_id=post['author_user_id'],
             catalog_link=post['published_link'],
             category=category,
@@ -627,22 +648,10 @@ async def approve_rating_post(update: Update, context: ContextTypes.DEFAULT_TYPE
             media_group_id=None,
             media_json=[post['media_file_id']],
             author_username=post.get('author_username'),
-            author_id=post['author_user_id']
+            author_id=post['author_user_id'],
+            catalog_number=post['catalog_number']
         )
         
-        if catalog_post_id:
-            from services.db import db
-            from models import CatalogPost
-            from sqlalchemy import update as sql_update
-            
-            async with db.get_session() as session:
-                await session.execute(
-                    sql_update(CatalogPost)
-                    .where(CatalogPost.id == catalog_post_id)
-                    .values(catalog_number=post['catalog_number'])
-                )
-                await session.commit()
-        
         await query.edit_message_reply_markup(reply_markup=None)
         await query.edit_message_caption(
             caption=f"{query.message.caption}\n\n✅ *ОПУБЛИКОВАНО*",
@@ -687,6 +696,9 @@ async def reject_rating_post(update: Update, context: ContextTypes.DEFAULT_TYPE,
         
         del rating_data['posts'][post_id]
         
+        from services.catalog_numbers import catalog_numbers
+        await catalog_numbers.release(post.get('catalog_number'))
+        
         await query.edit_message_reply_markup(reply_markup=None)
         await query.edit_message_caption(
             caption=f"{query.message.caption}\n\n❌ *ОТКЛОНЕНО*",
@@ -735,36 +747,24 @@ async def handle_vote(update: Update, context: ContextTypes.DEFAULT_TYPE, post_i
     
     rating_data['user_votes'][user_id][post_id] = vote_value
     
-    # Обновляем голоса поста
-    if 'votes' not in post:
-        post['votes'] = {}
-    
-    post['votes'][user_id] = vote_value
+    # Обновляем голоса поста и накопленные итоги
+    previous = record_vote(post, user_id, vote_value)
     
     # Обновляем профиль
     profile_url = post.get('profile_url')
     if profile_url and profile_url in rating_data['profiles']:
         profile = rating_data['profiles'][profile_url]
         
-        # Пересчитываем общий рейтинг
-        all_votes = []
-        for pid in profile.get('post_ids', []):
-            if pid in rating_data['posts']:
-                all_votes.extend(rating_data['posts'][pid].get('votes', {}).values())
-        
-        profile['total_score'] = sum(all_votes)
-        profile['vote_count'] = len(all_votes)
+        if previous is not None:
+            profile['total_score'] -= previous
+        else:
+            profile['vote_count'] += 1
+        profile['total_score'] += vote_value
     
     # Обновляем кнопки
-    votes = post.get('votes', {})
-    vote_counts = {-2: 0, -1: 0, 0: 0, 1: 0, 2: 0}
-    
-    for v in votes.values():
-        if v in vote_counts:
-            vote_counts[v] += 1
-    
-    total_score = sum(votes.values())
-    vote_count = len(votes)
+    vote_counts = post['vote_counts']
+    total_score = post['total_score']
+    vote_count = post['vote_count']
     
     keyboard = [
         [
@@ -120,8 +120,17 @@ async def init_database():
             
             async with engine.begin() as conn:
                 await conn.run_sync(Base.metadata.create_all)
+                
+                # create_all не добавляет индексы в уже существующие таблицы
+                await conn.run_sync(
+                    lambda sync_conn: [
+                        index.create(sync_conn, checkfirst=True)
+                        for table in Base.metadata.sorted_tables
+                        for index in table.indexes
+                    ]
+                )
             
-            logger.info("✅ Database tables created successfully")
+            logger.info("✅ Database tables and indexes created successfully")
         except Exception as create_error:
             logger.error(f"❌ Failed to create tables: {create_error}")
             raise
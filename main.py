@@ -8,7 +8,7 @@ import asyncio
 from telegram import Update
 from telegram.ext import (
     Application, CommandHandler, MessageHandler, 
-    CallbackQueryHandler, filters, ContextTypes
+    CallbackQueryHandler, TypeHandler, filters, ContextTypes
 )
 from dotenv import load_dotenv
 from config import Config
@@ -82,6 +82,10 @@ from services.admin_notifications import admin_notifications
 from services.stats_scheduler import stats_scheduler
 from services.channel_stats import channel_stats
 from services.cooldown import cooldown_service
+from services.catalog_counters import catalog_counters
+from services.catalog_notifier import catalog_notifier
+from services.catalog_stats import catalog_stats
+from services.flood_control import flood_control
 from services.db import db
 
 load_dotenv()
@@ -375,15 +379,29 @@ def main():
     autopost_service.set_bot(application.bot)
     admin_notifications.set_bot(application.bot)
     channel_stats.set_bot(application.bot)
+    catalog_notifier.set_bot(application.bot)
     stats_scheduler.set_admin_notifications(admin_notifications)
     
     # Start cooldown cleanup
     loop.create_task(cooldown_service.start_cleanup_task())
     
+    # Start catalog views/clicks buffer flush
+    loop.create_task(catalog_counters.start())
+    
+    # Start catalog stats snapshot refresh
+    loop.create_task(catalog_stats.start())
+    
+    # Start catalog subscription notifications delivery
+    loop.create_task(catalog_notifier.start())
+    
     logger.info("✅ Services initialized")
     
     # ============= REGISTER HANDLERS =============
     
+    # Flood control: группа -1 видит обновление раньше всех обработчиков
+    if Config.FLOOD_CONTROL_ENABLED:
+        application.add_handler(TypeHandler(Update, flood_control.handle_update), group=-1)
+    
     # Start and basic commands
     application.add_handler(CommandHandler("start", start_command, filters=budapest_filter))
     application.add_handler(CommandHandler("id", id_command, filters=budapest_filter))
@@ -492,9 +510,11 @@ def main():
     print("="*50 + "\n")
     
     try:
+        # close_loop=False: цикл нужен ниже, чтобы остановить сервисы и сбросить буферы
         application.run_polling(
             allowed_updates=["message", "callback_query"],
-            drop_pending_updates=True
+            drop_pending_updates=True,
+            close_loop=False
         )
     except KeyboardInterrupt:
         logger.info("Received KeyboardInterrupt")
@@ -509,6 +529,9 @@ def main():
             loop.run_until_complete(stats_scheduler.stop())
             loop.run_until_complete(autopost_service.stop())
             loop.run_until_complete(cooldown_service.stop_cleanup_task())
+            loop.run_until_complete(catalog_notifier.stop())
+            loop.run_until_complete(catalog_stats.stop())
+            loop.run_until_complete(catalog_counters.stop())
             loop.run_until_complete(db.close())
             print("✅ Cleanup complete")
         except Exception as cleanup_error:
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+МИГРАЦИЯ КАТАЛОГА БЕЗ ПОТЕРИ ДАННЫХ
+Добавляет недостающие колонки в существующие таблицы и пересчитывает
+денормализованные данные (в отличие от migrate_complete.py ничего не удаляет)
+
+Использование:
+    python migrate_catalog.py                  - миграция + индексы + перенос данных + пересчёт рейтингов
+    python migrate_catalog.py --check-ratings  - только проверка сводки рейтингов
+"""
+
+import asyncio
+import logging
+import sys
+from sqlalchemy import text, inspect
+from config import Config
+from services.db import db
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# ============= НОВЫЕ КОЛОНКИ =============
+# {таблица: [колонки]} - тип и DEFAULT берутся из models.py под диалект БД
+CATALOG_COLUMNS = {
+    'catalog_posts': [
+        'rating_sum', 'rating_count',
+        'rating_star_1', 'rating_star_2', 'rating_star_3', 'rating_star_4', 'rating_star_5',
+    ],
+    'catalog_sessions': [
+        'feed_seed', 'feed_packed', 'feed_cursor',
+        'viewed_packed', 'viewed_count',
+    ],
+    'catalog_notifications': ['claimed_by'],
+}
+
+
+def column_ddl(table: str, name: str, dialect) -> str:
+    """DDL колонки для ALTER TABLE по описанию в models.py"""
+    from models import Base
+
+    column = Base.metadata.tables[table].c[name]
+    ddl = f"{name} {column.type.compile(dialect=dialect)}"
+
+    default = column.default.arg if column.default is not None and column.default.is_scalar else None
+    if isinstance(default, bool):
+        ddl += f" DEFAULT {'TRUE' if default else 'FALSE'}"
+    elif isinstance(default, (int, float)):
+        ddl += f" DEFAULT {default}"
+
+    return ddl
+
+
+async def add_missing_columns() -> int:
+    """Создать недостающие таблицы и добавить недостающие колонки"""
+    from models import Base
+
+    async with db.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+        existing = await conn.run_sync(
+            lambda sync_conn: {
+                table: {column['name'] for column in inspect(sync_conn).get_columns(table)}
+                for table in CATALOG_COLUMNS
+            }
+        )
+
+        added = 0
+        for table, columns in CATALOG_COLUMNS.items():
+            for name in columns:
+                if name in existing[table]:
+                    continue
+
+                await conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column_ddl(table, name, conn.dialect)}"))
+                logger.info(f"  ✅ {table}.{name} добавлена")
+                added += 1
+
+    return added
+
+
+# ============= ИНДЕКСЫ =============
+# Таблицы, индексы которых (__table_args__ в models.py) создаются на существующей БД
+CATALOG_INDEX_TABLES = ['catalog_posts', 'catalog_reviews', 'catalog_subscriptions', 'catalog_sessions']
+
+# Индексы, заменённые составными из models.py, и лишние (catalog_sessions.user_id уже UNIQUE)
+OBSOLETE_INDEXES = ['idx_catalog_reviews_post_id', 'idx_catalog_sessions_user_active']
+
+
+async def create_model_indexes() -> int:
+    """Создать индексы из models.py на уже существующих таблицах"""
+    from models import Base
+
+    async with db.engine.begin() as conn:
+        existing = await conn.run_sync(
+            lambda sync_conn: {
+                table: {index['name'] for index in inspect(sync_conn).get_indexes(table)}
+                for table in CATALOG_INDEX_TABLES
+            }
+        )
+
+        created = 0
+        for table in CATALOG_INDEX_TABLES:
+            for index in Base.metadata.tables[table].indexes:
+                if index.name in existing[table]:
+                    continue
+
+                await conn.run_sync(lambda sync_conn: index.create(sync_conn))
+                logger.info(f"  ✅ {table}.{index.name} создан")
+                created += 1
+
+        for name in OBSOLETE_INDEXES:
+            await conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+    return created
+
+
+async def create_search_index() -> bool:
+    """GIN-индексы полнотекстового и нечёткого поиска (только PostgreSQL)"""
+    from services.catalog_search import CATALOG_FTS_INDEX_SQL, CATALOG_TRGM_INDEX_SQLS
+
+    async with db.engine.begin() as conn:
+        if conn.dialect.name != 'postgresql':
+            return False
+
+        for statement in [CATALOG_FTS_INDEX_SQL, *CATALOG_TRGM_INDEX_SQLS]:
+            await conn.execute(text(statement))
+
+    return True
+
+
+async def migrate_catalog(check_only: bool = False) -> bool:
+    """Миграция каталога: колонки, пересчёт рейтингов, проверка"""
+    from services.catalog_service import catalog_service
+
+    try:
+        logger.info(f"📊 Database: {Config.DATABASE_URL[:50]}...")
+
+        await db.init()
+
+        if not db.engine or not db.session_maker:
+            logger.error("❌ Database initialization failed")
+            return False
+
+        if not check_only:
+            logger.info("🔨 Добавляю недостающие колонки...")
+            added = await add_missing_columns()
+            logger.info(f"✅ Добавлено колонок: {added}")
+
+            created = await create_model_indexes()
+            logger.info(f"✅ Создано индексов: {created}")
+
+            if await create_search_index():
+                logger.info("✅ Индексы поиска созданы")
+
+            logger.info("🔄 Упаковываю просмотренные посты сессий...")
+            migrated = await catalog_service.migrate_viewed_posts()
+            logger.info(f"✅ Сессий перенесено: {migrated}")
+
+            logger.info("🔄 Пересчитываю сводку рейтингов...")
+            rebuilt = await catalog_service.rebuild_rating_summaries()
+            logger.info(f"✅ Пересчитано постов с отзывами: {rebuilt}")
+
+        logger.info("🔍 Проверяю сводку рейтингов...")
+        mismatches = await catalog_service.check_rating_summaries()
+
+        for mismatch in mismatches[:20]:
+            logger.warning(
+                f"  ⚠️ Пост {mismatch['post_id']}: "
+                f"сохранено {mismatch['stored']}, по отзывам {mismatch['actual']}"
+            )
+
+        if mismatches:
+            logger.error(f"❌ Расхождений: {len(mismatches)}")
+            return False
+
+        logger.info("✅ Сводка рейтингов согласована с отзывами")
+        return True
+
+    except Exception as e:
+        logger.error(f"❌ Ошибка миграции каталога: {e}", exc_info=True)
+        return False
+    finally:
+        await db.close()
+
+
+if __name__ == "__main__":
+    success = asyncio.run(migrate_catalog(check_only='--check-ratings' in sys.argv))
+    exit(0 if success else 1)
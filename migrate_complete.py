@@ -13,6 +13,7 @@ import os
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import create_async_engine
 from config import Config
+from services.catalog_search import CATALOG_FTS_INDEX_SQL, CATALOG_TRGM_INDEX_SQLS
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -50,6 +51,9 @@ async def migrate_complete():
             async with engine.begin() as conn:
                 if 'postgresql' in db_url:
                     await conn.execute(text("""
+                        DROP TABLE IF EXISTS cooldowns CASCADE;
+                        DROP TABLE IF EXISTS catalog_notifications CASCADE;
+                        DROP TABLE IF EXISTS catalog_media_cache CASCADE;
                         DROP TABLE IF EXISTS catalog_sessions CASCADE;
                         DROP TABLE IF EXISTS catalog_subscriptions CASCADE;
                         DROP TABLE IF EXISTS catalog_reviews CASCADE;
@@ -58,8 +62,8 @@ async def migrate_complete():
                         DROP TABLE IF EXISTS users CASCADE;
                     """))
                 else:
-                    for table in ['catalog_sessions', 'catalog_subscriptions', 'catalog_reviews', 
-                                  'catalog_posts', 'posts', 'users']:
+                    for table in ['cooldowns', 'catalog_notifications', 'catalog_media_cache', 'catalog_sessions', 'catalog_subscriptions',
+                                  'catalog_reviews', 'catalog_posts', 'posts', 'users']:
                         try:
                             await conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
                         except:
@@ -136,7 +140,14 @@ async def migrate_complete():
                 views INTEGER DEFAULT 0,
                 is_priority BOOLEAN DEFAULT FALSE,
                 is_ad BOOLEAN DEFAULT FALSE,
-                ad_frequency INTEGER DEFAULT 10
+                ad_frequency INTEGER DEFAULT 10,
+                rating_sum INTEGER DEFAULT 0,
+                rating_count INTEGER DEFAULT 0,
+                rating_star_1 INTEGER DEFAULT 0,
+                rating_star_2 INTEGER DEFAULT 0,
+                rating_star_3 INTEGER DEFAULT 0,
+                rating_star_4 INTEGER DEFAULT 0,
+                rating_star_5 INTEGER DEFAULT 0
             );
 
             -- CATALOG REVIEWS TABLE
@@ -164,20 +175,68 @@ async def migrate_complete():
                 id SERIAL PRIMARY KEY,
                 user_id BIGINT NOT NULL UNIQUE,
                 viewed_posts JSON DEFAULT '[]',
+                viewed_packed BYTEA,
+                viewed_count INTEGER DEFAULT 0,
                 favorites JSON DEFAULT '[]',
                 last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                session_active BOOLEAN DEFAULT TRUE
+                session_active BOOLEAN DEFAULT TRUE,
+                feed_seed BIGINT,
+                feed_packed BYTEA,
+                feed_cursor INTEGER DEFAULT 0
+            );
+
+            -- CATALOG MEDIA CACHE TABLE
+            CREATE TABLE catalog_media_cache (
+                chat_key VARCHAR(255) NOT NULL,
+                message_id BIGINT NOT NULL,
+                has_media BOOLEAN DEFAULT FALSE,
+                media_type VARCHAR(50),
+                file_id VARCHAR(500),
+                file_unique_id VARCHAR(255),
+                media_group_id VARCHAR(255),
+                resolved_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (chat_key, message_id)
+            );
+
+            -- CATALOG NOTIFICATIONS TABLE
+            CREATE TABLE catalog_notifications (
+                id SERIAL PRIMARY KEY,
+                user_id BIGINT NOT NULL,
+                post_id INTEGER NOT NULL,
+                category VARCHAR(100),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                next_attempt_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                attempts INTEGER DEFAULT 0,
+                claimed_by VARCHAR(32)
+            );
+
+            -- COOLDOWNS TABLE
+            CREATE TABLE cooldowns (
+                user_id BIGINT NOT NULL,
+                command VARCHAR(100) NOT NULL,
+                expires_at TIMESTAMP NOT NULL,
+                type VARCHAR(20) DEFAULT 'normal',
+                count INTEGER DEFAULT 0,
+                PRIMARY KEY (user_id, command)
             );
 
             -- INDEXES
             CREATE INDEX idx_posts_user_id ON posts(user_id);
-            CREATE INDEX idx_posts_status ON posts(status);
+            CREATE INDEX idx_posts_status_user ON posts(status, user_id);
             CREATE INDEX idx_catalog_posts_category ON catalog_posts(category);
+            CREATE INDEX idx_catalog_posts_active_category ON catalog_posts(is_active, category);
             CREATE INDEX idx_catalog_posts_user_id ON catalog_posts(user_id);
             CREATE INDEX idx_catalog_posts_number ON catalog_posts(catalog_number);
-            CREATE INDEX idx_catalog_reviews_post_id ON catalog_reviews(catalog_post_id);
+            CREATE INDEX idx_catalog_reviews_post_created ON catalog_reviews(catalog_post_id, created_at);
+            CREATE INDEX idx_catalog_subscriptions_type_value ON catalog_subscriptions(subscription_type, subscription_value);
             CREATE INDEX idx_catalog_sessions_user_id ON catalog_sessions(user_id);
+            CREATE INDEX idx_catalog_sessions_viewed ON catalog_sessions(viewed_count, user_id);
+            CREATE INDEX idx_catalog_notifications_due ON catalog_notifications(next_attempt_at, user_id);
             """
+            
+            # Полнотекстовый и нечёткий поиск каталога (GIN по tsvector и pg_trgm)
+            sql += f"{CATALOG_FTS_INDEX_SQL};\n"
+            sql += ''.join(f"{statement};\n" for statement in CATALOG_TRGM_INDEX_SQLS)
         else:
             # SQLite
             sql = """
@@ -242,7 +301,14 @@ async def migrate_complete():
                 views INTEGER DEFAULT 0,
                 is_priority INTEGER DEFAULT 0,
                 is_ad INTEGER DEFAULT 0,
-                ad_frequency INTEGER DEFAULT 10
+                ad_frequency INTEGER DEFAULT 10,
+                rating_sum INTEGER DEFAULT 0,
+                rating_count INTEGER DEFAULT 0,
+                rating_star_1 INTEGER DEFAULT 0,
+                rating_star_2 INTEGER DEFAULT 0,
+                rating_star_3 INTEGER DEFAULT 0,
+                rating_star_4 INTEGER DEFAULT 0,
+                rating_star_5 INTEGER DEFAULT 0
             );
 
             -- CATALOG REVIEWS TABLE
@@ -270,19 +336,63 @@ async def migrate_complete():
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 user_id INTEGER NOT NULL UNIQUE,
                 viewed_posts TEXT DEFAULT '[]',
+                viewed_packed BLOB,
+                viewed_count INTEGER DEFAULT 0,
                 favorites TEXT DEFAULT '[]',
                 last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                session_active INTEGER DEFAULT 1
+                session_active INTEGER DEFAULT 1,
+                feed_seed INTEGER,
+                feed_packed BLOB,
+                feed_cursor INTEGER DEFAULT 0
+            );
+
+            -- CATALOG MEDIA CACHE TABLE
+            CREATE TABLE catalog_media_cache (
+                chat_key TEXT NOT NULL,
+                message_id INTEGER NOT NULL,
+                has_media INTEGER DEFAULT 0,
+                media_type TEXT,
+                file_id TEXT,
+                file_unique_id TEXT,
+                media_group_id TEXT,
+                resolved_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (chat_key, message_id)
+            );
+
+            -- CATALOG NOTIFICATIONS TABLE
+            CREATE TABLE catalog_notifications (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                post_id INTEGER NOT NULL,
+                category TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                next_attempt_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                attempts INTEGER DEFAULT 0,
+                claimed_by TEXT
+            );
+
+            -- COOLDOWNS TABLE
+            CREATE TABLE cooldowns (
+                user_id INTEGER NOT NULL,
+                command TEXT NOT NULL,
+                expires_at TIMESTAMP NOT NULL,
+                type TEXT DEFAULT 'normal',
+                count INTEGER DEFAULT 0,
+                PRIMARY KEY (user_id, command)
             );
 
             -- INDEXES
             CREATE INDEX idx_posts_user_id ON posts(user_id);
-            CREATE INDEX idx_posts_status ON posts(status);
+            CREATE INDEX idx_posts_status_user ON posts(status, user_id);
             CREATE INDEX idx_catalog_posts_category ON catalog_posts(category);
+            CREATE INDEX idx_catalog_posts_active_category ON catalog_posts(is_active, category);
             CREATE INDEX idx_catalog_posts_user_id ON catalog_posts(user_id);
             CREATE INDEX idx_catalog_posts_number ON catalog_posts(catalog_number);
-            CREATE INDEX idx_catalog_reviews_post_id ON catalog_reviews(catalog_post_id);
+            CREATE INDEX idx_catalog_reviews_post_created ON catalog_reviews(catalog_post_id, created_at);
+            CREATE INDEX idx_catalog_subscriptions_type_value ON catalog_subscriptions(subscription_type, subscription_value);
             CREATE INDEX idx_catalog_sessions_user_id ON catalog_sessions(user_id);
+            CREATE INDEX idx_catalog_sessions_viewed ON catalog_sessions(viewed_count, user_id);
+            CREATE INDEX idx_catalog_notifications_due ON catalog_notifications(next_attempt_at, user_id);
             """
         
         async with engine.begin() as conn:
@@ -315,7 +425,8 @@ async def migrate_complete():
             logger.info(f"✅ Таблицы: {tables}")
             
             required = {'users', 'posts', 'catalog_posts', 'catalog_reviews', 
-                       'catalog_subscriptions', 'catalog_sessions'}
+                       'catalog_subscriptions', 'catalog_sessions', 'catalog_media_cache',
+                       'catalog_notifications', 'cooldowns'}
             missing = required - set(tables)
             
             if missing:
@@ -334,6 +445,9 @@ async def migrate_complete():
         logger.info("  ✅ catalog_reviews - отзывы")
         logger.info("  ✅ catalog_subscriptions - подписки")
         logger.info("  ✅ catalog_sessions - сессии")
+        logger.info("  ✅ catalog_media_cache - кэш медиа по ссылкам")
+        logger.info("  ✅ catalog_notifications - очередь уведомлений подписчикам")
+        logger.info("  ✅ cooldowns - кулдауны команд")
         logger.info("\n🚀 Теперь запустите: python main.py\n")
         
         return True
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Boolean, Text, JSON, Enum as SQLEnum, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Boolean, Text, JSON, LargeBinary, Enum as SQLEnum, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 from datetime import datetime
@@ -30,6 +30,9 @@ class User(Base):
 
 class Post(Base):
     __tablename__ = 'posts'
+    __table_args__ = (
+        Index('idx_posts_status_user', 'status', 'user_id'),
+    )
     
     id = Column(Integer, primary_key=True)
     user_id = Column(BigInteger, nullable=False)
@@ -64,6 +67,11 @@ class Post(Base):
 class CatalogPost(Base):
     """Запись в каталоге услуг"""
     __tablename__ = 'catalog_posts'
+    __table_args__ = (
+        # Лента, статистика по категориям, посты автора
+        Index('idx_catalog_posts_active_category', 'is_active', 'category'),
+        Index('idx_catalog_posts_user_id', 'user_id'),
+    )
     
     id = Column(Integer, primary_key=True)
     user_id = Column(BigInteger, nullable=False)
@@ -94,11 +102,24 @@ class CatalogPost(Base):
     is_priority = Column(Boolean, default=False)
     is_ad = Column(Boolean, default=False)
     ad_frequency = Column(Integer, default=10)
+    
+    # ============= СВОДКА РЕЙТИНГА (обновляется в add_review) =============
+    rating_sum = Column(Integer, default=0)
+    rating_count = Column(Integer, default=0)
+    rating_star_1 = Column(Integer, default=0)
+    rating_star_2 = Column(Integer, default=0)
+    rating_star_3 = Column(Integer, default=0)
+    rating_star_4 = Column(Integer, default=0)
+    rating_star_5 = Column(Integer, default=0)
 
 
 class CatalogReview(Base):
     """Отзывы о специалистах"""
     __tablename__ = 'catalog_reviews'
+    __table_args__ = (
+        # Лента отзывов поста: keyset-пагинация по (created_at, id)
+        Index('idx_catalog_reviews_post_created', 'catalog_post_id', 'created_at'),
+    )
     
     id = Column(Integer, primary_key=True)
     catalog_post_id = Column(Integer, ForeignKey('catalog_posts.id'))
@@ -112,6 +133,10 @@ class CatalogReview(Base):
 class CatalogSubscription(Base):
     """Подписки на уведомления"""
     __tablename__ = 'catalog_subscriptions'
+    __table_args__ = (
+        # Подписчики категории (get_category_subscribers, очередь уведомлений)
+        Index('idx_catalog_subscriptions_type_value', 'subscription_type', 'subscription_value'),
+    )
     
     id = Column(Integer, primary_key=True)
     user_id = Column(BigInteger, nullable=False)
@@ -122,10 +147,62 @@ class CatalogSubscription(Base):
 
 class CatalogSession(Base):
     __tablename__ = 'catalog_sessions'
+    __table_args__ = (
+        Index('idx_catalog_sessions_viewed', 'viewed_count', 'user_id'),  # get_unique_viewers
+    )
     
     id = Column(Integer, primary_key=True)
     user_id = Column(BigInteger, nullable=False, unique=True)
-    viewed_posts = Column(JSON, default=[])
+    viewed_posts = Column(JSON, default=[])  # устарело: до миграции в viewed_packed
+    viewed_packed = Column(LargeBinary, nullable=True)  # сегменты id по возрастанию, дельты varint (utils.packed_ids)
+    viewed_count = Column(Integer, default=0)
     favorites = Column(JSON, default=[])
     last_activity = Column(DateTime, default=datetime.utcnow)
     session_active = Column(Boolean, default=True)
+    
+    # ============= ЛЕНТА: ПЕРЕСТАНОВКА ПО SEED + КУРСОР =============
+    feed_seed = Column(BigInteger, nullable=True)
+    feed_packed = Column(LargeBinary, nullable=True)  # порядок ленты, uint32 на id (utils.packed_ids.pack_order)
+    feed_cursor = Column(Integer, default=0)
+
+
+class CatalogMediaCache(Base):
+    """Кэш медиа по ссылке t.me (chat, message_id) для импорта в каталог"""
+    __tablename__ = 'catalog_media_cache'
+    
+    chat_key = Column(String(255), primary_key=True)  # '-100...' или '@username'
+    message_id = Column(BigInteger, primary_key=True)
+    has_media = Column(Boolean, default=False)  # False - в посте нет медиа (негативный кэш)
+    media_type = Column(String(50), nullable=True)
+    file_id = Column(String(500), nullable=True)
+    file_unique_id = Column(String(255), nullable=True)
+    media_group_id = Column(String(255), nullable=True)
+    resolved_at = Column(DateTime, default=datetime.utcnow)
+
+
+class CatalogNotification(Base):
+    """Очередь уведомлений подписчикам о новых постах каталога"""
+    __tablename__ = 'catalog_notifications'
+    __table_args__ = (
+        Index('idx_catalog_notifications_due', 'next_attempt_at', 'user_id'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(BigInteger, nullable=False)
+    post_id = Column(Integer, nullable=False)
+    category = Column(String(100))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)  # доставка не раньше (окно дайджеста / повтор)
+    attempts = Column(Integer, default=0)
+    claimed_by = Column(String(32), nullable=True)  # метка воркера, который сейчас отправляет строку
+
+
+class Cooldown(Base):
+    """Кулдауны команд: одна строка на пару (пользователь, команда)"""
+    __tablename__ = 'cooldowns'
+    
+    user_id = Column(BigInteger, primary_key=True)
+    command = Column(String(100), primary_key=True)
+    expires_at = Column(DateTime, nullable=False)
+    type = Column(String(20), default='normal')
+    count = Column(Integer, default=0)
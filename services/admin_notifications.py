@@ -160,6 +160,11 @@ class AdminNotificationService:
             logger.error(f"Error collecting channel stats: {e}")
             channel_stats_text = "\n\n❌ Ошибка сбора статистики каналов"
         
+        # Статистика каталога из снимка (без запросов к БД, если снимок свежий)
+        from services.catalog_stats import catalog_stats
+        await catalog_stats.get()
+        catalog_stats_text = f"\n\n📂 КАТАЛОГ:\n{catalog_stats.format_summary()}"
+        
         message = (
             f"📊 АВТОМАТИЧЕСКАЯ СТАТИСТИКА\n"
             f"⏰ {datetime.now().strftime('%d.%m.%Y %H:%M')}\n\n"
@@ -172,6 +177,7 @@ class AdminNotificationService:
             f"• Всего: {total_messages}\n"
             f"• Среднее на пользователя: {total_messages // total_users if total_users > 0 else 0}\n\n"
             f"🎮 ИГРЫ:{games_stats}"
+            f"{catalog_stats_text}"
             f"{channel_stats_text}"
         )
         
@@ -1,15 +1,57 @@
 # services/cache_service.py
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Hashable, Optional
+
+
 class CacheService:
-    def __init__(self, ttl: int = 300):
-        self._cache = {}
+    """Ограниченный LRU-кэш с TTL и счётчиками попаданий"""
+
+    def __init__(self, ttl: int = 300, max_size: int = 1000):
+        self._cache: OrderedDict = OrderedDict()
         self.ttl = ttl
-    
-    async def get(self, key: str):
-        if key in self._cache:
-            value, timestamp = self._cache[key]
+        self.max_size = max_size
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._cache.get(key)
+        if entry is not None:
+            value, timestamp = entry
             if (datetime.now() - timestamp).total_seconds() < self.ttl:
+                self._cache.move_to_end(key)
+                self.hits += 1
                 return value
+
+            del self._cache[key]
+
+        self.misses += 1
         return None
-    
-    async def set(self, key: str, value):
+
+    async def set(self, key: Hashable, value: Any):
         self._cache[key] = (value, datetime.now())
+        self._cache.move_to_end(key)
+
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, *keys: Hashable):
+        for key in keys:
+            self._cache.pop(key, None)
+
+    async def clear(self):
+        self._cache.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._cache),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / total * 100, 1) if total else 0
+        }
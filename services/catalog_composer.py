@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Вставка рекламы в ленту каталога
+
+Реклама не входит в перемешанный порядок ленты (catalog_feed), а
+вставляется при выдаче страницы: каждое объявление показывается после
+своих ad_frequency карточек (колонка CatalogPost.ad_frequency, по
+умолчанию - общая частота CatalogService). Состояние сессии - номер
+карточки и куча объявлений по номеру карточки, после которой объявление
+пора показать: на карточку - одна проверка вершины кучи и при показе
+одна перестановка (O(log N) от числа объявлений), без обхода всех
+объявлений.
+
+Показы учитываются после успешной отправки карточки (record_impressions),
+а не при составлении страницы: страница может не дойти до пользователя.
+
+Список активной рекламы берётся из кэшированного набора CatalogService,
+поэтому композиция не добавляет запросов к странице.
+"""
+import heapq
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Any, Iterable, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class AdSlotState:
+    """Счётчики рекламы в сессии пользователя"""
+
+    __slots__ = ('seed', 'cards', 'due_heap', 'due_at', 'frequencies', 'impressions')
+
+    def __init__(self, seed: int = 0):
+        self.seed = seed or 0
+        # Карточек выдано в сессии
+        self.cards = 0
+        # Куча (номер карточки, ad_id) и тот же срок по объявлению
+        self.due_heap: List[Tuple[int, int]] = []
+        self.due_at: Dict[int, int] = {}
+        # {ad_id: частота}, по которой считались сроки
+        self.frequencies: Dict[int, int] = {}
+        self.impressions = 0
+
+
+class CatalogFeedComposer:
+    """Вставка рекламы каждые N карточек с учётом показов"""
+
+    def __init__(self, max_sessions: int = 10000):
+        self.max_sessions = max_sessions
+
+        self._sessions: OrderedDict = OrderedDict()
+        self._impressions: Dict[int, int] = {}
+
+    # ============= КОМПОЗИЦИЯ =============
+
+    def compose(self, user_id: int, seed: int, posts: List[Dict], ads: List[Dict], frequency: int) -> List[Dict]:
+        """Страница с рекламой: объявление - после каждых своих ad_frequency карточек
+
+        frequency - частота для объявлений без своей ad_frequency. В один
+        слот после карточки попадает не больше одного объявления - самое
+        «просроченное»; остальные ждут следующей карточки.
+        """
+        state = self._get_state(user_id, seed)
+
+        frequencies = {}
+        for ad in ads:
+            ad_frequency = ad.get('ad_frequency') or frequency
+            if ad_frequency and ad_frequency > 0:
+                frequencies[ad['id']] = ad_frequency
+
+        self._sync_ads(state, frequencies)
+
+        if not frequencies:
+            return posts
+
+        ads_by_id = {ad['id']: ad for ad in ads}
+        heap = state.due_heap
+        page = []
+        for post in posts:
+            page.append(post)
+            state.cards += 1
+
+            # На вершине - объявление с самым ранним сроком, то есть самое «просроченное»
+            if heap[0][0] <= state.cards:
+                ad_id = heap[0][1]
+                page.append(ads_by_id[ad_id])
+
+                due = state.cards + frequencies[ad_id]
+                state.due_at[ad_id] = due
+                heapq.heapreplace(heap, (due, ad_id))
+
+        return page
+
+    @staticmethod
+    def _sync_ads(state: AdSlotState, frequencies: Dict[int, int]):
+        """Привести кучу к текущему набору рекламы (перестраивается только при изменении набора)"""
+        if state.frequencies == frequencies:
+            return
+
+        due_at = state.due_at
+        for ad_id in list(due_at):
+            if ad_id not in frequencies:
+                del due_at[ad_id]
+
+        for ad_id, ad_frequency in frequencies.items():
+            previous = state.frequencies.get(ad_id)
+            if ad_id not in due_at:
+                # Сдвиг от seed ленты - разные пользователи видят разную рекламу первой
+                due_at[ad_id] = state.cards + ad_frequency - (state.seed + ad_id) % ad_frequency
+            elif previous != ad_frequency:
+                # Частота изменилась - карточки с последнего показа сохраняются
+                due_at[ad_id] += ad_frequency - previous
+
+        state.frequencies = dict(frequencies)
+
+        state.due_heap = [(due, ad_id) for ad_id, due in due_at.items()]
+        heapq.heapify(state.due_heap)
+
+    def _get_state(self, user_id: int, seed: int) -> AdSlotState:
+        state = self._sessions.get(user_id)
+        if state is None:
+            state = AdSlotState(seed=seed)
+            self._sessions[user_id] = state
+
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(user_id)
+
+        return state
+
+    def record_impressions(self, user_id: int, ad_ids: Iterable[int]):
+        """Учесть показы рекламы, которые дошли до пользователя"""
+        state = self._sessions.get(user_id)
+
+        for ad_id in ad_ids:
+            self._impressions[ad_id] = self._impressions.get(ad_id, 0) + 1
+            if state is not None:
+                state.impressions += 1
+
+    def reset(self, user_id: int):
+        """Сбросить счётчики сессии (новая лента)"""
+        self._sessions.pop(user_id, None)
+
+    # ============= СТАТИСТИКА =============
+
+    def get_impressions(self) -> Dict[int, int]:
+        """Показы по рекламным постам: {post_id: показов}"""
+        return dict(self._impressions)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Сессии и показы рекламы с момента запуска"""
+        return {
+            'sessions': len(self._sessions),
+            'impressions': sum(self._impressions.values()),
+            'ads_shown': len(self._impressions)
+        }
+
+
+# ============= ГЛОБАЛЬНЫЙ ЭКЗЕМПЛЯР =============
+
+catalog_composer = CatalogFeedComposer()
+
+__all__ = ['catalog_composer', 'CatalogFeedComposer']
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+Буфер счётчиков каталога (write-behind)
+
+Просмотры и клики копятся в памяти и периодически сбрасываются в БД
+одним пакетным UPDATE ... SET views = views + delta вместо отдельной
+транзакции на каждую карточку.
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Optional, Any, Set
+from sqlalchemy import update, func, bindparam
+from services.db import db
+from models import CatalogPost
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogCounterBuffer:
+    """Агрегирует приращения views/clicks и сбрасывает их пачкой"""
+
+    def __init__(self, flush_interval: int = 30, max_pending_posts: int = 500):
+        self.flush_interval = flush_interval
+        self.max_pending_posts = max_pending_posts
+
+        self._views: Dict[int, int] = {}
+        self._clicks: Dict[int, int] = {}
+        self._oldest_pending_at: Optional[datetime] = None
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        # Внеочередные сбросы: держим ссылки, чтобы задачи не собрал GC
+        self._overflow_tasks: Set[asyncio.Task] = set()
+        self._running = False
+
+        self.last_flush_at: Optional[datetime] = None
+        self.flushes = 0
+        self.failed_flushes = 0
+
+    # ============= НАКОПЛЕНИЕ =============
+
+    def add_view(self, post_id: int, count: int = 1):
+        """Учесть просмотр карточки"""
+        self._add(self._views, post_id, count)
+
+    def add_click(self, post_id: int, count: int = 1):
+        """Учесть переход по карточке"""
+        self._add(self._clicks, post_id, count)
+
+    def _add(self, counters: Dict[int, int], post_id: int, count: int):
+        if not post_id:
+            return
+
+        if self._oldest_pending_at is None:
+            self._oldest_pending_at = datetime.utcnow()
+
+        counters[post_id] = counters.get(post_id, 0) + count
+
+        # Слишком много постов в буфере - сбрасываем не дожидаясь интервала
+        if self._running and len(self._views) + len(self._clicks) >= self.max_pending_posts:
+            if not self._flush_lock.locked() and not self._overflow_tasks:
+                task = asyncio.create_task(self.flush())
+                self._overflow_tasks.add(task)
+                task.add_done_callback(self._overflow_tasks.discard)
+
+    # ============= СБРОС В БД =============
+
+    async def flush(self) -> int:
+        """Сбросить накопленные приращения одним пакетным UPDATE"""
+        async with self._flush_lock:
+            if not self._views and not self._clicks:
+                return 0
+
+            views, clicks = self._views, self._clicks
+            oldest_pending_at = self._oldest_pending_at
+            self._views, self._clicks = {}, {}
+            self._oldest_pending_at = None
+
+            params = [
+                {
+                    'b_post_id': post_id,
+                    'b_views': views.get(post_id, 0),
+                    'b_clicks': clicks.get(post_id, 0)
+                }
+                for post_id in set(views) | set(clicks)
+            ]
+
+            try:
+                table = CatalogPost.__table__
+                async with db.get_session() as session:
+                    await session.execute(
+                        update(table).where(table.c.id == bindparam('b_post_id')).values(
+                            views=func.coalesce(table.c.views, 0) + bindparam('b_views'),
+                            clicks=func.coalesce(table.c.clicks, 0) + bindparam('b_clicks')
+                        ),
+                        params
+                    )
+                    await session.commit()
+
+                self.last_flush_at = datetime.utcnow()
+                self.flushes += 1
+                logger.debug(f"Flushed catalog counters for {len(params)} posts")
+                return len(params)
+
+            except Exception as e:
+                # Возвращаем приращения в буфер, чтобы не потерять их
+                for post_id, count in views.items():
+                    self._views[post_id] = self._views.get(post_id, 0) + count
+                for post_id, count in clicks.items():
+                    self._clicks[post_id] = self._clicks.get(post_id, 0) + count
+                if oldest_pending_at and (not self._oldest_pending_at or oldest_pending_at < self._oldest_pending_at):
+                    self._oldest_pending_at = oldest_pending_at
+
+                self.failed_flushes += 1
+                logger.error(f"Error flushing catalog counters: {e}")
+                return 0
+
+    # ============= ФОНОВАЯ ЗАДАЧА =============
+
+    async def start(self):
+        """Запустить периодический сброс"""
+        if self._running:
+            logger.warning("Catalog counter flush task already running")
+            return
+
+        self._running = True
+        self._flush_task = asyncio.create_task(self._flush_loop())
+        logger.info(f"Catalog counter flush task started (every {self.flush_interval}s)")
+
+    async def stop(self):
+        """Остановить периодический сброс и сбросить остаток"""
+        self._running = False
+
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+
+        if self._overflow_tasks:
+            await asyncio.gather(*self._overflow_tasks, return_exceptions=True)
+
+        flushed = await self.flush()
+        logger.info(f"Catalog counter flush task stopped (final flush: {flushed} posts)")
+
+    async def _flush_loop(self):
+        while self._running:
+            try:
+                await asyncio.sleep(self.flush_interval)
+                await self.flush()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Error in catalog counter flush loop: {e}")
+
+    # ============= СТАТИСТИКА =============
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Размер буфера и задержка сброса"""
+        flush_lag = (
+            (datetime.utcnow() - self._oldest_pending_at).total_seconds()
+            if self._oldest_pending_at else 0
+        )
+
+        return {
+            'pending_posts': len(set(self._views) | set(self._clicks)),
+            'pending_views': sum(self._views.values()),
+            'pending_clicks': sum(self._clicks.values()),
+            'flush_lag_seconds': int(flush_lag),
+            'last_flush_at': self.last_flush_at,
+            'flushes': self.flushes,
+            'failed_flushes': self.failed_flushes
+        }
+
+
+# ============= ГЛОБАЛЬНЫЙ ЭКЗЕМПЛЯР =============
+
+catalog_counters = CatalogCounterBuffer()
+
+__all__ = ['catalog_counters', 'CatalogCounterBuffer']
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Лента каталога с заранее перемешанным порядком
+
+При старте сессии строится перестановка id активных постов по seed
+(страницы 4 обычных + 1 TopGirls/TopBoys), дальше страницы отдаются по
+курсору без ORDER BY random() и NOT IN (viewed_ids).
+Приоритетные посты занимают первые страницы (до priority_per_page на
+страницу вместо обычных), реклама в ленту не входит - её вставляет
+catalog_composer при выдаче.
+Одинаковый seed на одном наборе постов даёт одинаковую ленту - seed
+хранится в CatalogSession для отладки.
+"""
+import logging
+import random
+from typing import List, Tuple, Iterable
+from utils.packed_ids import order_slice
+
+logger = logging.getLogger(__name__)
+
+TOP_GIRLS_CATEGORY = '👱🏻‍♀️ TopGirls'
+TOP_BOYS_CATEGORY = '🤵🏼‍♂️ TopBoys'
+
+
+class CatalogFeedEngine:
+    """Построение и постраничная выдача перемешанной ленты"""
+
+    def __init__(self, regular_per_page: int = 4, top_per_page: int = 1, priority_per_page: int = 2):
+        self.regular_per_page = regular_per_page
+        self.top_per_page = top_per_page
+        self.priority_per_page = priority_per_page
+        self._seed_source = random.SystemRandom()
+
+    @property
+    def page_size(self) -> int:
+        return self.regular_per_page + self.top_per_page
+
+    def new_seed(self) -> int:
+        """Новый seed для сессии"""
+        return self._seed_source.randint(1, 2**31 - 1)
+
+    def build_order(self, posts: Iterable[Tuple[int, str]], seed: int,
+                    priority_ids: Iterable[int] = ()) -> List[int]:
+        """
+        Построить порядок ленты
+
+        Args:
+            posts: пары (post_id, category) активных постов
+            seed: seed перестановки
+            priority_ids: id приоритетных постов (идут на первые страницы)
+
+        Returns:
+            list: id постов, разбитые на страницы по page_size
+        """
+        rng = random.Random(seed)
+
+        priority_ids = set(priority_ids)
+
+        regular, priority, top = [], [], {TOP_GIRLS_CATEGORY: [], TOP_BOYS_CATEGORY: []}
+        for post_id, category in sorted(posts):
+            if category in top:
+                top[category].append(post_id)
+            elif post_id in priority_ids:
+                priority.append(post_id)
+            else:
+                regular.append(post_id)
+
+        rng.shuffle(regular)
+        rng.shuffle(priority)
+        for ids in top.values():
+            rng.shuffle(ids)
+
+        order = []
+        while regular or priority or top[TOP_GIRLS_CATEGORY] or top[TOP_BOYS_CATEGORY]:
+            # Приоритетные посты занимают часть обычных мест первых страниц
+            page = priority[:self.priority_per_page]
+            del priority[:self.priority_per_page]
+
+            regular_slots = self.regular_per_page - len(page)
+            page.extend(regular[:regular_slots])
+            del regular[:regular_slots]
+
+            # 1 TOP пост: случайная категория, при пустой - другая
+            for _ in range(self.top_per_page):
+                top_category = rng.choice([TOP_GIRLS_CATEGORY, TOP_BOYS_CATEGORY])
+                other_category = TOP_BOYS_CATEGORY if top_category == TOP_GIRLS_CATEGORY else TOP_GIRLS_CATEGORY
+                source = top[top_category] or top[other_category]
+                if source:
+                    page.append(source.pop())
+
+            # Добираем страницу из оставшихся TOP постов, если обычные закончились
+            for category in (TOP_GIRLS_CATEGORY, TOP_BOYS_CATEGORY):
+                while len(page) < self.page_size and top[category]:
+                    page.append(top[category].pop())
+
+            rng.shuffle(page)
+            order.extend(page)
+
+        return order
+
+    def next_page(self, packed_order: bytes, cursor: int, count: int) -> Tuple[List[int], int]:
+        """Срез следующей страницы из упакованного порядка (pack_order): (post_ids, новый курсор)"""
+        cursor = max(0, cursor or 0)
+        page_ids = order_slice(packed_order, cursor, count)
+        return page_ids, cursor + len(page_ids)
+
+
+# ============= ГЛОБАЛЬНЫЙ ЭКЗЕМПЛЯР =============
+
+catalog_feed = CatalogFeedEngine()
+
+__all__ = ['catalog_feed', 'CatalogFeedEngine']
@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""
+Получение медиа по ссылке t.me для импорта в каталог
+
+Без кэша каждая ссылка стоит get_chat + forward_message в группу
+модерации + delete_message. Результат сохраняется в catalog_media_cache
+по ключу (chat, message_id): медиа - на MEDIA_TTL, отсутствие медиа
+(негативный кэш) - на NO_MEDIA_TTL. Ошибки доступа не кэшируются.
+
+resolve_many разрешает пачку ссылок: один SELECT по кэшу, живые запросы
+только для промахов (параллельно, не больше FETCH_CONCURRENCY сразу),
+один INSERT ... ON CONFLICT DO UPDATE на запись результатов.
+"""
+import asyncio
+import logging
+import re
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select, and_, or_
+from telegram import Bot
+from telegram.error import BadRequest, Forbidden
+from config import Config
+from services.db import db, dialect_insert
+from models import CatalogMediaCache
+
+logger = logging.getLogger(__name__)
+
+MEDIA_TTL = timedelta(days=30)
+NO_MEDIA_TTL = timedelta(hours=6)
+
+# Одновременных живых запросов (каждый - get_chat + forward + delete)
+FETCH_CONCURRENCY = 4
+
+_LINK_RE = re.compile(r't\.me/([^/]+)/(\d+)')
+
+
+def parse_link(telegram_link: str) -> Optional[Tuple]:
+    """Ссылка t.me -> (chat_id для Bot API, ключ кэша, message_id)"""
+    if not telegram_link or 't.me/' not in telegram_link:
+        return None
+
+    match = _LINK_RE.search(telegram_link)
+    if not match:
+        return None
+
+    channel_username = match.group(1).lstrip('@')
+    message_id = int(match.group(2))
+
+    if channel_username.startswith('-'):
+        chat_id = int(channel_username)
+    elif channel_username.isdigit():
+        chat_id = int(f"-100{channel_username}")
+    else:
+        chat_id = f"@{channel_username}"
+
+    return chat_id, str(chat_id).lower(), message_id
+
+
+class CatalogMediaResolver:
+    """Медиа по ссылкам с кэшем в БД"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._fetch_semaphore = asyncio.Semaphore(FETCH_CONCURRENCY)
+
+    # ============= КЭШ =============
+
+    def _from_cache(self, entry: CatalogMediaCache) -> Optional[Dict]:
+        """Результат из записи кэша или None, если запись устарела"""
+        ttl = MEDIA_TTL if entry.has_media else NO_MEDIA_TTL
+        if not entry.resolved_at or datetime.utcnow() - entry.resolved_at > ttl:
+            return None
+
+        if not entry.has_media:
+            return {'success': False, 'message': '⚠️ Медиа не найдено в посте', 'cached': True}
+
+        return {
+            'success': True,
+            'type': entry.media_type,
+            'file_id': entry.file_id,
+            'file_unique_id': entry.file_unique_id,
+            'media_group_id': entry.media_group_id,
+            'media_json': [entry.file_id],
+            'message': f'✅ {entry.media_type.title()} импортировано',
+            'cached': True
+        }
+
+    async def _load_cached(self, keys: List[Tuple[str, int]]) -> Dict[Tuple[str, int], Dict]:
+        """Свежие записи кэша по ключам (chat_key, message_id) одним запросом"""
+        if not keys:
+            return {}
+
+        by_chat: Dict[str, List[int]] = {}
+        for chat_key, message_id in keys:
+            by_chat.setdefault(chat_key, []).append(message_id)
+
+        try:
+            async with db.get_session() as session:
+                result = await session.execute(
+                    select(CatalogMediaCache).where(
+                        or_(*[
+                            and_(
+                                CatalogMediaCache.chat_key == chat_key,
+                                CatalogMediaCache.message_id.in_(message_ids)
+                            )
+                            for chat_key, message_ids in by_chat.items()
+                        ])
+                    )
+                )
+                entries = result.scalars().all()
+
+        except Exception as e:
+            logger.error(f"Error reading media cache: {e}")
+            return {}
+
+        cached = {}
+        for entry in entries:
+            media = self._from_cache(entry)
+            if media is not None:
+                cached[(entry.chat_key, entry.message_id)] = media
+        return cached
+
+    async def _store(self, results: Dict[Tuple[str, int], Dict]):
+        """Сохранить результаты живых запросов (кроме ошибок доступа) одним upsert"""
+        if not results:
+            return
+
+        resolved_at = datetime.utcnow()
+        rows = [
+            {
+                'chat_key': chat_key,
+                'message_id': message_id,
+                'has_media': media['success'],
+                'media_type': media.get('type'),
+                'file_id': media.get('file_id'),
+                'file_unique_id': media.get('file_unique_id'),
+                'media_group_id': media.get('media_group_id'),
+                'resolved_at': resolved_at
+            }
+            for (chat_key, message_id), media in results.items()
+        ]
+
+        statement = dialect_insert(CatalogMediaCache).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=[CatalogMediaCache.chat_key, CatalogMediaCache.message_id],
+            set_={
+                column: statement.excluded[column]
+                for column in ('has_media', 'media_type', 'file_id', 'file_unique_id', 'media_group_id', 'resolved_at')
+            }
+        )
+
+        try:
+            async with db.get_session() as session:
+                await session.execute(statement)
+                await session.commit()
+
+        except Exception as e:
+            logger.error(f"Error saving media cache: {e}")
+
+    # ============= ЖИВОЙ ЗАПРОС =============
+
+    async def _fetch(self, bot: Bot, chat_id, message_id: int) -> Tuple[Dict, bool]:
+        """Медиа через пересылку в группу модерации: (результат, можно ли кэшировать)"""
+        logger.info(f"📥 Extracting from: {chat_id}/{message_id}")
+
+        try:
+            await bot.get_chat(chat_id)
+        except (Forbidden, BadRequest) as e:
+            logger.error(f"❌ No access: {e}")
+            return {'success': False, 'message': '❌ Бот не имеет доступа к каналу'}, False
+
+        try:
+            forwarded = await bot.forward_message(
+                chat_id=Config.MODERATION_GROUP_ID,
+                from_chat_id=chat_id,
+                message_id=message_id
+            )
+        except (BadRequest, Forbidden) as e:
+            logger.error(f"❌ Forward failed: {e}")
+            return {'success': False, 'message': '❌ Не удалось импортировать медиа'}, False
+
+        result = {'success': False, 'message': '⚠️ Медиа не найдено в посте'}
+        media_map = {
+            'photo': lambda m: m.photo[-1],
+            'video': lambda m: m.video,
+            'document': lambda m: m.document,
+            'animation': lambda m: m.animation,
+        }
+
+        for media_type, extractor in media_map.items():
+            if getattr(forwarded, media_type, None):
+                media = extractor(forwarded)
+                result = {
+                    'success': True,
+                    'type': media_type,
+                    'file_id': media.file_id,
+                    'file_unique_id': media.file_unique_id,
+                    'media_group_id': forwarded.media_group_id,
+                    'media_json': [media.file_id],
+                    'message': f'✅ {media_type.title()} импортировано'
+                }
+                break
+
+        try:
+            await bot.delete_message(
+                chat_id=Config.MODERATION_GROUP_ID,
+                message_id=forwarded.message_id
+            )
+        except Exception:
+            pass
+
+        return result, True
+
+    async def _fetch_safe(self, bot: Bot, chat_id, message_id: int) -> Tuple[Dict, bool]:
+        """_fetch с ограничением параллельности; исключение -> некэшируемая ошибка"""
+        async with self._fetch_semaphore:
+            try:
+                return await self._fetch(bot, chat_id, message_id)
+            except Exception as e:
+                logger.error(f"❌ Media extraction error: {e}", exc_info=True)
+                return {'success': False, 'message': f'❌ Ошибка: {str(e)[:100]}'}, False
+
+    # ============= ПУБЛИЧНЫЙ API =============
+
+    async def resolve(self, bot: Bot, telegram_link: str) -> Dict:
+        """Медиа по одной ссылке"""
+        return (await self.resolve_many(bot, [telegram_link]))[telegram_link]
+
+    async def resolve_many(self, bot: Bot, links: List[str]) -> Dict[str, Dict]:
+        """Медиа по списку ссылок: {ссылка: результат}"""
+        results: Dict[str, Dict] = {}
+        parsed: Dict[str, Tuple] = {}
+
+        for link in links:
+            parts = parse_link(link)
+            if parts is None:
+                results[link] = {'success': False, 'message': '❌ Неверная ссылка'}
+            else:
+                parsed[link] = parts
+
+        cached = await self._load_cached([(chat_key, message_id) for _, chat_key, message_id in parsed.values()])
+
+        misses: Dict[Tuple[str, int], object] = {}
+        for link, (chat_id, chat_key, message_id) in parsed.items():
+            key = (chat_key, message_id)
+
+            if key in cached:
+                self.hits += 1
+                results[link] = cached[key]
+            elif key not in misses:
+                self.misses += 1
+                misses[key] = chat_id
+
+        outcomes = await asyncio.gather(*[
+            self._fetch_safe(bot, chat_id, message_id)
+            for (_, message_id), chat_id in misses.items()
+        ])
+
+        fetched: Dict[Tuple[str, int], Dict] = {}
+        live: Dict[Tuple[str, int], Dict] = {}
+        for key, (media, cacheable) in zip(misses, outcomes):
+            live[key] = media
+            if cacheable:
+                fetched[key] = media
+
+        for link, (_, chat_key, message_id) in parsed.items():
+            if link not in results:
+                results[link] = live[(chat_key, message_id)]
+
+        await self._store(fetched)
+        return results
+
+    def get_stats(self) -> Dict:
+        """Попадания в кэш"""
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+# ============= ГЛОБАЛЬНЫЙ ЭКЗЕМПЛЯР =============
+
+catalog_media = CatalogMediaResolver()
+
+__all__ = ['catalog_media', 'CatalogMediaResolver', 'parse_link']
@@ -0,0 +1,381 @@
+# -*- coding: utf-8 -*-
+"""
+Уведомления подписчикам категорий о новых постах каталога
+
+add_post кладёт в catalog_notifications по строке на подписчика одним
+INSERT ... SELECT, обработчик не ждёт отправки. Фоновый воркер раз в
+poll_interval забирает созревшие строки пачкой пользователей и отправляет
+с ограничением скорости (messages_per_second).
+
+Строка созревает через digest_delay после создания. Как только у
+пользователя созрела хотя бы одна строка, воркер забирает все его строки
+из очереди: посты, добавленные за это время в категории, на которые он
+подписан, уходят одним сообщением-дайджестом.
+
+Перед отправкой строки захватываются (claimed_by = метка пачки,
+next_attempt_at = срок аренды claim_ttl) одним UPDATE; чужие
+незавершённые захваты пропускаются, поэтому два воркера не отправят
+одно уведомление дважды. Если воркер упал, аренда истекает и строки
+снова доступны.
+
+Forbidden (бот заблокирован) - пользователь отписывается от всех
+категорий, его очередь удаляется. RetryAfter - пауза и повтор. Прочие
+ошибки - повтор с отсрочкой, после max_attempts строки удаляются.
+Очередь в БД, поэтому перезапуск бота уведомления не теряет.
+"""
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Any
+from sqlalchemy import select, insert, delete, update, and_, or_, func, literal
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import Forbidden, RetryAfter, TelegramError
+from services.db import db
+from models import CatalogNotification, CatalogPost, CatalogSubscription
+
+logger = logging.getLogger(__name__)
+
+DIGEST_MAX_LINES = 10
+
+
+class CatalogNotifier:
+    """Очередь и воркер уведомлений о новых постах"""
+
+    def __init__(
+        self,
+        poll_interval: int = 30,
+        digest_delay: int = 120,
+        messages_per_second: float = 20,
+        users_per_batch: int = 50,
+        max_attempts: int = 5,
+        claim_ttl: int = 300
+    ):
+        self.poll_interval = poll_interval
+        self.digest_delay = digest_delay
+        self.messages_per_second = messages_per_second
+        self.users_per_batch = users_per_batch
+        self.max_attempts = max_attempts
+        self.claim_ttl = claim_ttl
+
+        self.bot = None
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+        self._last_send = 0.0
+
+        self.stats = {'enqueued': 0, 'sent': 0, 'digests': 0, 'unsubscribed': 0, 'failed': 0}
+
+    def set_bot(self, bot):
+        self.bot = bot
+        logger.info("Bot instance set for catalog notifier")
+
+    # ============= ЗАПРОСЫ =============
+    # Используются и воркером, и check_query_plans.py
+
+    @staticmethod
+    def _subscribers_query(post_id: int, category: str, author_id: Optional[int],
+                           now: datetime, deliver_at: datetime):
+        """Строки очереди для подписчиков категории (для INSERT ... SELECT)"""
+        conditions = [
+            CatalogSubscription.subscription_type == 'category',
+            CatalogSubscription.subscription_value == category
+        ]
+        if author_id:
+            conditions.append(CatalogSubscription.user_id != author_id)
+
+        return (
+            select(
+                CatalogSubscription.user_id,
+                literal(post_id),
+                literal(category),
+                literal(now),
+                literal(deliver_at),
+                literal(0)
+            )
+            .where(and_(*conditions))
+            .distinct()
+        )
+
+    @staticmethod
+    def _due_users_query(now: datetime, limit: int):
+        """Пользователи с созревшими уведомлениями, старые очереди первыми"""
+        return (
+            select(CatalogNotification.user_id)
+            .where(CatalogNotification.next_attempt_at <= now)
+            .group_by(CatalogNotification.user_id)
+            .order_by(func.min(CatalogNotification.id))
+            .limit(limit)
+        )
+
+    # ============= ОЧЕРЕДЬ =============
+
+    async def enqueue_post(self, post_id: int, category: str, author_id: Optional[int] = None) -> int:
+        """Поставить уведомления о посте всем подписчикам категории (один INSERT ... SELECT)"""
+        try:
+            now = datetime.utcnow()
+            deliver_at = now + timedelta(seconds=self.digest_delay)
+
+            subscribers = self._subscribers_query(post_id, category, author_id, now, deliver_at)
+
+            async with db.get_session() as session:
+                result = await session.execute(
+                    insert(CatalogNotification).from_select(
+                        ['user_id', 'post_id', 'category', 'created_at', 'next_attempt_at', 'attempts'],
+                        subscribers
+                    )
+                )
+                await session.commit()
+
+            count = max(result.rowcount or 0, 0)
+            self.stats['enqueued'] += count
+            if count:
+                logger.info(f"Enqueued {count} notifications for post {post_id} ({category})")
+            return count
+
+        except Exception as e:
+            logger.error(f"Error enqueueing catalog notifications: {e}")
+            return 0
+
+    async def get_pending_count(self) -> int:
+        """Размер очереди"""
+        try:
+            async with db.get_session() as session:
+                result = await session.execute(select(func.count(CatalogNotification.id)))
+                return result.scalar() or 0
+
+        except Exception as e:
+            logger.error(f"Error counting catalog notifications: {e}")
+            return 0
+
+    # ============= ВОРКЕР =============
+
+    async def start(self):
+        """Запустить воркер доставки"""
+        if self._running:
+            logger.warning("Catalog notifier already running")
+            return
+
+        self._running = True
+        self._task = asyncio.create_task(self._worker_loop())
+        logger.info(f"Catalog notifier started ({self.messages_per_second} msg/s)")
+
+    async def stop(self):
+        """Остановить воркер (недоставленное остаётся в очереди)"""
+        self._running = False
+
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+        logger.info("Catalog notifier stopped")
+
+    async def _worker_loop(self):
+        while self._running:
+            try:
+                # Пока пачки полные - работа есть, сразу берём следующую
+                while self._running and await self.process_batch() >= self.users_per_batch:
+                    pass
+                await asyncio.sleep(self.poll_interval)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Error in catalog notifier loop: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def process_batch(self) -> int:
+        """Доставить созревшие уведомления пачке пользователей, вернуть число пользователей"""
+        if not self.bot:
+            return 0
+
+        now = datetime.utcnow()
+        claim = uuid.uuid4().hex
+        available = or_(
+            CatalogNotification.claimed_by.is_(None),
+            CatalogNotification.next_attempt_at <= now
+        )
+
+        async with db.get_session() as session:
+            users = (await session.execute(
+                self._due_users_query(now, self.users_per_batch)
+            )).scalars().all()
+
+            if not users:
+                return 0
+
+            # Захват всех строк этих пользователей (и ещё не созревших - в дайджест);
+            # строки, захваченные другим воркером, условие available пропускает
+            await session.execute(
+                update(CatalogNotification)
+                .where(and_(CatalogNotification.user_id.in_(users), available))
+                .values(claimed_by=claim, next_attempt_at=now + timedelta(seconds=self.claim_ttl))
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+
+            rows = (await session.execute(
+                select(
+                    CatalogNotification.id,
+                    CatalogNotification.user_id,
+                    CatalogNotification.category,
+                    CatalogNotification.attempts,
+                    CatalogPost.id.label('post_id'),
+                    CatalogPost.catalog_number,
+                    CatalogPost.name,
+                    CatalogPost.catalog_link,
+                    CatalogPost.is_active
+                )
+                .outerjoin(CatalogPost, CatalogPost.id == CatalogNotification.post_id)
+                .where(CatalogNotification.claimed_by == claim)
+                .order_by(CatalogNotification.id)
+            )).all()
+
+        by_user: Dict[int, List] = {}
+        for row in rows:
+            by_user.setdefault(row.user_id, []).append(row)
+
+        pending = list(by_user.items())
+        while pending and self._running:
+            user_id, user_rows = pending.pop(0)
+
+            if not await self._deliver(user_id, user_rows):
+                # RetryAfter: строку вернуть в очередь, остальное - в следующий проход
+                pending.insert(0, (user_id, user_rows))
+                break
+
+        if pending:
+            await self._release([row.id for _, user_rows in pending for row in user_rows])
+
+        return len(users)
+
+    async def _deliver(self, user_id: int, rows: List) -> bool:
+        """Отправить уведомление или дайджест; False - нужно прервать пачку"""
+        row_ids = [row.id for row in rows]
+        posts = [row for row in rows if row.post_id is not None and row.is_active]
+
+        if not posts:
+            await self._delete(row_ids)
+            return True
+
+        text, keyboard = self._format(posts)
+
+        try:
+            await self._throttle()
+            await self.bot.send_message(
+                chat_id=user_id,
+                text=text,
+                reply_markup=keyboard,
+                disable_web_page_preview=True
+            )
+
+        except Forbidden:
+            await self._unsubscribe(user_id)
+            return True
+
+        except RetryAfter as e:
+            logger.warning(f"Catalog notifier flood limit, retry after {e.retry_after}s")
+            await asyncio.sleep(e.retry_after)
+            return False
+
+        except TelegramError as e:
+            await self._postpone(rows, e)
+            return True
+
+        await self._delete(row_ids)
+        self.stats['sent'] += 1
+        if len(posts) > 1:
+            self.stats['digests'] += 1
+        return True
+
+    async def _throttle(self):
+        """Не чаще messages_per_second сообщений"""
+        loop = asyncio.get_running_loop()
+        delay = self._last_send + 1 / self.messages_per_second - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self._last_send = loop.time()
+
+    def _format(self, posts: List):
+        """Одно уведомление или дайджест по нескольким постам"""
+        if len(posts) == 1:
+            post = posts[0]
+            text = (
+                f"🔔 Новый пост в категории {post.category}\n\n"
+                f"#{post.catalog_number} {post.name or ''}"
+            )
+            keyboard = InlineKeyboardMarkup([[InlineKeyboardButton("🔗 Перейти", url=post.catalog_link)]])
+            return text, keyboard
+
+        lines = [f"🔔 Новые посты в ваших подписках: {len(posts)}\n"]
+        for post in posts[:DIGEST_MAX_LINES]:
+            lines.append(f"• {post.category}: #{post.catalog_number} {post.name or ''}")
+        if len(posts) > DIGEST_MAX_LINES:
+            lines.append(f"…и ещё {len(posts) - DIGEST_MAX_LINES}")
+        lines.append("\n/catalog - открыть каталог")
+
+        return "\n".join(lines), None
+
+    # ============= ИЗМЕНЕНИЕ ОЧЕРЕДИ =============
+
+    async def _delete(self, row_ids: List[int]):
+        async with db.get_session() as session:
+            await session.execute(delete(CatalogNotification).where(CatalogNotification.id.in_(row_ids)))
+            await session.commit()
+
+    async def _release(self, row_ids: List[int]):
+        """Вернуть захваченные, но не обработанные строки в очередь"""
+        async with db.get_session() as session:
+            await session.execute(
+                update(CatalogNotification)
+                .where(CatalogNotification.id.in_(row_ids))
+                .values(claimed_by=None, next_attempt_at=datetime.utcnow())
+            )
+            await session.commit()
+
+    async def _unsubscribe(self, user_id: int):
+        """Бот заблокирован: отписать от всех категорий и очистить очередь пользователя"""
+        async with db.get_session() as session:
+            await session.execute(delete(CatalogSubscription).where(CatalogSubscription.user_id == user_id))
+            await session.execute(delete(CatalogNotification).where(CatalogNotification.user_id == user_id))
+            await session.commit()
+
+        self.stats['unsubscribed'] += 1
+        logger.info(f"User {user_id} blocked the bot, catalog subscriptions removed")
+
+    async def _postpone(self, rows: List, error: Exception):
+        """Повтор с экспоненциальной отсрочкой, после max_attempts - удалить"""
+        attempts = max(row.attempts or 0 for row in rows) + 1
+        row_ids = [row.id for row in rows]
+        user_id = rows[0].user_id
+
+        if attempts >= self.max_attempts:
+            await self._delete(row_ids)
+            self.stats['failed'] += 1
+            logger.error(f"Dropped catalog notifications for user {user_id} after {attempts} attempts: {error}")
+            return
+
+        retry_at = datetime.utcnow() + timedelta(seconds=self.poll_interval * 2 ** attempts)
+        async with db.get_session() as session:
+            await session.execute(
+                update(CatalogNotification)
+                .where(CatalogNotification.id.in_(row_ids))
+                .values(attempts=attempts, next_attempt_at=retry_at, claimed_by=None)
+            )
+            await session.commit()
+
+        logger.warning(f"Catalog notification to user {user_id} failed (attempt {attempts}): {error}")
+
+    # ============= СТАТИСТИКА =============
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Счётчики с момента запуска"""
+        return dict(self.stats, running=self._running)
+
+
+# ============= ГЛОБАЛЬНЫЙ ЭКЗЕМПЛЯР =============
+
+catalog_notifier = CatalogNotifier()
+
+__all__ = ['catalog_notifier', 'CatalogNotifier']
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Аллокатор номеров каталога (1-9999)
+
+Свободные номера загружаются из БД один раз и хранятся в списке с
+индексом позиций: случайный свободный номер выдаётся и занимается за
+O(1) (swap-pop) без SELECT на каждую попытку.
+Выдача идёт под asyncio.Lock, поэтому параллельные add_post не получат
+один номер; unique-ограничение в БД остаётся последней защитой.
+
+Выданные, но ещё не записанные в БД номера (например, у заявок TopPeople
+на модерации) считаются зарезервированными и не возвращаются в пул при
+reload(). Резерв живёт только в памяти процесса: после перезапуска бота
+пул строится по БД и такие номера снова свободны. Сами заявки TopPeople
+(rating_data) тоже хранятся в памяти и при перезапуске теряются, так что
+номер не может достаться двум живым заявкам.
+"""
+import asyncio
+import logging
+import random
+from typing import Dict, List, Set, Any
+from sqlalchemy import select
+from services.db import db
+from models import CatalogPost
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogNumberAllocator:
+    """Пул свободных номеров каталога"""
+
+    def __init__(self, min_number: int = 1, max_number: int = 9999):
+        self.min_number = min_number
+        self.max_number = max_number
+
+        self._free: List[int] = []
+        self._positions: Dict[int, int] = {}
+        self._reserved: Set[int] = set()
+        self._lock = asyncio.Lock()
+        self._loaded = False
+        self._rng = random.SystemRandom()
+
+    # ============= ПУЛ =============
+
+    def _put(self, number: int):
+        if number in self._positions or not self.min_number <= number <= self.max_number:
+            return
+
+        self._positions[number] = len(self._free)
+        self._free.append(number)
+
+    def _take(self, number: int) -> bool:
+        index = self._positions.pop(number, None)
+        if index is None:
+            return False
+
+        last = self._free.pop()
+        if last != number:
+            self._free[index] = last
+            self._positions[last] = index
+        return True
+
+    async def _load(self):
+        async with db.get_session() as session:
+            result = await session.execute(
+                select(CatalogPost.catalog_number).where(CatalogPost.catalog_number.isnot(None))
+            )
+            used = set(result.scalars().all())
+
+        self._reserved -= used
+        self._free = []
+        self._positions = {}
+        for number in range(self.min_number, self.max_number + 1):
+            if number not in used and number not in self._reserved:
+                self._put(number)
+
+        self._loaded = True
+        logger.info(f"Catalog number pool loaded: {len(self._free)} free, {len(used)} used")
+
+    async def reload(self):
+        """Перечитать занятые номера из БД (после конфликта уникальности)"""
+        async with self._lock:
+            await self._load()
+
+    # ============= ВЫДАЧА И ВОЗВРАТ =============
+
+    async def allocate(self) -> int:
+        """Выдать случайный свободный номер"""
+        async with self._lock:
+            if not self._loaded:
+                await self._load()
+
+            if not self._free:
+                raise Exception("No free catalog numbers left")
+
+            number = self._free[self._rng.randrange(len(self._free))]
+            self._take(number)
+            self._reserved.add(number)
+            return number
+
+    async def claim(self, number: int) -> bool:
+        """Занять конкретный номер; False если он уже занят"""
+        async with self._lock:
+            if not self._loaded:
+                await self._load()
+
+            if not self._take(number):
+                return False
+
+            self._reserved.add(number)
+            return True
+
+    def confirm(self, number: int):
+        """Номер записан в БД - снять резерв"""
+        self._reserved.discard(number)
+
+    async def release(self, number: int):
+        """Вернуть номер в пул (пост не создан, заявка отклонена, номер изменён)"""
+        if not number:
+            return
+
+        async with self._lock:
+            if not self._loaded:
+                return
+
+            self._reserved.discard(number)
+            self._put(number)
+
+    # ============= СТАТИСТИКА =============
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Состояние пула"""
+        return {
+            'loaded': self._loaded,
+            'free': len(self._free),
+            'reserved': len(self._reserved)
+        }
+
+
+# ============= ГЛОБАЛЬНЫЙ ЭКЗЕМПЛЯР =============
+
+catalog_numbers = CatalogNumberAllocator()
+
+__all__ = ['catalog_numbers', 'CatalogNumberAllocator']
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Предзагрузка следующей страницы ленты каталога
+
+Пока пользователь смотрит страницу N, страница N+1 собирается в фоне
+(посты + рейтинг). Запись привязана к seed ленты и курсору, с которого
+она начинается: если лента пересобрана или курсор сдвинулся, запись
+не используется.
+
+Буфер ограничен по числу пользователей (LRU), записи неактивных сессий
+вытесняются по TTL, reset_session и удаление поста сбрасывают записи.
+"""
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Awaitable, Dict, List, Optional, Tuple, Any
+
+logger = logging.getLogger(__name__)
+
+
+class PrefetchEntry:
+    """Предзагруженная страница пользователя"""
+
+    def __init__(self, seed: int, cursor: int, count: int, task: asyncio.Task):
+        self.seed = seed
+        self.cursor = cursor
+        self.count = count
+        self.task = task
+        self.created_at = datetime.utcnow()
+
+
+class CatalogPrefetchBuffer:
+    """Буфер предзагруженных страниц: {user_id: PrefetchEntry}"""
+
+    def __init__(self, max_users: int = 200, ttl: int = 300):
+        self.max_users = max_users
+        self.ttl = ttl
+
+        self._entries: OrderedDict = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    # ============= ЗАПИСЬ =============
+
+    def schedule(
+        self,
+        user_id: int,
+        seed: int,
+        cursor: int,
+        count: int,
+        loader: Awaitable[Tuple[List[Dict], int]]
+    ):
+        """Запустить фоновую сборку страницы, начинающейся с cursor"""
+        self.invalidate(user_id)
+        self._evict()
+
+        task = asyncio.create_task(loader)
+        self._entries[user_id] = PrefetchEntry(seed, cursor, count, task)
+
+    # ============= ЧТЕНИЕ =============
+
+    async def take(self, user_id: int, seed: int, cursor: int, count: int) -> Optional[Tuple[List[Dict], int]]:
+        """Забрать предзагруженную страницу: (посты, новый курсор) или None"""
+        entry = self._entries.pop(user_id, None)
+
+        if (entry is None or entry.seed != seed or entry.cursor != cursor or entry.count != count
+                or self._expired(entry)):
+            if entry is not None:
+                entry.task.cancel()
+            self.misses += 1
+            return None
+
+        try:
+            result = await entry.task
+        except asyncio.CancelledError:
+            result = None
+        except Exception as e:
+            logger.error(f"Error in catalog prefetch for user {user_id}: {e}")
+            result = None
+
+        if result is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return result
+
+    # ============= СБРОС =============
+
+    def invalidate(self, user_id: int):
+        """Сбросить запись пользователя"""
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            entry.task.cancel()
+
+    def discard_post(self, post_id: int):
+        """Сбросить записи, содержащие пост (пост удалён или деактивирован)"""
+        for user_id, entry in list(self._entries.items()):
+            task = entry.task
+            if task.done() and not task.cancelled() and task.result() is not None:
+                posts, _ = task.result()
+                if all(post['id'] != post_id for post in posts):
+                    continue
+
+            self.invalidate(user_id)
+
+    def _expired(self, entry: PrefetchEntry) -> bool:
+        return (datetime.utcnow() - entry.created_at).total_seconds() > self.ttl
+
+    def _evict(self):
+        for user_id, entry in list(self._entries.items()):
+            if self._expired(entry):
+                self.invalidate(user_id)
+
+        while len(self._entries) >= self.max_users:
+            _, entry = self._entries.popitem(last=False)
+            entry.task.cancel()
+
+    # ============= СТАТИСТИКА =============
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Размер буфера и попадания"""
+        total = self.hits + self.misses
+        return {
+            'users': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total * 100, 1) if total else 0
+        }
+
+
+# ============= ГЛОБАЛЬНЫЙ ЭКЗЕМПЛЯР =============
+
+catalog_prefetch = CatalogPrefetchBuffer()
+
+__all__ = ['catalog_prefetch', 'CatalogPrefetchBuffer']
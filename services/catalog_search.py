@@ -0,0 +1,439 @@
+# -*- coding: utf-8 -*-
+"""
+Полнотекстовый поиск по каталогу
+
+- PostgreSQL: tsvector по name/tags/category с конфигурацией 'russian'
+  и GIN-индексом по выражению (индекс обновляет сама БД)
+- SQLite: инвертированный индекс в памяти со стеммингом (Snowball для
+  русского), загружается один раз и обновляется из add_post,
+  update_post_field и delete_post
+
+Результаты ранжируются по релевантности: совпадение в названии весит
+больше, чем в тегах, а в тегах - больше, чем в категории.
+
+Нечёткий поиск (опечатки, латиница вместо кириллицы) работает по
+триграммам: pg_trgm на PostgreSQL, индекс триграмм в памяти на SQLite.
+"""
+import logging
+import math
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set
+from sqlalchemy import select, text
+from config import Config
+from models import CatalogPost
+
+logger = logging.getLogger(__name__)
+
+# ============= POSTGRESQL =============
+
+# Выражение документа; должно совпадать с выражением GIN-индекса idx_catalog_posts_fts
+CATALOG_TSVECTOR_SQL = (
+    "(setweight(to_tsvector('russian', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(tags::text, '')), 'B') || "
+    "setweight(to_tsvector('russian', coalesce(category, '')), 'C'))"
+)
+
+CATALOG_FTS_INDEX_SQL = (
+    f"CREATE INDEX IF NOT EXISTS idx_catalog_posts_fts ON catalog_posts USING GIN ({CATALOG_TSVECTOR_SQL})"
+)
+
+# Текст для pg_trgm; должен совпадать с выражением индекса idx_catalog_posts_trgm
+CATALOG_TRGM_TEXT_SQL = (
+    "lower(coalesce(name, '') || ' ' || coalesce(tags::text, '') || ' ' || coalesce(category, ''))"
+)
+
+CATALOG_TRGM_INDEX_SQLS = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX IF NOT EXISTS idx_catalog_posts_trgm ON catalog_posts USING GIN ({CATALOG_TRGM_TEXT_SQL} gin_trgm_ops)",
+]
+
+# ============= ТОКЕНИЗАЦИЯ И СТЕММИНГ =============
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+_VOWELS = 'аеиоуыэюя'
+
+_PERFECTIVE_GERUND_1 = ('в', 'вши', 'вшись')
+_PERFECTIVE_GERUND_2 = ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись')
+_ADJECTIVE = (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем', 'им', 'ым', 'ом',
+    'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю', 'ая', 'яя', 'ою', 'ею'
+)
+_PARTICIPLE_1 = ('ем', 'нн', 'вш', 'ющ', 'щ')
+_PARTICIPLE_2 = ('ивш', 'ывш', 'ующ')
+_REFLEXIVE = ('ся', 'сь')
+_VERB_1 = ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет', 'ют', 'ны', 'ть', 'ешь', 'нно')
+_VERB_2 = (
+    'ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй', 'ил', 'ыл', 'им', 'ым',
+    'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'
+)
+_NOUN = (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и', 'ией', 'ей', 'ой', 'ий',
+    'й', 'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью',
+    'ю', 'ия', 'ья', 'я'
+)
+_SUPERLATIVE = ('ейше', 'ейш')
+_DERIVATIONAL = ('ость', 'ост')
+
+
+def _remove_ending(word: str, start: int, group1: Iterable[str] = (), group2: Iterable[str] = ()) -> Optional[str]:
+    """Удалить самое длинное окончание в регионе word[start:]; group1 - только после 'а'/'я'"""
+    region = word[start:]
+    best = ''
+
+    for ending in group1:
+        if (len(ending) > len(best) and region.endswith(ending)
+                and len(region) > len(ending) and region[-len(ending) - 1] in 'ая'):
+            best = ending
+
+    for ending in group2:
+        if len(ending) > len(best) and region.endswith(ending):
+            best = ending
+
+    return word[:-len(best)] if best else None
+
+
+def stem_russian(word: str) -> str:
+    """Стемминг русского слова (алгоритм Snowball)"""
+    word = word.lower().replace('ё', 'е')
+
+    rv = r1 = r2 = len(word)
+    for i, char in enumerate(word):
+        if char in _VOWELS:
+            rv = i + 1
+            break
+    for i in range(1, len(word)):
+        if word[i] not in _VOWELS and word[i - 1] in _VOWELS:
+            r1 = i + 1
+            break
+    for i in range(r1 + 1, len(word)):
+        if word[i] not in _VOWELS and word[i - 1] in _VOWELS:
+            r2 = i + 1
+            break
+
+    # Шаг 1
+    stemmed = _remove_ending(word, rv, _PERFECTIVE_GERUND_1, _PERFECTIVE_GERUND_2)
+    if stemmed is not None:
+        word = stemmed
+    else:
+        stemmed = _remove_ending(word, rv, group2=_REFLEXIVE)
+        if stemmed is not None:
+            word = stemmed
+
+        stemmed = _remove_ending(word, rv, group2=_ADJECTIVE)
+        if stemmed is not None:
+            word = _remove_ending(stemmed, rv, _PARTICIPLE_1, _PARTICIPLE_2) or stemmed
+        else:
+            stemmed = _remove_ending(word, rv, _VERB_1, _VERB_2)
+            if stemmed is None:
+                stemmed = _remove_ending(word, rv, group2=_NOUN)
+            if stemmed is not None:
+                word = stemmed
+
+    # Шаг 2
+    if word[rv:].endswith('и'):
+        word = word[:-1]
+
+    # Шаг 3
+    word = _remove_ending(word, r2, group2=_DERIVATIONAL) or word
+
+    # Шаг 4
+    if word[rv:].endswith('нн'):
+        word = word[:-1]
+    else:
+        stemmed = _remove_ending(word, rv, group2=_SUPERLATIVE)
+        if stemmed is not None:
+            word = stemmed[:-1] if stemmed[rv:].endswith('нн') else stemmed
+        elif word[rv:].endswith('ь'):
+            word = word[:-1]
+
+    return word
+
+
+def tokenize(value: str) -> List[str]:
+    """Разбить текст на слова (нижний регистр, ё -> е, от 2 символов)"""
+    if not value:
+        return []
+
+    return [
+        word for word in _WORD_RE.findall(value.lower().replace('ё', 'е'))
+        if len(word) >= 2 and not word.isdigit()
+    ]
+
+
+def stem_terms(value: str) -> List[str]:
+    """Слова текста после стемминга (латиница остаётся как есть)"""
+    return [stem_russian(word) if re.search('[а-я]', word) else word for word in tokenize(value)]
+
+
+# ============= ТРАНСЛИТЕРАЦИЯ И ТРИГРАММЫ =============
+
+_LATIN_TO_CYRILLIC = [
+    ('shch', 'щ'), ('sch', 'щ'), ('zh', 'ж'), ('kh', 'х'), ('ts', 'ц'), ('ch', 'ч'), ('sh', 'ш'),
+    ('yo', 'е'), ('yu', 'ю'), ('ya', 'я'), ('ye', 'е'), ('ju', 'ю'), ('ja', 'я'),
+    ('a', 'а'), ('b', 'б'), ('v', 'в'), ('g', 'г'), ('d', 'д'), ('e', 'е'), ('z', 'з'), ('i', 'и'),
+    ('j', 'й'), ('k', 'к'), ('l', 'л'), ('m', 'м'), ('n', 'н'), ('o', 'о'), ('p', 'п'), ('r', 'р'),
+    ('s', 'с'), ('t', 'т'), ('u', 'у'), ('f', 'ф'), ('h', 'х'), ('c', 'к'), ('y', 'ы'), ('w', 'в'),
+    ('x', 'кс'), ('q', 'к'),
+]
+_CYRILLIC_TO_LATIN = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ж': 'zh', 'з': 'z', 'и': 'i',
+    'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's',
+    'т': 't', 'у': 'u', 'ф': 'f', 'х': 'kh', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'shch',
+    'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+}
+
+TRIGRAM_THRESHOLD = 0.3
+
+
+_LATIN_RE = re.compile('[a-z]')
+
+
+@lru_cache(maxsize=20000)
+def to_cyrillic(value: str) -> str:
+    """Латиница -> кириллица (кириллические символы не меняются)"""
+    if not _LATIN_RE.search(value):
+        return value
+
+    result = []
+    i = 0
+    while i < len(value):
+        for latin, cyrillic in _LATIN_TO_CYRILLIC:
+            if value.startswith(latin, i):
+                result.append(cyrillic)
+                i += len(latin)
+                break
+        else:
+            result.append(value[i])
+            i += 1
+    return ''.join(result)
+
+
+def to_latin(value: str) -> str:
+    """Кириллица -> латиница"""
+    return ''.join(_CYRILLIC_TO_LATIN.get(char, char) for char in value)
+
+
+def trigrams(word: str) -> Set[str]:
+    """Триграммы слова как в pg_trgm (два пробела в начале, один в конце)"""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def fuzzy_terms(value: str) -> List[str]:
+    """Слова текста для нечёткого поиска (приведены к кириллице)"""
+    return [to_cyrillic(word) for word in tokenize(value) if len(word) >= 3]
+
+
+# ============= ИНДЕКС В ПАМЯТИ (SQLite) =============
+
+class CatalogSearchIndex:
+    """Полнотекстовый поиск по каталогу с выбором backend по типу БД"""
+
+    FIELD_WEIGHTS = {'name': 3.0, 'tags': 2.0, 'category': 1.0}
+
+    def __init__(self):
+        self.use_postgres = 'postgres' in (Config.DATABASE_URL or '')
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._doc_terms: Dict[int, Set[str]] = {}
+        self._word_posts: Dict[str, Dict[int, float]] = {}
+        self._trigram_words: Dict[str, Set[str]] = {}
+        self._doc_words: Dict[int, Set[str]] = {}
+        self._loaded = False
+
+    # ============= ОБНОВЛЕНИЕ =============
+
+    def index_post(self, post: CatalogPost):
+        """Добавить или обновить пост в индексе (неактивные посты удаляются)"""
+        if not self._loaded:
+            return
+
+        self.remove_post(post.id)
+
+        if not post.is_active:
+            return
+
+        weights: Dict[str, float] = {}
+        word_weights: Dict[str, float] = {}
+        fields = {
+            'name': post.name or '',
+            'tags': ' '.join(str(tag) for tag in (post.tags or [])),
+            'category': post.category or ''
+        }
+        for field, value in fields.items():
+            for term in stem_terms(value):
+                weights[term] = weights.get(term, 0) + self.FIELD_WEIGHTS[field]
+            for word in fuzzy_terms(value):
+                word_weights[word] = max(word_weights.get(word, 0), self.FIELD_WEIGHTS[field])
+
+        for term, weight in weights.items():
+            self._postings.setdefault(term, {})[post.id] = weight
+        self._doc_terms[post.id] = set(weights)
+
+        for word, weight in word_weights.items():
+            if word not in self._word_posts:
+                self._word_posts[word] = {}
+                for trigram in trigrams(word):
+                    self._trigram_words.setdefault(trigram, set()).add(word)
+            self._word_posts[word][post.id] = weight
+        self._doc_words[post.id] = set(word_weights)
+
+    def remove_post(self, post_id: int):
+        """Удалить пост из индекса"""
+        for term in self._doc_terms.pop(post_id, ()):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(post_id, None)
+                if not postings:
+                    del self._postings[term]
+
+        for word in self._doc_words.pop(post_id, ()):
+            posts = self._word_posts.get(word)
+            if posts is None:
+                continue
+
+            posts.pop(post_id, None)
+            if not posts:
+                del self._word_posts[word]
+                for trigram in trigrams(word):
+                    words = self._trigram_words.get(trigram)
+                    if words is not None:
+                        words.discard(word)
+                        if not words:
+                            del self._trigram_words[trigram]
+
+    async def _ensure_loaded(self, session):
+        """Построить индекс по активным постам при первом поиске"""
+        if self._loaded:
+            return
+
+        result = await session.execute(
+            select(CatalogPost).where(CatalogPost.is_active == True)
+        )
+        self._loaded = True
+        for post in result.scalars().all():
+            self.index_post(post)
+
+        logger.info(f"Catalog search index built: {len(self._doc_terms)} posts, {len(self._postings)} terms")
+
+    # ============= ПОИСК =============
+
+    async def search_ids(self, session, query: str, limit: int = 10) -> List[int]:
+        """id активных постов по убыванию релевантности"""
+        if self.use_postgres:
+            return await self._search_postgres(session, query, limit)
+
+        await self._ensure_loaded(session)
+        return self._search_memory(query, limit)
+
+    def _search_memory(self, query: str, limit: int) -> List[int]:
+        total_docs = len(self._doc_terms) or 1
+        scores: Dict[int, float] = {}
+
+        for term in set(stem_terms(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+
+            idf = math.log(1 + total_docs / len(postings))
+            for post_id, weight in postings.items():
+                scores[post_id] = scores.get(post_id, 0) + weight * idf
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [post_id for post_id, _ in ranked[:limit]]
+
+    async def fuzzy_search_ids(self, session, query: str, limit: int = 10) -> List[int]:
+        """id активных постов по похожести триграмм (опечатки, транслит)"""
+        if self.use_postgres:
+            return await self._fuzzy_search_postgres(session, query, limit)
+
+        await self._ensure_loaded(session)
+        return self._fuzzy_search_memory(query, limit)
+
+    def _similar_words(self, word: str) -> Dict[str, float]:
+        """Слова индекса с похожестью триграмм не ниже порога"""
+        query_trigrams = trigrams(word)
+        shared: Dict[str, int] = {}
+
+        for trigram in query_trigrams:
+            for candidate in self._trigram_words.get(trigram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+
+        similar = {}
+        for candidate, count in shared.items():
+            similarity = count / (len(query_trigrams) + len(trigrams(candidate)) - count)
+            if similarity >= TRIGRAM_THRESHOLD:
+                similar[candidate] = similarity
+        return similar
+
+    def _fuzzy_search_memory(self, query: str, limit: int) -> List[int]:
+        scores: Dict[int, float] = {}
+
+        for word in set(fuzzy_terms(query)):
+            best: Dict[int, float] = {}
+            for candidate, similarity in self._similar_words(word).items():
+                for post_id, weight in self._word_posts[candidate].items():
+                    best[post_id] = max(best.get(post_id, 0), similarity * weight)
+
+            for post_id, score in best.items():
+                scores[post_id] = scores.get(post_id, 0) + score
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [post_id for post_id, _ in ranked[:limit]]
+
+    async def _fuzzy_search_postgres(self, session, query: str, limit: int) -> List[int]:
+        value = ' '.join(tokenize(query))
+        if not value:
+            return []
+
+        result = await session.execute(
+            text(
+                f"SELECT id FROM catalog_posts "
+                f"WHERE is_active = TRUE AND (:original <% {CATALOG_TRGM_TEXT_SQL} "
+                f"OR :cyrillic <% {CATALOG_TRGM_TEXT_SQL} OR :latin <% {CATALOG_TRGM_TEXT_SQL}) "
+                f"ORDER BY GREATEST("
+                f"word_similarity(:original, {CATALOG_TRGM_TEXT_SQL}), "
+                f"word_similarity(:cyrillic, {CATALOG_TRGM_TEXT_SQL}), "
+                f"word_similarity(:latin, {CATALOG_TRGM_TEXT_SQL})) DESC, id "
+                f"LIMIT :limit"
+            ),
+            {
+                'original': value,
+                'cyrillic': to_cyrillic(value),
+                'latin': to_latin(value),
+                'limit': limit
+            }
+        )
+        return [row[0] for row in result.all()]
+
+    async def _search_postgres(self, session, query: str, limit: int) -> List[int]:
+        words = tokenize(query)
+        if not words:
+            return []
+
+        result = await session.execute(
+            text(
+                f"SELECT id FROM catalog_posts, to_tsquery('russian', :query) AS query "
+                f"WHERE is_active = TRUE AND {CATALOG_TSVECTOR_SQL} @@ query "
+                f"ORDER BY ts_rank({CATALOG_TSVECTOR_SQL}, query) DESC, id "
+                f"LIMIT :limit"
+            ),
+            {'query': ' | '.join(words), 'limit': limit}
+        )
+        return [row[0] for row in result.all()]
+
+
+# ============= ГЛОБАЛЬНЫЙ ЭКЗЕМПЛЯР =============
+
+catalog_search = CatalogSearchIndex()
+
+__all__ = [
+    'catalog_search',
+    'CatalogSearchIndex',
+    'stem_russian',
+    'tokenize',
+    'to_cyrillic',
+    'to_latin',
+    'CATALOG_FTS_INDEX_SQL',
+    'CATALOG_TRGM_INDEX_SQLS'
+]
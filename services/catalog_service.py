@@ -18,17 +18,37 @@
 Версия: 5.0.0
 Дата: 25.10.2025
 """
+import copy
 import logging
-import random
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime, timedelta
-from sqlalchemy import select, and_, or_, func, text, desc
+from sqlalchemy import select, update, and_, or_, func, text, desc, case, bindparam
+from sqlalchemy.exc import IntegrityError
 from services.db import db
+from services.cache_service import CacheService
+from services.catalog_composer import catalog_composer
+from services.catalog_counters import catalog_counters
+from services.catalog_notifier import catalog_notifier
+from services.catalog_numbers import catalog_numbers
+from services.catalog_prefetch import catalog_prefetch
+from services.catalog_feed import catalog_feed, TOP_GIRLS_CATEGORY, TOP_BOYS_CATEGORY
+from services.catalog_search import catalog_search
+from utils.packed_ids import pack_ids, unpack_ids, append_ids, segment_count, pack_order, order_length
 from models import CatalogPost, CatalogReview, CatalogSubscription, CatalogSession
 from config import Config
 
 logger = logging.getLogger(__name__)
 
+# Категории TopPeople: рейтинг берётся из голосований, а не из отзывов
+TOP_CATEGORIES = [TOP_GIRLS_CATEGORY, TOP_BOYS_CATEGORY]
+
+# Оценки отзывов (колонки rating_star_N в CatalogPost)
+RATING_STARS = (1, 2, 3, 4, 5)
+
+# Просмотренные id дописываются сегментами; после стольких сегментов
+# строка перепаковывается целиком (и пересчитывается viewed_count)
+VIEWED_COMPACT_SEGMENTS = 64
+
 # ============= КАТЕГОРИИ КАТАЛОГА =============
 CATALOG_CATEGORIES = {
     '💇‍♀️ Красота и уход': [
@@ -67,23 +87,66 @@ class CatalogService:
         self.max_posts_per_page = 5
         self.max_priority_posts = 10
         self.ad_frequency = 10
+        
+        # Карточки постов: ('id', post_id) -> dict, ('number', catalog_number) -> post_id,
+        # ('featured',) -> активные реклама и приоритетные посты
+        self._post_cache = CacheService(ttl=300, max_size=500)
     
-    # ============= ГЕНЕРАЦИЯ УНИКАЛЬНОГО НОМЕРА =============
+    # ============= КЭШ КАРТОЧЕК =============
     
-    async def _generate_unique_catalog_number(self, session) -> int:
-        """Генерировать уникальный номер для нового поста (1-9999)"""
-        max_attempts = 100
-        for _ in range(max_attempts):
-            number = random.randint(1, 9999)
-            
-            result = await session.execute(
-                select(CatalogPost.id).where(CatalogPost.catalog_number == number)
-            )
-            
-            if not result.scalar_one_or_none():
-                return number
+    async def _cache_post_dict(self, post_dict: Dict):
+        """Положить карточку в кэш по id и по номеру
         
-        raise Exception("Could not generate unique catalog number after 100 attempts")
+        В кэш кладётся и из кэша отдаётся глубокая копия: вызывающий код
+        может менять вложенные списки (tags, media) своей карточки
+        """
+        await self._post_cache.set(('id', post_dict['id']), copy.deepcopy(post_dict))
+        if post_dict.get('catalog_number') is not None:
+            await self._post_cache.set(('number', post_dict['catalog_number']), post_dict['id'])
+    
+    async def invalidate_post(self, post_id: int, *catalog_numbers: int):
+        """Сбросить карточку поста (и старые номера, если номер менялся)"""
+        await self._post_cache.delete(
+            ('id', post_id),
+            ('featured',),
+            *[('number', number) for number in catalog_numbers if number is not None]
+        )
+    
+    def get_cache_stats(self) -> Dict:
+        """Счётчики кэша карточек"""
+        return self._post_cache.get_stats()
+    
+    # ============= УНИКАЛЬНЫЙ НОМЕР =============
+    
+    async def _insert_post(self, post: CatalogPost) -> CatalogPost:
+        """Сохранить новый пост с номером из аллокатора
+        
+        Если номер уже задан (зарезервирован заранее) - используется он
+        """
+        reserved = post.catalog_number is not None
+        
+        for attempt in range(2):
+            if not reserved:
+                post.catalog_number = await catalog_numbers.allocate()
+            
+            try:
+                async with db.get_session() as session:
+                    session.add(post)
+                    await session.commit()
+                    await session.refresh(post)
+                catalog_numbers.confirm(post.catalog_number)
+                return post
+                
+            except IntegrityError:
+                # Номер заняли в обход аллокатора - перечитываем занятые и пробуем другой
+                logger.warning(f"Catalog number {post.catalog_number} already taken, reloading pool")
+                await catalog_numbers.reload()
+                if reserved or attempt:
+                    raise
+                
+            except Exception:
+                await catalog_numbers.release(post.catalog_number)
+                raise
     
     # ============= БАЗОВЫЕ МЕТОДЫ =============
     
@@ -101,14 +164,17 @@ class CatalogService:
         media_group_id: Optional[str] = None,
         media_json: Optional[List[str]] = None,
         author_username: Optional[str] = None,
-        author_id: Optional[int] = None
+        author_id: Optional[int] = None,
+        catalog_number: Optional[int] = None
     ) -> Optional[int]:
-        """Добавить пост в каталог с медиа, уникальным номером и информацией об авторе"""
+        """Добавить пост в каталог с медиа, уникальным номером и информацией об авторе
+        
+        catalog_number - номер, заранее зарезервированный через catalog_numbers
+        Подписчики категории получат уведомление через очередь catalog_notifier
+        """
         try:
-            async with db.get_session() as session:
-                catalog_number = await self._generate_unique_catalog_number(session)
-                
-                post = CatalogPost(
+            post = await self._insert_post(
+                CatalogPost(
                     user_id=user_id,
                     catalog_link=catalog_link,
                     category=category,
@@ -125,15 +191,14 @@ class CatalogService:
                     media_group_id=media_group_id,
                     media_json=media_json or media_files or []
                 )
-                
-                session.add(post)
-                await session.commit()
-                await session.refresh(post)
-                
-                media_info = f"with media ({len(media_files or [])} files)" if media_files else "without media"
-                logger.info(f"Added catalog post #{catalog_number} (ID: {post.id}) by user {user_id} {media_info}, author: {author_username}")
-                return post.id
-                
+            )
+            catalog_search.index_post(post)
+            await catalog_notifier.enqueue_post(post.id, category, author_id=user_id)
+            
+            media_info = f"with media ({len(media_files or [])} files)" if media_files else "without media"
+            logger.info(f"Added catalog post #{post.catalog_number} (ID: {post.id}) by user {user_id} {media_info}, author: {author_username}")
+            return post.id
+            
         except Exception as e:
             logger.error(f"Error adding catalog post: {e}")
             return None
@@ -148,34 +213,23 @@ class CatalogService:
             tuple: (rating: float, vote_count: int)
         """
         try:
-            from handlers.rating_handler import rating_data
+            from handlers.rating_handler import get_rating_totals
             
-            # Ищем пост по ссылке
-            for post_id, post_data in rating_data.get('posts', {}).items():
-                published_link = post_data.get('published_link', '')
-                
-                # Проверяем совпадение ссылок
-                if published_link == catalog_link:
-                    votes = post_data.get('votes', {})
-                    
-                    if not votes:
-                        return (0.0, 0)
-                    
-                    # Считаем средний рейтинг
-                    total_score = sum(votes.values())
-                    vote_count = len(votes)
-                    avg_score = total_score / vote_count if vote_count > 0 else 0
-                    
-                    # Конвертируем в шкалу 0-5 звезд
-                    # -2 до +2 → 0 до 5 звезд
-                    # Формула: (avg_score + 2) * 1.25
-                    rating = max(0, min(5, (avg_score + 2) * 1.25))
-                    
-                    logger.info(f"Rating from TopPeople: {rating:.1f} stars ({vote_count} votes)")
-                    return (round(rating, 1), vote_count)
+            # Итоги голосования по индексу ссылок (без перебора постов)
+            totals = get_rating_totals(catalog_link)
+            if not totals or not totals[1]:
+                return (0.0, 0)
             
-            # Если пост не найден
-            return (0.0, 0)
+            total_score, vote_count = totals
+            avg_score = total_score / vote_count
+            
+            # Конвертируем в шкалу 0-5 звезд
+            # -2 до +2 → 0 до 5 звезд
+            # Формула: (avg_score + 2) * 1.25
+            rating = max(0, min(5, (avg_score + 2) * 1.25))
+            
+            logger.debug(f"Rating from TopPeople: {rating:.1f} stars ({vote_count} votes)")
+            return (round(rating, 1), vote_count)
             
         except Exception as e:
             logger.error(f"Error getting rating from TopPeople: {e}")
@@ -190,251 +244,404 @@ class CatalogService:
             logger.error(f"Error importing rating: {e}")
             return 0.0
     
-    # ============= СМЕШАННАЯ ВЫДАЧА =============
+    # ============= РЕЙТИНГ ДЛЯ СТРАНИЦЫ =============
     
-    async def get_random_posts_mixed(self, user_id: int, count: int = 5) -> List[Dict]:
-        """Получить смешанные посты: 4 обычных + 1 из TopGirl/TopBoy"""
+    def _rating_from_summary(self, post: CatalogPost) -> tuple:
+        """
+        Рейтинг из денормализованной сводки поста (без запросов к отзывам)
+        
+        Returns:
+            tuple: (rating: float, review_count: int)
+        """
+        count = post.rating_count or 0
+        if count <= 0:
+            return (0, 0)
+        
+        return (round((post.rating_sum or 0) / count, 1), count)
+    
+    async def _posts_to_dicts_with_rating(self, posts: List[CatalogPost]) -> List[Dict]:
+        """Конвертировать посты в словари с рейтингом без дополнительных запросов"""
+        result_posts = []
+        for post in posts:
+            post_dict = self._post_to_dict(post)
+            
+            if post.category in TOP_CATEGORIES:
+                rating, vote_count = await self.get_rating_from_toppeople(post.catalog_link)
+                post_dict['rating'] = rating
+                post_dict['review_count'] = vote_count
+            else:
+                rating, review_count = self._rating_from_summary(post)
+                post_dict['rating'] = rating
+                post_dict['review_count'] = review_count
+            
+            result_posts.append(post_dict)
+        
+        return result_posts
+    
+    # ============= СВОДКА РЕЙТИНГА: ПЕРЕСЧЁТ И ПРОВЕРКА =============
+    
+    async def _aggregate_reviews(self, session) -> Dict[int, Dict]:
+        """Посчитать сводку рейтинга по таблице отзывов одним GROUP BY запросом"""
+        result = await session.execute(
+            select(
+                CatalogReview.catalog_post_id,
+                func.sum(CatalogReview.rating).label('rating_sum'),
+                func.count(CatalogReview.id).label('rating_count'),
+                *[
+                    func.sum(case((CatalogReview.rating == star, 1), else_=0)).label(f'rating_star_{star}')
+                    for star in RATING_STARS
+                ]
+            ).where(CatalogReview.catalog_post_id.isnot(None))
+            .group_by(CatalogReview.catalog_post_id)
+        )
+        
+        return {
+            row.catalog_post_id: {
+                'rating_sum': int(row.rating_sum or 0),
+                'rating_count': int(row.rating_count or 0),
+                **{f'rating_star_{star}': int(getattr(row, f'rating_star_{star}') or 0) for star in RATING_STARS}
+            }
+            for row in result.all()
+        }
+    
+    async def rebuild_rating_summaries(self) -> int:
+        """Пересчитать сводку рейтинга всех постов из отзывов (backfill)"""
         try:
             async with db.get_session() as session:
-                result = await session.execute(
-                    select(CatalogSession).where(
-                        and_(
-                            CatalogSession.user_id == user_id,
-                            CatalogSession.session_active == True
-                        )
+                summaries = await self._aggregate_reviews(session)
+                
+                empty_summary = {'rating_sum': 0, 'rating_count': 0}
+                empty_summary.update({f'rating_star_{star}': 0 for star in RATING_STARS})
+                await session.execute(update(CatalogPost).values(**empty_summary))
+                
+                if summaries:
+                    table = CatalogPost.__table__
+                    await session.execute(
+                        update(table).where(table.c.id == bindparam('b_post_id')).values(
+                            **{column: bindparam(f'b_{column}') for column in empty_summary}
+                        ),
+                        [
+                            {'b_post_id': post_id, **{f'b_{column}': value for column, value in summary.items()}}
+                            for post_id, summary in summaries.items()
+                        ]
                     )
-                )
-                user_session = result.scalar_one_or_none()
                 
-                if not user_session:
-                    user_session = CatalogSession(
-                        user_id=user_id,
-                        viewed_posts=[],
-                        session_active=True
-                    )
-                    session.add(user_session)
-                    await session.commit()
-                    await session.refresh(user_session)
-                
-                viewed_ids = user_session.viewed_posts or []
-                
-                # 1. ПОЛУЧАЕМ 4 ОБЫЧНЫХ ПОСТА
-                regular_result = await session.execute(
-                    select(CatalogPost).where(
-                        and_(
-                            CatalogPost.is_active == True,
-                            ~CatalogPost.category.in_(['👱🏻‍♀️ TopGirls', '🤵🏼‍♂️ TopBoys']),
-                            ~CatalogPost.id.in_(viewed_ids) if viewed_ids else True
-                        )
-                    ).order_by(func.random()).limit(4)
-                )
-                regular_posts = regular_result.scalars().all()
+                await session.commit()
+                logger.info(f"Rebuilt rating summaries for {len(summaries)} posts")
+                return len(summaries)
                 
-                # 2. ПОЛУЧАЕМ 1 TOP ПОСТ
-                top_category = random.choice(['👱🏻‍♀️ TopGirls', '🤵🏼‍♂️ TopBoys'])
+        except Exception as e:
+            logger.error(f"Error rebuilding rating summaries: {e}")
+            return 0
+    
+    async def check_rating_summaries(self) -> List[Dict]:
+        """Сверить сводку рейтинга с таблицей отзывов, вернуть расхождения"""
+        try:
+            async with db.get_session() as session:
+                actual = await self._aggregate_reviews(session)
                 
-                top_result = await session.execute(
-                    select(CatalogPost).where(
-                        and_(
-                            CatalogPost.is_active == True,
-                            CatalogPost.category == top_category,
-                            ~CatalogPost.id.in_(viewed_ids) if viewed_ids else True
-                        )
-                    ).order_by(func.random()).limit(1)
+                columns = ['rating_sum', 'rating_count'] + [f'rating_star_{star}' for star in RATING_STARS]
+                result = await session.execute(
+                    select(CatalogPost.id, *[getattr(CatalogPost, c) for c in columns])
                 )
-                top_posts = top_result.scalars().all()
-                
-                if not top_posts:
-                    other_category = '🤵🏼‍♂️ TopBoys' if top_category == '👱🏻‍♀️ TopGirls' else '👱🏻‍♀️ TopGirls'
-                    top_result = await session.execute(
-                        select(CatalogPost).where(
-                            and_(
-                                CatalogPost.is_active == True,
-                                CatalogPost.category == other_category,
-                                ~CatalogPost.id.in_(viewed_ids) if viewed_ids else True
-                            )
-                        ).order_by(func.random()).limit(1)
-                    )
-                    top_posts = top_result.scalars().all()
-                
-                # 3. ОБЪЕДИНЯЕМ ПОСТЫ
-                all_posts = list(regular_posts) + list(top_posts)
-                
-                if len(all_posts) < count:
-                    needed = count - len(all_posts)
-                    extra_result = await session.execute(
-                        select(CatalogPost).where(
-                            and_(
-                                CatalogPost.is_active == True,
-                                ~CatalogPost.id.in_([p.id for p in all_posts] + viewed_ids),
-                            )
-                        ).order_by(func.random()).limit(needed)
-                    )
-                    extra_posts = extra_result.scalars().all()
-                    all_posts.extend(extra_posts)
-                
-                if not all_posts:
-                    return []
                 
-                # 4. ДОБАВЛЯЕМ РЕЙТИНГ
-                result_posts = []
-                for post in all_posts:
-                    viewed_ids.append(post.id)
+                mismatches = []
+                for row in result.all():
+                    stored = {c: int(getattr(row, c) or 0) for c in columns}
+                    expected = actual.get(row.id, {c: 0 for c in columns})
                     
-                    post_dict = self._post_to_dict(post)
-                    
-                    if post.category in ['👱🏻‍♀️ TopGirls', '🤵🏼‍♂️ TopBoys']:
-                        rating, vote_count = await self.get_rating_from_toppeople(post.catalog_link)
-                        post_dict['rating'] = rating
-                        post_dict['review_count'] = vote_count
-                    else:
-                        reviews_result = await session.execute(
-                            select(
-                                func.avg(CatalogReview.rating).label('avg_rating'),
-                                func.count(CatalogReview.id).label('review_count')
-                            ).where(CatalogReview.catalog_post_id == post.id)
-                        )
-                        rating_data = reviews_result.first()
-                        
-                        post_dict['rating'] = round(rating_data.avg_rating, 1) if rating_data.avg_rating else 0
-                        post_dict['review_count'] = rating_data.review_count or 0
-                    
-                    result_posts.append(post_dict)
-                
-                random.shuffle(result_posts)
+                    if stored != expected:
+                        mismatches.append({
+                            'post_id': row.id,
+                            'stored': stored,
+                            'actual': expected
+                        })
                 
-                user_session.viewed_posts = viewed_ids
-                user_session.last_activity = datetime.utcnow()
-                await session.commit()
-                
-                return result_posts
+                logger.info(f"Rating summary check: {len(mismatches)} mismatches")
+                return mismatches
                 
         except Exception as e:
-            logger.error(f"Error getting mixed random posts: {e}")
+            logger.error(f"Error checking rating summaries: {e}")
             return []
     
-    async def get_random_posts(self, user_id: int, count: int = 5) -> List[Dict]:
-        """Получить случайные посты без повторов"""
+    # ============= ПОСТРОИТЕЛИ ГОРЯЧИХ ЗАПРОСОВ =============
+    # Используются и сервисом, и check_query_plans.py (EXPLAIN на тех же запросах)
+    
+    @staticmethod
+    def _feed_session_query(user_id: int):
+        """Активная сессия каталога пользователя"""
+        return select(CatalogSession).where(
+            and_(
+                CatalogSession.user_id == user_id,
+                CatalogSession.session_active == True
+            )
+        )
+    
+    @staticmethod
+    def _feed_candidates_query():
+        """Активные посты для построения ленты: (id, category)"""
+        return select(CatalogPost.id, CatalogPost.category).where(CatalogPost.is_active == True)
+    
+    @staticmethod
+    def _feed_page_query(page_ids: List[int]):
+        """Активные посты страницы ленты по id"""
+        return select(CatalogPost).where(
+            and_(
+                CatalogPost.id.in_(page_ids),
+                CatalogPost.is_active == True
+            )
+        )
+    
+    @staticmethod
+    def _reviews_page_query(post_id: int, limit: int, before: Optional[Tuple[datetime, int]] = None):
+        """Страница отзывов с постом и гистограммой (LEFT JOIN, keyset по (created_at, id))"""
+        review_filter = CatalogReview.catalog_post_id == CatalogPost.id
+        if before:
+            before_created, before_id = before
+            review_filter = and_(
+                review_filter,
+                or_(
+                    CatalogReview.created_at < before_created,
+                    and_(CatalogReview.created_at == before_created, CatalogReview.id < before_id)
+                )
+            )
+        
+        # Пост с гистограммой присоединяется к каждой строке страницы (LEFT JOIN -
+        # строка поста есть и без отзывов), лишняя строка показывает, есть ли продолжение
+        star_columns = [getattr(CatalogPost, f'rating_star_{star}') for star in RATING_STARS]
+        return (
+            select(
+                CatalogPost.catalog_number,
+                CatalogPost.name,
+                CatalogPost.rating_count,
+                *star_columns,
+                CatalogReview.id,
+                CatalogReview.user_id,
+                CatalogReview.username,
+                CatalogReview.review_text,
+                CatalogReview.rating,
+                CatalogReview.created_at
+            )
+            .select_from(CatalogPost)
+            .outerjoin(CatalogReview, review_filter)
+            .where(CatalogPost.id == post_id)
+            .order_by(CatalogReview.created_at.desc(), CatalogReview.id.desc())
+            .limit(limit + 1)
+        )
+    
+    @staticmethod
+    def _post_by_number_query(catalog_number: int):
+        return select(CatalogPost).where(CatalogPost.catalog_number == catalog_number)
+    
+    @staticmethod
+    def _user_posts_query(user_id: int):
+        return (
+            select(CatalogPost)
+            .where(CatalogPost.user_id == user_id)
+            .order_by(CatalogPost.created_at.desc())
+        )
+    
+    @staticmethod
+    def _category_stats_query():
+        return (
+            select(
+                CatalogPost.category,
+                func.count(CatalogPost.id).label('count')
+            ).where(CatalogPost.is_active == True)
+            .group_by(CatalogPost.category)
+            .order_by(func.count(CatalogPost.id).desc())
+        )
+    
+    @staticmethod
+    def _unique_viewers_query():
+        return select(func.count(func.distinct(CatalogSession.user_id))).where(
+            CatalogSession.viewed_count > 0
+        )
+    
+    # ============= СМЕШАННАЯ ВЫДАЧА =============
+    
+    async def _get_feed_session(self, session, user_id: int) -> CatalogSession:
+        """Получить активную сессию каталога, при необходимости построить ленту"""
+        result = await session.execute(self._feed_session_query(user_id))
+        user_session = result.scalar_one_or_none()
+        
+        if not user_session:
+            user_session = CatalogSession(
+                user_id=user_id,
+                viewed_posts=[],
+                session_active=True
+            )
+            session.add(user_session)
+        
+        if user_session.feed_packed is None:
+            await self._start_feed(session, user_session)
+        
+        return user_session
+    
+    async def _get_featured(self, session) -> Dict:
+        """Активные реклама и приоритетные посты (кэш): {'ads', 'ad_ids', 'priority_ids'}"""
+        featured = await self._post_cache.get(('featured',))
+        if featured is not None:
+            return featured
+        
+        result = await session.execute(
+            select(CatalogPost)
+            .where(
+                and_(
+                    CatalogPost.is_active == True,
+                    or_(CatalogPost.is_ad == True, CatalogPost.is_priority == True)
+                )
+            )
+            .order_by(CatalogPost.id)
+        )
+        posts = result.scalars().all()
+        ad_posts = [post for post in posts if post.is_ad]
+        
+        featured = {
+            'ads': await self._posts_to_dicts_with_rating(ad_posts),
+            'ad_ids': {post.id for post in ad_posts},
+            'priority_ids': {post.id for post in posts if post.is_priority and not post.is_ad}
+        }
+        await self._post_cache.set(('featured',), featured)
+        return featured
+    
+    async def _start_feed(self, session, user_session: CatalogSession):
+        """Построить перемешанную ленту сессии по новому seed
+        
+        Приоритетные посты ставятся на первые страницы, реклама в ленту не входит
+        (её вставляет catalog_composer при выдаче)
+        """
+        seed = catalog_feed.new_seed()
+        viewed = set(self._get_viewed_ids(user_session))
+        featured = await self._get_featured(session)
+        
+        rows = (await session.execute(self._feed_candidates_query())).all()
+        
+        order = catalog_feed.build_order(
+            [
+                (row.id, row.category) for row in rows
+                if row.id not in viewed and row.id not in featured['ad_ids']
+            ],
+            seed,
+            featured['priority_ids']
+        )
+        
+        user_session.feed_seed = seed
+        user_session.feed_packed = pack_order(order)
+        user_session.feed_cursor = 0
+        
+        logger.info(
+            f"Started catalog feed for user {user_session.user_id}: "
+            f"seed={seed}, posts={len(order)}"
+        )
+    
+    async def _load_feed_page(self, session, packed_order: bytes, cursor: int, count: int) -> tuple:
+        """Страница ленты по курсору: (посты, новый курсор)
+        
+        Из упакованного порядка распаковывается только срез страницы,
+        посты, деактивированные после старта ленты, пропускаются
+        """
+        page_posts = []
+        total = order_length(packed_order)
+        while len(page_posts) < count and cursor < total:
+            page_ids, cursor = catalog_feed.next_page(packed_order, cursor, count - len(page_posts))
+            
+            result = await session.execute(self._feed_page_query(page_ids))
+            posts_by_id = {post.id: post for post in result.scalars().all()}
+            page_posts.extend(posts_by_id[post_id] for post_id in page_ids if post_id in posts_by_id)
+        
+        return page_posts, cursor
+    
+    async def _prefetch_feed_page(self, packed_order: bytes, cursor: int, count: int) -> tuple:
+        """Фоновая сборка следующей страницы: (карточки с рейтингом, новый курсор)"""
         try:
             async with db.get_session() as session:
-                result = await session.execute(
-                    select(CatalogSession).where(
-                        and_(
-                            CatalogSession.user_id == user_id,
-                            CatalogSession.session_active == True
-                        )
-                    )
-                )
-                user_session = result.scalar_one_or_none()
+                page_posts, cursor = await self._load_feed_page(session, packed_order, cursor, count)
+                return await self._posts_to_dicts_with_rating(page_posts), cursor
                 
-                if not user_session:
-                    user_session = CatalogSession(
-                        user_id=user_id,
-                        viewed_posts=[],
-                        session_active=True
-                    )
-                    session.add(user_session)
-                    await session.commit()
-                    await session.refresh(user_session)
+        except Exception as e:
+            logger.error(f"Error prefetching catalog page: {e}")
+            return None
+    
+    async def get_random_posts_mixed(self, user_id: int, count: int = 5) -> List[Dict]:
+        """Получить смешанные посты: 4 обычных + 1 из TopGirl/TopBoy
+        
+        Следующая страница сразу собирается в фоне (catalog_prefetch),
+        реклама вставляется по ad_frequency каждого объявления (catalog_composer)
+        """
+        try:
+            async with db.get_session() as session:
+                user_session = await self._get_feed_session(session, user_id)
                 
-                viewed_ids = user_session.viewed_posts or []
+                packed_order = user_session.feed_packed or b''
+                seed = user_session.feed_seed
+                cursor = user_session.feed_cursor or 0
                 
-                result = await session.execute(
-                    select(CatalogPost).where(
-                        and_(
-                            CatalogPost.is_active == True,
-                            ~CatalogPost.id.in_(viewed_ids) if viewed_ids else True
-                        )
-                    ).order_by(func.random()).limit(count)
-                )
-                posts = result.scalars().all()
+                prefetched = await catalog_prefetch.take(user_id, seed, cursor, count)
+                if prefetched is not None:
+                    result_posts, cursor = prefetched
+                else:
+                    page_posts, cursor = await self._load_feed_page(session, packed_order, cursor, count)
+                    result_posts = await self._posts_to_dicts_with_rating(page_posts)
                 
-                if not posts:
-                    return []
+                user_session.feed_cursor = cursor
+                user_session.last_activity = datetime.utcnow()
                 
-                result_posts = []
-                for post in posts:
-                    viewed_ids.append(post.id)
-                    
-                    post_dict = self._post_to_dict(post)
-                    
-                    if post.category in ['👱🏻‍♀️ TopGirls', '🤵🏼‍♂️ TopBoys']:
-                        rating, vote_count = await self.get_rating_from_toppeople(post.catalog_link)
-                        post_dict['rating'] = rating
-                        post_dict['review_count'] = vote_count
-                    else:
-                        reviews_result = await session.execute(
-                            select(
-                                func.avg(CatalogReview.rating).label('avg_rating'),
-                                func.count(CatalogReview.id).label('review_count')
-                            ).where(CatalogReview.catalog_post_id == post.id)
-                        )
-                        rating_data = reviews_result.first()
-                        
-                        post_dict['rating'] = round(rating_data.avg_rating, 1) if rating_data.avg_rating else 0
-                        post_dict['review_count'] = rating_data.review_count or 0
-                    
-                    result_posts.append(post_dict)
+                if not result_posts:
+                    await session.commit()
+                    return []
                 
-                user_session.viewed_posts = viewed_ids
-                user_session.last_activity = datetime.utcnow()
+                self._append_viewed_ids(user_session, [post['id'] for post in result_posts])
+                featured = await self._get_featured(session)
                 await session.commit()
                 
-                return result_posts
+                if cursor < order_length(packed_order):
+                    catalog_prefetch.schedule(
+                        user_id, seed, cursor, count,
+                        self._prefetch_feed_page(packed_order, cursor, count)
+                    )
+                
+                return catalog_composer.compose(
+                    user_id, seed, result_posts, copy.deepcopy(featured['ads']), self.ad_frequency
+                )
                 
         except Exception as e:
-            logger.error(f"Error getting random posts: {e}")
+            logger.error(f"Error getting mixed random posts: {e}")
             return []
     
+    async def get_random_posts(self, user_id: int, count: int = 5) -> List[Dict]:
+        """Получить случайные посты без повторов (та же лента сессии, что и смешанная выдача)"""
+        return await self.get_random_posts_mixed(user_id, count)
+    
+    async def _get_active_posts_in_order(self, session, post_ids: List[int]) -> List[CatalogPost]:
+        """Активные посты по списку id в том же порядке"""
+        if not post_ids:
+            return []
+        
+        result = await session.execute(
+            select(CatalogPost).where(
+                and_(
+                    CatalogPost.id.in_(post_ids),
+                    CatalogPost.is_active == True
+                )
+            )
+        )
+        posts_by_id = {post.id: post for post in result.scalars().all()}
+        return [posts_by_id[post_id] for post_id in post_ids if post_id in posts_by_id]
+    
     async def search_posts(self, query: str, limit: int = 10) -> List[Dict]:
-        """Поиск постов по ключевым словам и тегам"""
+        """Полнотекстовый поиск по названию, тегам и категории (по релевантности)
+        
+        Если точных совпадений нет - нечёткий поиск по триграммам
+        """
         try:
-            from sqlalchemy import String, cast
-            
             async with db.get_session() as session:
-                keywords = query.lower().split()
+                post_ids = await catalog_search.search_ids(session, query, limit)
+                if not post_ids:
+                    post_ids = await catalog_search.fuzzy_search_ids(session, query, limit)
                 
-                conditions = []
-                for keyword in keywords:
-                    # Поиск по названию
-                    conditions.append(func.lower(CatalogPost.name).contains(keyword))
-                    
-                    # Поиск по тегам
-                    conditions.append(
-                        cast(CatalogPost.tags, String).ilike(f'%{keyword}%')
-                    )
-                
-                query_obj = select(CatalogPost).where(
-                    and_(
-                        CatalogPost.is_active == True,
-                        or_(*conditions) if conditions else True
-                    )
-                ).limit(limit)
-                
-                result = await session.execute(query_obj)
-                posts = result.scalars().all()
-                
-                result_posts = []
-                for post in posts:
-                    post_dict = self._post_to_dict(post)
-                    
-                    if post.category in ['👱🏻‍♀️ TopGirls', '🤵🏼‍♂️ TopBoys']:
-                        rating, vote_count = await self.get_rating_from_toppeople(post.catalog_link)
-                        post_dict['rating'] = rating
-                        post_dict['review_count'] = vote_count
-                    else:
-                        reviews_result = await session.execute(
-                            select(
-                                func.avg(CatalogReview.rating).label('avg_rating'),
-                                func.count(CatalogReview.id).label('review_count')
-                            ).where(CatalogReview.catalog_post_id == post.id)
-                        )
-                        rating_data = reviews_result.first()
-                        
-                        post_dict['rating'] = round(rating_data.avg_rating, 1) if rating_data.avg_rating else 0
-                        post_dict['review_count'] = rating_data.review_count or 0
-                    
-                    result_posts.append(post_dict)
+                posts = await self._get_active_posts_in_order(session, post_ids)
+                result_posts = await self._posts_to_dicts_with_rating(posts)
                 
                 logger.info(f"Search '{query}' found {len(result_posts)} posts")
                 return result_posts
@@ -443,8 +650,27 @@ class CatalogService:
             logger.error(f"Error searching posts: {e}")
             return []
     
+    async def fuzzy_search_posts(self, query: str, limit: int = 10) -> List[Dict]:
+        """Нечёткий поиск: опечатки и латиница/кириллица ("manikur" -> "маникюр")"""
+        try:
+            async with db.get_session() as session:
+                post_ids = await catalog_search.fuzzy_search_ids(session, query, limit)
+                posts = await self._get_active_posts_in_order(session, post_ids)
+                result_posts = await self._posts_to_dicts_with_rating(posts)
+                
+                logger.info(f"Fuzzy search '{query}' found {len(result_posts)} posts")
+                return result_posts
+                
+        except Exception as e:
+            logger.error(f"Error in fuzzy search: {e}")
+            return []
+    
     async def get_post_by_id(self, post_id: int) -> Optional[Dict]:
         """Получить пост по ID с рейтингом"""
+        cached = await self._post_cache.get(('id', post_id))
+        if cached is not None:
+            return copy.deepcopy(cached)
+        
         try:
             async with db.get_session() as session:
                 result = await session.execute(
@@ -455,23 +681,8 @@ class CatalogService:
                 if not post:
                     return None
                 
-                post_dict = self._post_to_dict(post)
-                
-                if post.category in ['👱🏻‍♀️ TopGirls', '🤵🏼‍♂️ TopBoys']:
-                    rating, vote_count = await self.get_rating_from_toppeople(post.catalog_link)
-                    post_dict['rating'] = rating
-                    post_dict['review_count'] = vote_count
-                else:
-                    reviews_result = await session.execute(
-                        select(
-                            func.avg(CatalogReview.rating).label('avg_rating'),
-                            func.count(CatalogReview.id).label('review_count')
-                        ).where(CatalogReview.catalog_post_id == post.id)
-                    )
-                    rating_data = reviews_result.first()
-                    
-                    post_dict['rating'] = round(rating_data.avg_rating, 1) if rating_data.avg_rating else 0
-                    post_dict['review_count'] = rating_data.review_count or 0
+                post_dict = (await self._posts_to_dicts_with_rating([post]))[0]
+                await self._cache_post_dict(post_dict)
                 
                 return post_dict
                 
@@ -481,33 +692,22 @@ class CatalogService:
     
     async def get_post_by_number(self, catalog_number: int) -> Optional[Dict]:
         """Получить пост по уникальному номеру"""
+        post_id = await self._post_cache.get(('number', catalog_number))
+        if post_id is not None:
+            cached = await self._post_cache.get(('id', post_id))
+            if cached is not None and cached.get('catalog_number') == catalog_number:
+                return copy.deepcopy(cached)
+        
         try:
             async with db.get_session() as session:
-                result = await session.execute(
-                    select(CatalogPost).where(CatalogPost.catalog_number == catalog_number)
-                )
+                result = await session.execute(self._post_by_number_query(catalog_number))
                 post = result.scalar_one_or_none()
                 
                 if not post:
                     return None
                 
-                post_dict = self._post_to_dict(post)
-                
-                if post.category in ['👱🏻‍♀️ TopGirls', '🤵🏼‍♂️ TopBoys']:
-                    rating, vote_count = await self.get_rating_from_toppeople(post.catalog_link)
-                    post_dict['rating'] = rating
-                    post_dict['review_count'] = vote_count
-                else:
-                    reviews_result = await session.execute(
-                        select(
-                            func.avg(CatalogReview.rating).label('avg_rating'),
-                            func.count(CatalogReview.id).label('review_count')
-                        ).where(CatalogReview.catalog_post_id == post.id)
-                    )
-                    rating_data = reviews_result.first()
-                    
-                    post_dict['rating'] = round(rating_data.avg_rating, 1) if rating_data.avg_rating else 0
-                    post_dict['review_count'] = rating_data.review_count or 0
+                post_dict = (await self._posts_to_dicts_with_rating([post]))[0]
+                await self._cache_post_dict(post_dict)
                 
                 return post_dict
                 
@@ -517,15 +717,12 @@ class CatalogService:
     
     async def change_catalog_number(self, old_number: int, new_number: int) -> bool:
         """Изменить номер поста"""
+        if not await catalog_numbers.claim(new_number):
+            logger.warning(f"Catalog number {new_number} already taken")
+            return False
+        
         try:
             async with db.get_session() as session:
-                check_result = await session.execute(
-                    select(CatalogPost.id).where(CatalogPost.catalog_number == new_number)
-                )
-                if check_result.scalar_one_or_none():
-                    logger.warning(f"Catalog number {new_number} already taken")
-                    return False
-                
                 result = await session.execute(
                     select(CatalogPost).where(CatalogPost.catalog_number == old_number)
                 )
@@ -533,52 +730,157 @@ class CatalogService:
                 
                 if not post:
                     logger.warning(f"Post with number {old_number} not found")
+                    await catalog_numbers.release(new_number)
                     return False
                 
                 post.catalog_number = new_number
                 post.updated_at = datetime.utcnow()
                 await session.commit()
+                catalog_numbers.confirm(new_number)
+                await catalog_numbers.release(old_number)
+                await self.invalidate_post(post.id, old_number)
                 
                 logger.info(f"Changed catalog number from {old_number} to {new_number} (post ID: {post.id})")
                 return True
                 
         except Exception as e:
             logger.error(f"Error changing catalog number: {e}")
+            await catalog_numbers.release(new_number)
             return False
     
     # ============= ПРОСМОТРЫ И КЛИКИ =============
     
     async def increment_views(self, post_id: int, user_id: Optional[int] = None):
-        """Увеличить счётчик просмотров"""
+        """Увеличить счётчик просмотров (через буфер, сброс в БД пачкой)"""
+        catalog_counters.add_view(post_id)
+    
+    async def increment_clicks(self, post_id: int, user_id: Optional[int] = None):
+        """Увеличить счётчик кликов (через буфер, сброс в БД пачкой)"""
+        catalog_counters.add_click(post_id)
+    
+    def record_ad_impressions(self, user_id: int, post_ids: List[int]):
+        """Учесть показы рекламы, отправленные пользователю"""
+        catalog_composer.record_impressions(user_id, post_ids)
+    
+    # ============= ПРОСМОТРЕННЫЕ ПОСТЫ (упакованные id) =============
+    
+    def _get_viewed_ids(self, user_session: CatalogSession) -> List[int]:
+        """Просмотренные id сессии: упакованные, либо старый JSON-список до миграции"""
+        if user_session.viewed_packed is not None:
+            return sorted(set(unpack_ids(user_session.viewed_packed)))
+        
+        return list(user_session.viewed_posts or [])
+    
+    def _append_viewed_ids(self, user_session: CatalogSession, post_ids: List[int]):
+        """Дописать id страницы ленты отдельным сегментом (без распаковки строки)
+        
+        Лента строится без просмотренных постов и не повторяет id, поэтому
+        id страницы новые и viewed_count просто увеличивается; повтор
+        (пост отмечен через mark_posts_viewed после старта ленты) убирается
+        при перепаковке раз в VIEWED_COMPACT_SEGMENTS сегментов
+        """
+        packed = user_session.viewed_packed
+        if packed is None or segment_count(packed) >= VIEWED_COMPACT_SEGMENTS:
+            self._add_viewed_ids(user_session, post_ids)
+            return
+        
+        new_ids = set(post_ids)
+        user_session.viewed_packed = append_ids(packed, new_ids)
+        user_session.viewed_count = (user_session.viewed_count or 0) + len(new_ids)
+    
+    def _add_viewed_ids(self, user_session: CatalogSession, post_ids: List[int]):
+        """Добавить просмотренные id с полной перепаковкой (без повторов)"""
+        if user_session.viewed_packed is None:
+            viewed = set(user_session.viewed_posts or [])
+            user_session.viewed_posts = []
+        else:
+            viewed = set(unpack_ids(user_session.viewed_packed))
+        
+        viewed.update(post_ids)
+        user_session.viewed_packed = pack_ids(viewed)
+        user_session.viewed_count = len(viewed)
+    
+    async def get_viewed_posts(self, user_id: int) -> List[int]:
+        """Получить id просмотренных пользователем постов"""
         try:
             async with db.get_session() as session:
                 result = await session.execute(
-                    select(CatalogPost).where(CatalogPost.id == post_id)
+                    select(CatalogSession).where(CatalogSession.user_id == user_id)
                 )
-                post = result.scalar_one_or_none()
+                user_session = result.scalar_one_or_none()
+                
+                return self._get_viewed_ids(user_session) if user_session else []
                 
-                if post:
-                    post.views += 1
-                    await session.commit()
-                    
         except Exception as e:
-            logger.error(f"Error incrementing views: {e}")
+            logger.error(f"Error getting viewed posts: {e}")
+            return []
     
-    async def increment_clicks(self, post_id: int, user_id: Optional[int] = None):
-        """Увеличить счётчик кликов"""
+    async def get_viewed_count(self, user_id: int) -> int:
+        """Количество просмотренных пользователем постов (без распаковки)"""
         try:
             async with db.get_session() as session:
                 result = await session.execute(
-                    select(CatalogPost).where(CatalogPost.id == post_id)
+                    select(CatalogSession.viewed_count).where(CatalogSession.user_id == user_id)
                 )
-                post = result.scalar_one_or_none()
+                return result.scalar() or 0
                 
-                if post:
-                    post.clicks += 1
-                    await session.commit()
+        except Exception as e:
+            logger.error(f"Error getting viewed count: {e}")
+            return 0
+    
+    async def mark_posts_viewed(self, user_id: int, post_ids: List[int]) -> bool:
+        """Отметить посты просмотренными"""
+        try:
+            async with db.get_session() as session:
+                result = await session.execute(
+                    select(CatalogSession).where(CatalogSession.user_id == user_id)
+                )
+                user_session = result.scalar_one_or_none()
+                
+                if not user_session:
+                    user_session = CatalogSession(user_id=user_id, viewed_posts=[], session_active=True)
+                    session.add(user_session)
+                
+                self._add_viewed_ids(user_session, post_ids)
+                user_session.last_activity = datetime.utcnow()
+                await session.commit()
+                return True
+                
+        except Exception as e:
+            logger.error(f"Error marking posts viewed: {e}")
+            return False
+    
+    async def migrate_viewed_posts(self, batch_size: int = 500) -> int:
+        """Перенести viewed_posts из JSON-списка в упакованную колонку"""
+        migrated = 0
+        try:
+            while True:
+                async with db.get_session() as session:
+                    result = await session.execute(
+                        select(CatalogSession)
+                        .where(CatalogSession.viewed_packed.is_(None))
+                        .limit(batch_size)
+                    )
+                    sessions = result.scalars().all()
                     
+                    if not sessions:
+                        break
+                    
+                    for user_session in sessions:
+                        viewed = set(user_session.viewed_posts or [])
+                        user_session.viewed_packed = pack_ids(viewed)
+                        user_session.viewed_count = len(viewed)
+                        user_session.viewed_posts = []
+                    
+                    await session.commit()
+                    migrated += len(sessions)
+            
+            logger.info(f"Migrated viewed posts for {migrated} catalog sessions")
+            return migrated
+            
         except Exception as e:
-            logger.error(f"Error incrementing clicks: {e}")
+            logger.error(f"Error migrating viewed posts: {e}")
+            return migrated
     
     async def reset_session(self, user_id: int):
         """Сбросить сессию пользователя"""
@@ -591,9 +893,17 @@ class CatalogService:
                 
                 if user_session:
                     user_session.viewed_posts = []
+                    user_session.viewed_packed = None
+                    user_session.viewed_count = 0
+                    user_session.feed_seed = None
+                    user_session.feed_packed = None
+                    user_session.feed_cursor = 0
                     user_session.last_activity = datetime.utcnow()
                     await session.commit()
                     logger.info(f"Reset session for user {user_id}")
+                
+                catalog_prefetch.invalidate(user_id)
+                catalog_composer.reset(user_id)
                     
         except Exception as e:
             logger.error(f"Error resetting session: {e}")
@@ -704,17 +1014,30 @@ class CatalogService:
                     logger.warning(f"Post {post_id} not found for review")
                     return None
                 
+                rating = max(1, min(5, rating))
+                star_column = f'rating_star_{rating}'
+                
                 review = CatalogReview(
                     catalog_post_id=post_id,
                     user_id=user_id,
                     username=username,
                     review_text=review_text[:500],
-                    rating=max(1, min(5, rating))
+                    rating=rating
                 )
                 
                 session.add(review)
+                
+                # Сводка рейтинга обновляется в той же транзакции, что и отзыв
+                await session.execute(
+                    update(CatalogPost).where(CatalogPost.id == post_id).values(
+                        rating_sum=func.coalesce(CatalogPost.rating_sum, 0) + rating,
+                        rating_count=func.coalesce(CatalogPost.rating_count, 0) + 1,
+                        **{star_column: func.coalesce(getattr(CatalogPost, star_column), 0) + 1}
+                    )
+                )
                 await session.commit()
                 await session.refresh(review)
+                await self.invalidate_post(post_id)
                 
                 logger.info(f"Added review {review.id} for post {post_id} by user {user_id} (rating: {rating})")
                 
@@ -736,32 +1059,62 @@ class CatalogService:
             return None
     
     async def get_reviews(self, post_id: int, limit: int = 10) -> List[Dict]:
-        """Получить все отзывы для поста"""
+        """Получить последние отзывы для поста"""
+        page = await self.get_reviews_page(post_id, limit=limit)
+        return page['reviews'] if page else []
+    
+    async def get_reviews_page(self, post_id: int, limit: int = 5,
+                               before: Optional[Tuple[datetime, int]] = None) -> Optional[Dict]:
+        """
+        Страница отзывов поста (новые сначала) и гистограмма оценок одним запросом
+        
+        before - курсор (created_at, id) последнего показанного отзыва;
+        следующая страница берётся по индексу (catalog_post_id, created_at) без OFFSET.
+        Возвращает {'post', 'histogram', 'total', 'reviews', 'next_cursor'} или None.
+        """
         try:
             async with db.get_session() as session:
-                result = await session.execute(
-                    select(CatalogReview)
-                    .where(CatalogReview.catalog_post_id == post_id)
-                    .order_by(CatalogReview.created_at.desc())
-                    .limit(limit)
-                )
-                reviews = result.scalars().all()
-                
-                return [
-                    {
-                        'id': r.id,
-                        'user_id': r.user_id,
-                        'username': r.username,
-                        'review_text': r.review_text,
-                        'rating': r.rating,
-                        'created_at': r.created_at.isoformat() if r.created_at else None
-                    }
-                    for r in reviews
-                ]
+                result = await session.execute(self._reviews_page_query(post_id, limit, before))
+                rows = result.all()
+            
+            if not rows:
+                return None
+            
+            first = rows[0]
+            histogram = {star: first[3 + index] or 0 for index, star in enumerate(RATING_STARS)}
+            review_offset = 3 + len(RATING_STARS)
+            
+            reviews = [
+                {
+                    'id': row[review_offset],
+                    'user_id': row[review_offset + 1],
+                    'username': row[review_offset + 2],
+                    'review_text': row[review_offset + 3],
+                    'rating': row[review_offset + 4],
+                    'created_at': row[review_offset + 5]
+                }
+                for row in rows[:limit]
+                if row[review_offset] is not None
+            ]
+            
+            next_cursor = None
+            if len(rows) > limit and reviews:
+                next_cursor = (reviews[-1]['created_at'], reviews[-1]['id'])
+            
+            for review in reviews:
+                review['created_at'] = review['created_at'].isoformat() if review['created_at'] else None
+            
+            return {
+                'post': {'id': post_id, 'catalog_number': first[0], 'name': first[1]},
+                'histogram': histogram,
+                'total': first[2] or 0,
+                'reviews': reviews,
+                'next_cursor': next_cursor
+            }
                 
         except Exception as e:
-            logger.error(f"Error getting reviews: {e}")
-            return []
+            logger.error(f"Error getting reviews page: {e}")
+            return None
     
     # ============= ПОДПИСКИ =============
     
@@ -909,17 +1262,15 @@ class CatalogService:
                     return False
                 
                 if field == 'catalog_number':
-                    check_result = await session.execute(
-                        select(CatalogPost.id).where(CatalogPost.catalog_number == value)
-                    )
-                    if check_result.scalar_one_or_none():
-                        logger.warning(f"Catalog number {value} already taken")
-                        return False
+                    return await self.change_catalog_number(post.catalog_number, value)
                 
                 setattr(post, field, value)
                 post.updated_at = datetime.utcnow()
                 
                 await session.commit()
+                catalog_search.index_post(post)
+                catalog_prefetch.discard_post(post_id)
+                await self.invalidate_post(post_id)
                 logger.info(f"Updated post {post_id} field '{field}'")
                 return True
                 
@@ -954,6 +1305,8 @@ class CatalogService:
                 post.updated_at = datetime.utcnow()
                 
                 await session.commit()
+                catalog_prefetch.discard_post(post_id)
+                await self.invalidate_post(post_id)
                 logger.info(f"Updated media for post {post_id}: {media_type}")
                 return True
                 
@@ -977,6 +1330,9 @@ class CatalogService:
                 post.is_active = False
                 post.updated_at = datetime.utcnow()
                 await session.commit()
+                catalog_search.remove_post(post_id)
+                catalog_prefetch.discard_post(post_id)
+                await self.invalidate_post(post_id)
                 
                 logger.info(f"Deleted post {post_id} (catalog #{post.catalog_number}) by user {user_id}")
                 return True
@@ -1014,14 +1370,7 @@ class CatalogService:
         """Получить статистику по категориям"""
         try:
             async with db.get_session() as session:
-                result = await session.execute(
-                    select(
-                        CatalogPost.category,
-                        func.count(CatalogPost.id).label('count')
-                    ).where(CatalogPost.is_active == True)
-                    .group_by(CatalogPost.category)
-                    .order_by(func.count(CatalogPost.id).desc())
-                )
+                result = await session.execute(self._category_stats_query())
                 
                 stats = {}
                 for category, count in result.all():
@@ -1038,11 +1387,7 @@ class CatalogService:
         """Количество уникальных пользователей с просмотрами"""
         try:
             async with db.get_session() as session:
-                result = await session.execute(
-                    select(func.count(func.distinct(CatalogSession.user_id))).where(
-                        func.json_array_length(CatalogSession.viewed_posts) > 0
-                    )
-                )
+                result = await session.execute(self._unique_viewers_query())
                 return result.scalar() or 0
         except Exception as e:
             logger.error(f"Error getting unique viewers: {e}")
@@ -1085,174 +1430,206 @@ class CatalogService:
             logger.error(f"Error getting top posts: {e}")
             return []
     
-    async def get_catalog_stats(self) -> Dict:
-        """Получить полную статистику каталога"""
-        try:
-            async with db.get_session() as session:
-                total_result = await session.execute(
-                    select(func.count(CatalogPost.id)).where(CatalogPost.is_active == True)
-                )
-                total_posts = total_result.scalar()
-                
-                media_result = await session.execute(
-                    select(func.count(CatalogPost.id)).where(
-                        and_(
-                            CatalogPost.is_active == True,
-                            CatalogPost.media_type.isnot(None)
-                        )
-                    )
-                )
-                posts_with_media = media_result.scalar()
-                
-                views_result = await session.execute(
-                    select(func.sum(CatalogPost.views)).where(CatalogPost.is_active == True)
-                )
-                total_views = views_result.scalar() or 0
-                
-                clicks_result = await session.execute(
-                    select(func.sum(CatalogPost.clicks)).where(CatalogPost.is_active == True)
-                )
-                total_clicks = clicks_result.scalar() or 0
-                
-                sessions_result = await session.execute(
-                    select(func.count(CatalogSession.id)).where(CatalogSession.session_active == True)
-                )
-                active_sessions = sessions_result.scalar()
-                
-                reviews_result = await session.execute(
-                    select(func.count(CatalogReview.id))
+    async def collect_stats(self) -> Dict:
+        """Вся статистика каталога: один агрегатный запрос на таблицу
+        
+        Returns:
+            dict: {'catalog': ..., 'priority': ..., 'ads': ...} в формате
+            get_catalog_stats / get_priority_stats / get_ad_stats
+        """
+        active = CatalogPost.is_active == True
+        
+        def active_count(*conditions):
+            return func.coalesce(func.sum(case((and_(active, *conditions), 1), else_=0)), 0)
+        
+        def active_sum(column, *conditions):
+            return func.coalesce(
+                func.sum(case((and_(active, *conditions), func.coalesce(column, 0)), else_=0)), 0
+            )
+        
+        async with db.get_session() as session:
+            totals = (await session.execute(
+                select(
+                    active_count().label('total_posts'),
+                    active_count(CatalogPost.media_type.isnot(None)).label('posts_with_media'),
+                    active_sum(CatalogPost.views).label('total_views'),
+                    active_sum(CatalogPost.clicks).label('total_clicks'),
+                    active_sum(CatalogPost.views, CatalogPost.is_priority == True).label('priority_views'),
+                    active_sum(CatalogPost.clicks, CatalogPost.is_priority == True).label('priority_clicks'),
+                    active_sum(CatalogPost.views, CatalogPost.is_priority == False).label('normal_views'),
+                    active_sum(CatalogPost.clicks, CatalogPost.is_priority == False).label('normal_clicks'),
+                    active_sum(CatalogPost.views, CatalogPost.is_ad == True).label('ad_views'),
+                    active_sum(CatalogPost.clicks, CatalogPost.is_ad == True).label('ad_clicks')
                 )
-                total_reviews = reviews_result.scalar() or 0
-                
-                return {
-                    'total_posts': total_posts,
-                    'posts_with_media': posts_with_media,
-                    'posts_without_media': total_posts - posts_with_media,
-                    'media_percentage': round((posts_with_media / total_posts * 100), 1) if total_posts > 0 else 0,
-                    'total_views': total_views,
-                    'total_clicks': total_clicks,
-                    'ctr': round((total_clicks / total_views * 100), 2) if total_views > 0 else 0,
-                    'active_sessions': active_sessions,
-                    'total_reviews': total_reviews
-                }
+            )).one()
+            
+            active_sessions = (await session.execute(
+                select(func.count(CatalogSession.id)).where(CatalogSession.session_active == True)
+            )).scalar() or 0
+            
+            total_reviews = (await session.execute(
+                select(func.count(CatalogReview.id))
+            )).scalar() or 0
+            
+            featured = (await session.execute(
+                select(
+                    CatalogPost.id,
+                    CatalogPost.catalog_number,
+                    CatalogPost.name,
+                    CatalogPost.views,
+                    CatalogPost.clicks,
+                    CatalogPost.is_priority,
+                    CatalogPost.is_ad
+                ).where(
+                    and_(active, or_(CatalogPost.is_priority == True, CatalogPost.is_ad == True))
+                ).order_by(CatalogPost.views.desc())
+            )).all()
+        
+        def ctr(clicks, views):
+            return (clicks / views * 100) if views > 0 else 0
+        
+        def post_row(row):
+            return {
+                'id': row.id,
+                'catalog_number': row.catalog_number,
+                'name': row.name,
+                'views': row.views or 0,
+                'clicks': row.clicks or 0
+            }
+        
+        impressions = catalog_composer.get_impressions()
+        total_posts = totals.total_posts
+        posts_with_media = totals.posts_with_media
+        priority_ctr = ctr(totals.priority_clicks, totals.priority_views)
+        normal_ctr = ctr(totals.normal_clicks, totals.normal_views)
+        
+        return {
+            'catalog': {
+                'total_posts': total_posts,
+                'posts_with_media': posts_with_media,
+                'posts_without_media': total_posts - posts_with_media,
+                'media_percentage': round((posts_with_media / total_posts * 100), 1) if total_posts > 0 else 0,
+                'total_views': totals.total_views,
+                'total_clicks': totals.total_clicks,
+                'ctr': round(ctr(totals.total_clicks, totals.total_views), 2),
+                'active_sessions': active_sessions,
+                'total_reviews': total_reviews
+            },
+            'priority': {
+                'posts': [post_row(row) for row in featured if row.is_priority],
+                'avg_ctr': priority_ctr,
+                'normal_ctr': normal_ctr,
+                'improvement': ((priority_ctr - normal_ctr) / normal_ctr * 100) if normal_ctr > 0 else 0
+            },
+            'ads': {
+                'ads': [
+                    {**post_row(row), 'impressions': impressions.get(row.id, 0)}
+                    for row in featured if row.is_ad
+                ],
+                'total_views': totals.ad_views,
+                'total_clicks': totals.ad_clicks,
+                'avg_ctr': ctr(totals.ad_clicks, totals.ad_views)
+            }
+        }
+    
+    async def get_catalog_stats(self, force: bool = False) -> Dict:
+        """Получить полную статистику каталога (из снимка catalog_stats)"""
+        from services.catalog_stats import catalog_stats
+        
+        try:
+            snapshot = await catalog_stats.get(force)
+            if snapshot:
+                return snapshot['catalog']
                 
         except Exception as e:
             logger.error(f"Error getting catalog stats: {e}")
-            return {
-                'total_posts': 0,
-                'posts_with_media': 0,
-                'posts_without_media': 0,
-                'media_percentage': 0,
-                'total_views': 0,
-                'total_clicks': 0,
-                'ctr': 0,
-                'active_sessions': 0,
-                'total_reviews': 0
-            }
+        
+        return {
+            'total_posts': 0,
+            'posts_with_media': 0,
+            'posts_without_media': 0,
+            'media_percentage': 0,
+            'total_views': 0,
+            'total_clicks': 0,
+            'ctr': 0,
+            'active_sessions': 0,
+            'total_reviews': 0
+        }
     
     # ============= ПРИОРИТЕТЫ =============
     
-    async def get_priority_stats(self) -> Dict:
-        """Статистика по приоритетным постам"""
+    async def get_priority_stats(self, force: bool = False) -> Dict:
+        """Статистика по приоритетным постам (из снимка catalog_stats)"""
+        from services.catalog_stats import catalog_stats
+        
         try:
-            async with db.get_session() as session:
-                result = await session.execute(
-                    select(CatalogPost).where(
-                        and_(
-                            CatalogPost.is_priority == True,
-                            CatalogPost.is_active == True
-                        )
-                    ).order_by(CatalogPost.views.desc())
-                )
-                priority_posts = result.scalars().all()
-                
-                priority_views = sum(p.views for p in priority_posts)
-                priority_clicks = sum(p.clicks for p in priority_posts)
-                priority_ctr = (priority_clicks / priority_views * 100) if priority_views > 0 else 0
-                
-                result = await session.execute(
-                    select(CatalogPost).where(
-                        and_(
-                            CatalogPost.is_priority == False,
-                            CatalogPost.is_active == True
-                        )
-                    )
-                )
-                normal_posts = result.scalars().all()
-                normal_views = sum(p.views for p in normal_posts)
-                normal_clicks = sum(p.clicks for p in normal_posts)
-                normal_ctr = (normal_clicks / normal_views * 100) if normal_views > 0 else 0
-                
-                improvement = ((priority_ctr - normal_ctr) / normal_ctr * 100) if normal_ctr > 0 else 0
-                
-                return {
-                    'posts': [
-                        {
-                            'id': p.id,
-                            'catalog_number': p.catalog_number,
-                            'name': p.name,
-                            'views': p.views,
-                            'clicks': p.clicks
-                        }
-                        for p in priority_posts
-                    ],
-                    'avg_ctr': priority_ctr,
-                    'normal_ctr': normal_ctr,
-                    'improvement': improvement
-                }
+            snapshot = await catalog_stats.get(force)
+            if snapshot:
+                return snapshot['priority']
                 
         except Exception as e:
             logger.error(f"Error getting priority stats: {e}")
-            return {'posts': [], 'avg_ctr': 0, 'normal_ctr': 0, 'improvement': 0}
+        
+        return {'posts': [], 'avg_ctr': 0, 'normal_ctr': 0, 'improvement': 0}
     
-    async def set_priority_by_numbers(self, catalog_numbers: List[int]) -> int:
-        """Установить приоритетные посты по номерам"""
+    async def set_priority_by_numbers(self, catalog_numbers: List[int]) -> Dict[str, List[int]]:
+        """
+        Заменить набор приоритетных постов одним UPDATE ... RETURNING
+        
+        Возвращает {'updated': номера, ставшие приоритетными, 'missing': не найденные,
+        'ignored': сверх лимита max_priority_posts}
+        """
+        numbers = list(dict.fromkeys(catalog_numbers))
+        requested, ignored = numbers[:self.max_priority_posts], numbers[self.max_priority_posts:]
+        
         try:
-            count = 0
+            # Старые приоритеты сбрасываются и новые ставятся в одном выражении
+            is_requested = CatalogPost.catalog_number.in_(requested)
             async with db.get_session() as session:
-                # Сбрасываем все приоритеты
-                posts_to_reset = (await session.execute(
-                    select(CatalogPost).where(CatalogPost.is_priority == True)
-                )).scalars().all()
-                
-                for post in posts_to_reset:
-                    post.is_priority = False
-                
-                # Устанавливаем новые приоритеты
-                for number in catalog_numbers[:self.max_priority_posts]:
-                    result = await session.execute(
-                        select(CatalogPost).where(CatalogPost.catalog_number == number)
-                    )
-                    post = result.scalar_one_or_none()
-                    
-                    if post:
-                        post.is_priority = True
-                        count += 1
-                
+                result = await session.execute(
+                    update(CatalogPost)
+                    .where(or_(CatalogPost.is_priority == True, is_requested))
+                    .values(is_priority=case((is_requested, True), else_=False))
+                    .returning(CatalogPost.id, CatalogPost.catalog_number, CatalogPost.is_priority)
+                    .execution_options(synchronize_session=False)
+                )
+                rows = result.all()
                 await session.commit()
-                logger.info(f"Set {count} priority posts by numbers")
-                return count
+            
+            for row in rows:
+                await self.invalidate_post(row.id)
+            
+            updated = {row.catalog_number for row in rows if row.is_priority}
+            outcome = {
+                'updated': [number for number in requested if number in updated],
+                'missing': [number for number in requested if number not in updated],
+                'ignored': ignored
+            }
+            logger.info(f"Set {len(outcome['updated'])} priority posts by numbers, missing: {outcome['missing']}")
+            return outcome
                 
         except Exception as e:
             logger.error(f"Error setting priority posts: {e}")
-            return 0
+            return {'updated': [], 'missing': requested, 'ignored': ignored}
     
     async def clear_all_priorities(self) -> int:
         """Очистить все приоритеты"""
         try:
             async with db.get_session() as session:
                 result = await session.execute(
-                    select(CatalogPost).where(CatalogPost.is_priority == True)
+                    update(CatalogPost)
+                    .where(CatalogPost.is_priority == True)
+                    .values(is_priority=False)
+                    .returning(CatalogPost.id)
+                    .execution_options(synchronize_session=False)
                 )
-                posts = result.scalars().all()
-                count = len(posts)
-                
-                for post in posts:
-                    post.is_priority = False
-                
+                post_ids = result.scalars().all()
                 await session.commit()
-                logger.info(f"Cleared {count} priority posts")
-                return count
+            
+            for post_id in post_ids:
+                await self.invalidate_post(post_id)
+            logger.info(f"Cleared {len(post_ids)} priority posts")
+            return len(post_ids)
                 
         except Exception as e:
             logger.error(f"Error clearing priorities: {e}")
@@ -1260,65 +1637,96 @@ class CatalogService:
     
     # ============= РЕКЛАМА =============
     
-    async def get_ad_stats(self) -> Dict:
-        """Статистика по рекламным постам"""
+    async def get_ad_stats(self, force: bool = False) -> Dict:
+        """Статистика по рекламным постам (из снимка catalog_stats)"""
+        from services.catalog_stats import catalog_stats
+        
         try:
-            async with db.get_session() as session:
-                result = await session.execute(
-                    select(CatalogPost).where(
-                        and_(
-                            CatalogPost.is_ad == True,
-                            CatalogPost.is_active == True
-                        )
-                    )
-                )
-                ads = result.scalars().all()
-                
-                total_views = sum(ad.views for ad in ads)
-                total_clicks = sum(ad.clicks for ad in ads)
-                avg_ctr = (total_clicks / total_views * 100) if total_views > 0 else 0
-                
-                return {
-                    'ads': [
-                        {
-                            'id': ad.id,
-                            'catalog_number': ad.catalog_number,
-                            'name': ad.name,
-                            'views': ad.views,
-                            'clicks': ad.clicks
-                        }
-                        for ad in ads
-                    ],
-                    'total_views': total_views,
-                    'total_clicks': total_clicks,
-                    'avg_ctr': avg_ctr
-                }
+            snapshot = await catalog_stats.get(force)
+            if snapshot:
+                return snapshot['ads']
                 
         except Exception as e:
             logger.error(f"Error getting ad stats: {e}")
-            return {'ads': [], 'total_views': 0, 'total_clicks': 0, 'avg_ctr': 0}
+        
+        return {'ads': [], 'total_views': 0, 'total_clicks': 0, 'avg_ctr': 0}
+    
+    async def _update_by_numbers(self, catalog_numbers: List[int], values: Dict, *conditions) -> Dict[str, List[int]]:
+        """UPDATE ... WHERE catalog_number IN (...) RETURNING: {'updated': номера, 'missing': номера}"""
+        numbers = list(dict.fromkeys(catalog_numbers))
+        if not numbers:
+            return {'updated': [], 'missing': []}
+        
+        async with db.get_session() as session:
+            result = await session.execute(
+                update(CatalogPost)
+                .where(CatalogPost.catalog_number.in_(numbers), *conditions)
+                .values(**values)
+                .returning(CatalogPost.id, CatalogPost.catalog_number)
+                .execution_options(synchronize_session=False)
+            )
+            rows = result.all()
+            await session.commit()
+        
+        for row in rows:
+            await self.invalidate_post(row.id)
+        
+        updated = {row.catalog_number for row in rows}
+        return {
+            'updated': [number for number in numbers if number in updated],
+            'missing': [number for number in numbers if number not in updated]
+        }
+    
+    async def set_ads_by_numbers(self, catalog_numbers: List[int]) -> Dict[str, List[int]]:
+        """Сделать посты рекламными по номерам одним запросом"""
+        try:
+            outcome = await self._update_by_numbers(
+                catalog_numbers,
+                {'is_ad': True, 'ad_frequency': self.ad_frequency, 'updated_at': datetime.utcnow()}
+            )
+            logger.info(f"Set {len(outcome['updated'])} posts as ads, missing: {outcome['missing']}")
+            return outcome
+                
+        except Exception as e:
+            logger.error(f"Error setting ads by numbers: {e}")
+            return {'updated': [], 'missing': list(dict.fromkeys(catalog_numbers))}
+    
+    async def remove_ads_by_numbers(self, catalog_numbers: List[int]) -> Dict[str, List[int]]:
+        """Снять рекламу с постов по номерам (missing - не найдены или не реклама)"""
+        try:
+            outcome = await self._update_by_numbers(
+                catalog_numbers,
+                {'is_ad': False, 'ad_frequency': None, 'updated_at': datetime.utcnow()},
+                CatalogPost.is_ad == True
+            )
+            logger.info(f"Removed ads from {len(outcome['updated'])} posts, missing: {outcome['missing']}")
+            return outcome
+                
+        except Exception as e:
+            logger.error(f"Error removing ads by numbers: {e}")
+            return {'updated': [], 'missing': list(dict.fromkeys(catalog_numbers))}
     
     async def set_post_as_ad(self, post_id: int) -> bool:
         """Сделать пост рекламным"""
         try:
             async with db.get_session() as session:
                 result = await session.execute(
-                    select(CatalogPost).where(CatalogPost.id == post_id)
+                    update(CatalogPost)
+                    .where(CatalogPost.id == post_id)
+                    .values(is_ad=True, ad_frequency=self.ad_frequency, updated_at=datetime.utcnow())
+                    .returning(CatalogPost.catalog_number)
+                    .execution_options(synchronize_session=False)
                 )
-                post = result.scalar_one_or_none()
-                
-                if not post:
-                    logger.warning(f"Post {post_id} not found")
-                    return False
-                
-                post.is_ad = True
-                post.ad_frequency = self.ad_frequency
-                post.updated_at = datetime.utcnow()
-                
+                row = result.first()
                 await session.commit()
-                
-                logger.info(f"Set post {post_id} (#{post.catalog_number}) as ad")
-                return True
+            
+            if not row:
+                logger.warning(f"Post {post_id} not found")
+                return False
+            
+            await self.invalidate_post(post_id)
+            logger.info(f"Set post {post_id} (#{row.catalog_number}) as ad")
+            return True
                 
         except Exception as e:
             logger.error(f"Error setting post as ad: {e}")
@@ -1326,54 +1734,29 @@ class CatalogService:
     
     async def remove_ad_by_number(self, catalog_number: int) -> bool:
         """Удалить рекламу с поста по номеру"""
-        try:
-            async with db.get_session() as session:
-                result = await session.execute(
-                    select(CatalogPost).where(CatalogPost.catalog_number == catalog_number)
-                )
-                post = result.scalar_one_or_none()
-                
-                if not post or not post.is_ad:
-                    logger.warning(f"Post #{catalog_number} not found or is not an ad")
-                    return False
-                
-                post.is_ad = False
-                post.ad_frequency = None
-                post.updated_at = datetime.utcnow()
-                
-                await session.commit()
-                
-                logger.info(f"Removed ad from post {post.id} (#{catalog_number})")
-                return True
-                
-        except Exception as e:
-            logger.error(f"Error removing ad: {e}")
-            return False
+        outcome = await self.remove_ads_by_numbers([catalog_number])
+        return bool(outcome['updated'])
     
     async def add_ad_post(self, catalog_link: str, description: str) -> Optional[int]:
         """Добавить рекламный пост"""
         try:
-            async with db.get_session() as session:
-                catalog_number = await self._generate_unique_catalog_number(session)
-                
-                post = CatalogPost(
+            post = await self._insert_post(
+                CatalogPost(
                     user_id=0,
                     catalog_link=catalog_link,
                     category='Реклама',
                     name=description,
                     tags=[],
-                    catalog_number=catalog_number,
                     is_active=True,
                     is_ad=True,
                     ad_frequency=self.ad_frequency
                 )
-                
-                session.add(post)
-                await session.commit()
-                await session.refresh(post)
-                
-                logger.info(f"Added ad post #{catalog_number} (ID: {post.id})")
-                return post.id
+            )
+            catalog_search.index_post(post)
+            await self._post_cache.delete(('featured',))
+            
+            logger.info(f"Added ad post #{post.catalog_number} (ID: {post.id})")
+            return post.id
                 
         except Exception as e:
             logger.error(f"Error adding ad post: {e}")
@@ -1400,18 +1783,16 @@ class CatalogService:
             'author_id': post.author_id,
             'created_at': post.created_at.isoformat() if post.created_at else None,
             'is_priority': post.is_priority,
-            'is_ad': post.is_ad
+            'is_ad': post.is_ad,
+            'ad_frequency': post.ad_frequency,
+            'rating_histogram': {star: getattr(post, f'rating_star_{star}') or 0 for star in RATING_STARS}
         }
     
     async def get_user_posts(self, user_id: int) -> List[Dict]:
         """Получить все посты пользователя"""
         try:
             async with db.get_session() as session:
-                result = await session.execute(
-                    select(CatalogPost)
-                    .where(CatalogPost.user_id == user_id)
-                    .order_by(CatalogPost.created_at.desc())
-                )
+                result = await session.execute(self._user_posts_query(user_id))
                 posts = result.scalars().all()
                 
                 return [
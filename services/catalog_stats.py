@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Снимок статистики каталога
+
+Статистика собирается CatalogService.collect_stats (один агрегат на
+таблицу) и периодически обновляется в фоне, поэтому админ-панель и
+плановый отчёт читают её мгновенно. Снимок хранит время сбора;
+админ может обновить его принудительно.
+
+CatalogService.get_catalog_stats / get_priority_stats / get_ad_stats
+читают разделы этого же снимка: несколько вызовов подряд не собирают
+статистику заново, пока снимок не старше refresh_interval.
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Optional
+from services.catalog_counters import catalog_counters
+from services.catalog_service import catalog_service
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogStatsSnapshot:
+    """Периодически обновляемый снимок статистики каталога"""
+
+    def __init__(self, refresh_interval: int = 300):
+        self.refresh_interval = refresh_interval
+
+        self._snapshot: Optional[Dict] = None
+        self.collected_at: Optional[datetime] = None
+        self._refresh_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._running = False
+
+    # ============= ОБНОВЛЕНИЕ =============
+
+    async def refresh(self) -> Optional[Dict]:
+        """Пересобрать снимок (буфер просмотров/кликов сбрасывается перед сбором)"""
+        async with self._refresh_lock:
+            return await self._collect()
+
+    async def _collect(self) -> Optional[Dict]:
+        try:
+            await catalog_counters.flush()
+            self._snapshot = await catalog_service.collect_stats()
+            self.collected_at = datetime.utcnow()
+            logger.debug("Catalog stats snapshot refreshed")
+
+        except Exception as e:
+            logger.error(f"Error refreshing catalog stats snapshot: {e}")
+
+        return self._snapshot
+
+    async def get(self, force: bool = False) -> Optional[Dict]:
+        """Текущий снимок; собирается, если его нет, он устарел или force"""
+        if not force and self.is_fresh:
+            return self._snapshot
+
+        requested_at = datetime.utcnow()
+        async with self._refresh_lock:
+            # Пока ждали блокировку, снимок мог собрать параллельный вызов
+            if self.collected_at and self.collected_at >= requested_at:
+                return self._snapshot
+            return await self._collect()
+
+    @property
+    def is_fresh(self) -> bool:
+        """Снимок есть и моложе refresh_interval"""
+        age = self.age_seconds
+        return self._snapshot is not None and age is not None and age < self.refresh_interval
+
+    @property
+    def age_seconds(self) -> Optional[int]:
+        """Возраст снимка в секундах"""
+        if not self.collected_at:
+            return None
+        return int((datetime.utcnow() - self.collected_at).total_seconds())
+
+    # ============= ФОНОВАЯ ЗАДАЧА =============
+
+    async def start(self):
+        """Запустить периодическое обновление"""
+        if self._running:
+            logger.warning("Catalog stats refresh task already running")
+            return
+
+        self._running = True
+        self._refresh_task = asyncio.create_task(self._refresh_loop())
+        logger.info(f"Catalog stats refresh task started (every {self.refresh_interval}s)")
+
+    async def stop(self):
+        """Остановить периодическое обновление"""
+        self._running = False
+
+        if self._refresh_task and not self._refresh_task.done():
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+
+        logger.info("Catalog stats refresh task stopped")
+
+    async def _refresh_loop(self):
+        while self._running:
+            try:
+                await self.refresh()
+                await asyncio.sleep(self.refresh_interval)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Error in catalog stats refresh loop: {e}")
+
+    # ============= ФОРМАТИРОВАНИЕ =============
+
+    def format_summary(self) -> str:
+        """Краткая сводка для отчётов (без разметки)"""
+        if not self._snapshot:
+            return "Статистика каталога ещё не собрана"
+
+        catalog = self._snapshot['catalog']
+        priority = self._snapshot['priority']
+        ads = self._snapshot['ads']
+
+        return (
+            f"• Активных постов: {catalog['total_posts']} (с медиа {catalog['media_percentage']}%)\n"
+            f"• Просмотров: {catalog['total_views']}, переходов: {catalog['total_clicks']} (CTR {catalog['ctr']}%)\n"
+            f"• Отзывов: {catalog['total_reviews']}, активных сессий: {catalog['active_sessions']}\n"
+            f"• Приоритетных: {len(priority['posts'])} (CTR {priority['avg_ctr']:.1f}% против {priority['normal_ctr']:.1f}%)\n"
+            f"• Рекламных: {len(ads['ads'])} (CTR {ads['avg_ctr']:.1f}%)\n"
+            f"• Обновлено: {self.age_seconds}с назад"
+        )
+
+
+# ============= ГЛОБАЛЬНЫЙ ЭКЗЕМПЛЯР =============
+
+catalog_stats = CatalogStatsSnapshot()
+
+__all__ = ['catalog_stats', 'CatalogStatsSnapshot']
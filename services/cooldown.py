@@ -1,16 +1,26 @@
 from datetime import datetime, timedelta
-from services.db import db
-from models import User
-from sqlalchemy import select, text
+from services.db import db, dialect_insert
+from services.cooldown_usage import UsageLog
+from services.cooldown_backends import CooldownBackend, create_backend
+from models import Cooldown
+from sqlalchemy import select, delete
 from config import Config
 import logging
 from functools import wraps
-from typing import Optional, Dict, Any, Callable, Tuple
+from typing import Optional, Dict, Any, Callable, Tuple, Set
 from enum import Enum
 import asyncio
+import heapq
+import itertools
 
 logger = logging.getLogger(__name__)
 
+# Команда, под которой хранится глобальный кулдаун (в кэше и в хранилище)
+GLOBAL_COMMAND = '__global__'
+
+# Строк в одном INSERT ... ON CONFLICT (5 параметров на строку, лимит SQLite - 999)
+UPSERT_CHUNK = 150
+
 class CooldownType(str, Enum):
     """Типы кулдаунов"""
     NORMAL = 'normal'           # Обычный кулдаун
@@ -21,12 +31,31 @@ class CooldownType(str, Enum):
 class CooldownService:
     """Service for managing post cooldowns с расширенным функционалом"""
     
-    def __init__(self):
+    def __init__(self, flush_interval: int = 5, max_pending: int = 200, backend: Optional[CooldownBackend] = None):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        
         self._cache: Dict[int, Dict[str, Dict[str, Any]]] = {}
-        self._usage_log: list = []
-        self._global_cooldowns: Dict[int, datetime] = {}
+        
+        # memory - хранилище и есть _cache; общие (database/redis) - источник правды,
+        # а _cache только локальное отражение для списков и legacy-методов
+        self.backend = backend or create_backend(Config.COOLDOWN_BACKEND, self._cache)
+        self._usage_log = UsageLog(capacity=10000)
         self._cleanup_task: Optional[asyncio.Task] = None
         self._cleanup_running = False
+        
+        # Мин-куча сроков: (expires_at, seq, user_id, command).
+        # Перезаписанные и сброшенные кулдауны не удаляются из кучи, а
+        # пропускаются при извлечении (сверка expires_at с кэшем)
+        self._expiry_heap: list = []
+        self._expiry_seq = itertools.count()
+        
+        # Несохранённые кулдауны: (user_id, command) -> строка для upsert
+        self._pending: Dict[Tuple[int, str], Dict[str, Any]] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        # Внеочередные сбросы: держим ссылки, чтобы задачи не собрал GC
+        self._overflow_tasks: Set[asyncio.Task] = set()
     
     # ============= ДЕКОРАТОРЫ =============
     
@@ -46,7 +75,9 @@ class CooldownService:
                 if bypass_for_mods and Config.is_moderator(user_id):
                     return await func(update, context, *args, **kwargs)
 
-                can_use, remaining = await self.check_cooldown(
+                # Проверка и установка одним шагом: параллельный вызов
+                # (в том числе с другого воркера) не пройдёт
+                can_use, remaining = await self.try_acquire(
                     user_id,
                     cmd_name,
                     seconds or Config.COOLDOWN_SECONDS,
@@ -59,16 +90,13 @@ class CooldownService:
 
                 self._log_usage(user_id, cmd_name)
 
-                result = await func(update, context, *args, **kwargs)
-
-                await self.set_cooldown(
-                    user_id,
-                    cmd_name,
-                    seconds or Config.COOLDOWN_SECONDS,
-                    cooldown_type
-                )
-
-                return result
+                try:
+                    return await func(update, context, *args, **kwargs)
+                except Exception:
+                    # Команда упала - кулдаун не засчитываем (как и раньше,
+                    # когда он ставился только после успешного выполнения)
+                    await self.reset_cooldown(user_id, cmd_name)
+                    raise
 
             return wrapper
         return decorator
@@ -112,20 +140,13 @@ class CooldownService:
                 remaining = await self._get_global_remaining(user_id)
                 return False, remaining
             
-            # Проверяем кэш
-            if user_id in self._cache and command in self._cache[user_id]:
-                cooldown_data = self._cache[user_id][command]
-                
-                # Проверяем тип кулдауна
-                if self._is_cooldown_expired(cooldown_data, cooldown_type):
-                    return True, 0
-                
-                remaining = self._calculate_remaining(cooldown_data)
-                if remaining > 0:
-                    return False, remaining
+            # Проверяем хранилище (для memory - кэш)
+            remaining = await self.backend.get_remaining(user_id, command)
+            if remaining:
+                return False, remaining
             
-            # Проверяем БД если доступна
-            if db.session_maker:
+            # Нет в памяти - кулдаун мог пережить перезапуск, проверяем БД
+            if remaining is None and not self.backend.shared and db.session_maker:
                 db_remaining = await self._check_db_cooldown(user_id, command)
                 if db_remaining > 0:
                     return False, db_remaining
@@ -150,40 +171,82 @@ class CooldownService:
             
             expires_at = self._calculate_expiry(duration, cooldown_type)
             
-            # Обновляем кэш
-            if user_id not in self._cache:
-                self._cache[user_id] = {}
-            
-            self._cache[user_id][command] = {
-                'type': cooldown_type,
-                'expires_at': expires_at,
-                'set_at': datetime.utcnow(),
-                'count': self._cache[user_id].get(command, {}).get('count', 0) + 1
-            }
+            await self.backend.set(user_id, command, expires_at, CooldownType(cooldown_type).value)
+            self._after_set(user_id, command, expires_at, cooldown_type)
             
             logger.info(f"Cooldown set for user {user_id}, command {command}, type {cooldown_type}")
             
-            # Сохраняем в БД
-            await self._save_to_db(user_id, command, expires_at, cooldown_type)
-            
         except Exception as e:
             logger.error(f"Error setting cooldown: {e}")
     
+    async def try_acquire(
+        self,
+        user_id: int,
+        command: str,
+        duration: int,
+        cooldown_type: CooldownType = CooldownType.NORMAL
+    ) -> Tuple[bool, int]:
+        """Атомарно проверить и установить кулдаун: (можно ли, сколько ждать)"""
+        try:
+            if Config.is_moderator(user_id):
+                return True, 0
+            
+            if await self._check_global_cooldown(user_id):
+                return False, await self._get_global_remaining(user_id)
+            
+            # memory: подтягиваем кулдаун из БД до проверки, чтобы сама
+            # проверка с установкой прошла без await между ними
+            if not self.backend.shared and db.session_maker and command not in self._cache.get(user_id, {}):
+                await self._check_db_cooldown(user_id, command)
+            
+            expires_at = self._calculate_expiry(duration, cooldown_type)
+            remaining = await self.backend.acquire(user_id, command, expires_at, CooldownType(cooldown_type).value)
+            if remaining:
+                return False, remaining
+            
+            self._after_set(user_id, command, expires_at, cooldown_type)
+            return True, 0
+            
+        except Exception as e:
+            logger.error(f"Error acquiring cooldown: {e}")
+            return True, 0
+    
+    def _after_set(self, user_id: int, command: str, expires_at: datetime, cooldown_type: CooldownType):
+        """Отражение в локальном кэше, срок в куче, отложенная запись в БД (memory)"""
+        if self.backend.shared:
+            commands = self._cache.setdefault(user_id, {})
+            commands[command] = {
+                'type': cooldown_type,
+                'expires_at': expires_at,
+                'set_at': datetime.utcnow(),
+                'count': commands.get(command, {}).get('count', 0) + 1
+            }
+        
+        self._schedule_expiry(expires_at, user_id, command)
+        
+        if not self.backend.shared:
+            # В БД - пачкой при следующем сбросе
+            self._save_to_db(user_id, command, expires_at, cooldown_type)
+    
     async def reset_cooldown(self, user_id: int, command: Optional[str] = None) -> bool:
         """Сбросить кулдаун (команда /cdreset)"""
         try:
-            # Сброс из кэша
+            # Сброс из кэша и из очереди записи
             if command:
+                self._pending.pop((user_id, command), None)
                 if user_id in self._cache and command in self._cache[user_id]:
                     del self._cache[user_id][command]
                     logger.info(f"Reset cooldown cache for user {user_id}, command {command}")
             else:
+                for key in [key for key in self._pending if key[0] == user_id]:
+                    del self._pending[key]
                 if user_id in self._cache:
                     self._cache.pop(user_id)
                     logger.info(f"Reset all cooldowns cache for user {user_id}")
             
-            # Сброс в БД
-            if db.session_maker:
+            # Сброс в хранилище и в БД
+            await self.backend.reset(user_id, command)
+            if not self.backend.shared and db.session_maker:
                 await self._reset_db_cooldown(user_id, command)
             
             return True
@@ -242,71 +305,103 @@ class CooldownService:
         if Config.is_moderator(user_id):
             return
         
-        self._global_cooldowns[user_id] = datetime.utcnow() + timedelta(seconds=duration)
+        # Хранится как кулдаун команды GLOBAL_COMMAND - в database/redis виден всем воркерам
+        expires_at = datetime.utcnow() + timedelta(seconds=duration)
+        await self.backend.set(user_id, GLOBAL_COMMAND, expires_at, CooldownType.GLOBAL.value)
+        self._after_set(user_id, GLOBAL_COMMAND, expires_at, CooldownType.GLOBAL)
         logger.info(f"Global cooldown set for user {user_id}, duration {duration}s")
     
     async def _check_global_cooldown(self, user_id: int) -> bool:
         """Проверить глобальный кулдаун"""
-        if user_id not in self._global_cooldowns:
-            return False
-        
-        if datetime.utcnow() >= self._global_cooldowns[user_id]:
-            del self._global_cooldowns[user_id]
-            return False
-        
-        return True
+        return await self._get_global_remaining(user_id) > 0
     
     async def _get_global_remaining(self, user_id: int) -> int:
         """Получить оставшееся время глобального кулдауна"""
-        if user_id not in self._global_cooldowns:
-            return 0
-        
-        remaining = (self._global_cooldowns[user_id] - datetime.utcnow()).total_seconds()
-        return max(0, int(remaining))
+        return await self.backend.get_remaining(user_id, GLOBAL_COMMAND) or 0
     
     # ============= РАБОТА С БД =============
     
     async def _check_db_cooldown(self, user_id: int, command: str) -> int:
-        """Проверка кулдауна в БД"""
+        """Проверка кулдауна в БД (чтение по первичному ключу), найденное попадает в кэш"""
         try:
             async with db.get_session() as session:
-                result = await session.execute(
-                    select(User).where(User.id == user_id)
-                )
-                user = result.scalar_one_or_none()
+                row = await session.get(Cooldown, (user_id, command))
                 
-                if not user or not hasattr(user, 'cooldown_expires_at'):
+                if not row or not row.expires_at or row.expires_at <= datetime.utcnow():
                     return 0
                 
-                if user.cooldown_expires_at and user.cooldown_expires_at > datetime.utcnow():
-                    remaining = int((user.cooldown_expires_at - datetime.utcnow()).total_seconds())
-                    return remaining
-                
-                return 0
+                self._cache.setdefault(user_id, {})[command] = self._row_to_cache(row)
+                self._schedule_expiry(row.expires_at, user_id, command)
+                return self._calculate_remaining(self._cache[user_id][command])
                 
         except Exception as e:
             logger.warning(f"DB cooldown check error: {e}")
             return 0
     
-    async def _save_to_db(self, user_id: int, command: str, expires_at: datetime, cooldown_type: CooldownType):
-        """Сохранить кулдаун в БД"""
+    def _save_to_db(self, user_id: int, command: str, expires_at: datetime, cooldown_type: CooldownType):
+        """Поставить кулдаун в очередь записи; повторные записи той же пары схлопываются"""
         if not db.session_maker:
             return
         
-        try:
-            async with db.get_session() as session:
-                result = await session.execute(
-                    select(User).where(User.id == user_id)
-                )
-                user = result.scalar_one_or_none()
-                
-                if user and hasattr(user, 'cooldown_expires_at'):
-                    user.cooldown_expires_at = expires_at
+        key = (user_id, command)
+        pending = self._pending.get(key)
+        
+        self._pending[key] = {
+            'user_id': user_id,
+            'command': command,
+            'expires_at': expires_at,
+            'type': CooldownType(cooldown_type).value,
+            'count': (pending['count'] if pending else 0) + 1
+        }
+        
+        # Очередь переполнена - сбрасываем не дожидаясь интервала
+        if self._cleanup_running and len(self._pending) >= self.max_pending:
+            if not self._flush_lock.locked() and not self._overflow_tasks:
+                task = asyncio.create_task(self.flush())
+                self._overflow_tasks.add(task)
+                task.add_done_callback(self._overflow_tasks.discard)
+    
+    def _upsert_statement(self, rows: list):
+        """INSERT ... ON CONFLICT (user_id, command) DO UPDATE, count накапливается"""
+        statement = dialect_insert(Cooldown).values(rows)
+        return statement.on_conflict_do_update(
+            index_elements=[Cooldown.user_id, Cooldown.command],
+            set_={
+                'expires_at': statement.excluded.expires_at,
+                'type': statement.excluded.type,
+                'count': Cooldown.count + statement.excluded.count
+            }
+        )
+    
+    async def flush(self) -> int:
+        """Записать накопленные кулдауны пакетными upsert'ами"""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            
+            pending, self._pending = self._pending, {}
+            rows = list(pending.values())
+            
+            try:
+                async with db.get_session() as session:
+                    for i in range(0, len(rows), UPSERT_CHUNK):
+                        await session.execute(self._upsert_statement(rows[i:i + UPSERT_CHUNK]))
                     await session.commit()
-                    logger.debug(f"Cooldown saved to DB for user {user_id}")
-                    
-        except Exception as e:
-            logger.warning(f"Could not save cooldown to DB: {e}")
+                
+                logger.debug(f"Flushed {len(rows)} cooldowns to DB")
+                return len(rows)
+                
+            except Exception as e:
+                # Возвращаем в очередь то, что не перезаписано новыми вызовами
+                for key, row in pending.items():
+                    newer = self._pending.get(key)
+                    if newer:
+                        newer['count'] += row['count']
+                    else:
+                        self._pending[key] = row
+                
+                logger.warning(f"Could not save cooldowns to DB: {e}")
+                return 0
     
     async def _reset_db_cooldown(self, user_id: int, command: Optional[str] = None):
         """Сбросить кулдаун в БД"""
@@ -314,58 +409,83 @@ class CooldownService:
             return
         
         try:
-            async with db.get_session() as session:
-                result = await session.execute(
-                    select(User).where(User.id == user_id)
-                )
-                user = result.scalar_one_or_none()
-                
-                if user and hasattr(user, 'cooldown_expires_at'):
-                    user.cooldown_expires_at = None
+            # Под блокировкой сброса: идущий flush не вернёт удалённую строку
+            async with self._flush_lock:
+                async with db.get_session() as session:
+                    query = delete(Cooldown).where(Cooldown.user_id == user_id)
+                    if command:
+                        query = query.where(Cooldown.command == command)
+                    
+                    await session.execute(query)
                     await session.commit()
                     logger.info(f"Reset cooldown in DB for user {user_id}")
                     
         except Exception as e:
             logger.warning(f"Could not reset cooldown in DB: {e}")
     
-    # ============= ЛОГИРОВАНИЕ И АНАЛИТИКА =============
-    
-    def _log_usage(self, user_id: int, command: str):
-        """Логировать использование команды"""
-        self._usage_log.append({
-            'user_id': user_id,
-            'command': command,
-            'timestamp': datetime.utcnow()
-        })
+    async def _delete_expired_from_db(self) -> int:
+        """Удалить истекшие строки из БД"""
+        if not db.session_maker:
+            return 0
         
-        # Ограничиваем размер лога
-        if len(self._usage_log) > 10000:
-            self._usage_log = self._usage_log[-5000:]
+        try:
+            async with db.get_session() as session:
+                result = await session.execute(
+                    delete(Cooldown).where(Cooldown.expires_at <= datetime.utcnow())
+                )
+                await session.commit()
+                return max(result.rowcount or 0, 0)
+                
+        except Exception as e:
+            logger.warning(f"Could not delete expired cooldowns from DB: {e}")
+            return 0
     
-    async def get_usage_stats(self, hours: int = 24) -> Dict[str, Any]:
-        """Получить статистику использования за последние N часов"""
-        cutoff = datetime.utcnow() - timedelta(hours=hours)
-        recent_logs = [log for log in self._usage_log if log['timestamp'] >= cutoff]
-        
-        # Группировка по командам
-        command_counts = {}
-        user_counts = {}
+    async def warm_cache(self) -> int:
+        """Загрузить активные кулдауны из БД в кэш (при старте)"""
+        if not db.session_maker:
+            return 0
         
-        for log in recent_logs:
-            cmd = log['command']
-            user = log['user_id']
+        try:
+            async with db.get_session() as session:
+                result = await session.execute(
+                    select(Cooldown).where(Cooldown.expires_at > datetime.utcnow())
+                )
+                rows = result.scalars().all()
+            
+            for row in rows:
+                self._cache.setdefault(row.user_id, {})[row.command] = self._row_to_cache(row)
+                self._schedule_expiry(row.expires_at, row.user_id, row.command)
             
-            command_counts[cmd] = command_counts.get(cmd, 0) + 1
-            user_counts[user] = user_counts.get(user, 0) + 1
+            logger.info(f"Loaded {len(rows)} active cooldowns from DB")
+            return len(rows)
+            
+        except Exception as e:
+            logger.warning(f"Could not load cooldowns from DB: {e}")
+            return 0
+    
+    def _row_to_cache(self, row: Cooldown) -> Dict[str, Any]:
+        try:
+            cooldown_type = CooldownType(row.type)
+        except ValueError:
+            cooldown_type = CooldownType.NORMAL
         
         return {
-            'total_uses': len(recent_logs),
-            'unique_users': len(user_counts),
-            'command_counts': command_counts,
-            'top_users': sorted(user_counts.items(), key=lambda x: x[1], reverse=True)[:10],
-            'hours': hours
+            'type': cooldown_type,
+            'expires_at': row.expires_at,
+            'set_at': None,
+            'count': row.count or 0
         }
     
+    # ============= ЛОГИРОВАНИЕ И АНАЛИТИКА =============
+    
+    def _log_usage(self, user_id: int, command: str):
+        """Логировать использование команды"""
+        self._usage_log.add(user_id, command)
+    
+    async def get_usage_stats(self, hours: int = 24) -> Dict[str, Any]:
+        """Получить статистику использования за последние N часов (до 7 дней)"""
+        return self._usage_log.stats(hours)
+    
     async def get_user_cooldown_info(self, user_id: int) -> Dict[str, Any]:
         """Получить информацию о всех кулдаунах пользователя"""
         info = {
@@ -375,17 +495,18 @@ class CooldownService:
         }
         
         # Глобальный кулдаун
-        if user_id in self._global_cooldowns:
-            remaining = await self._get_global_remaining(user_id)
-            if remaining > 0:
-                info['global_cooldown'] = {
-                    'remaining_seconds': remaining,
-                    'expires_at': self._global_cooldowns[user_id]
-                }
+        remaining = await self._get_global_remaining(user_id)
+        if remaining > 0:
+            info['global_cooldown'] = {
+                'remaining_seconds': remaining,
+                'expires_at': datetime.utcnow() + timedelta(seconds=remaining)
+            }
         
         # Кулдауны по командам
         if user_id in self._cache:
             for command, data in self._cache[user_id].items():
+                if command == GLOBAL_COMMAND:
+                    continue
                 remaining = self._calculate_remaining(data)
                 if remaining > 0:
                     info['cooldowns'].append({
@@ -401,27 +522,48 @@ class CooldownService:
     # ============= АВТООЧИСТКА =============
     
     async def start_cleanup_task(self):
-        """Запустить задачу автоматической очистки"""
+        """Загрузить кулдауны из БД и запустить задачи очистки и сброса в БД"""
         if self._cleanup_running:
             logger.warning("Cleanup task already running")
             return
         
+        if not self.backend.shared:
+            await self.warm_cache()
+        
         self._cleanup_running = True
         self._cleanup_task = asyncio.create_task(self._cleanup_loop())
-        logger.info("Cooldown cleanup task started")
+        self._flush_task = asyncio.create_task(self._flush_loop())
+        logger.info(f"Cooldown cleanup task started (DB flush every {self.flush_interval}s)")
     
     async def stop_cleanup_task(self):
-        """Остановить задачу автоочистки"""
+        """Остановить задачи и записать несохранённые кулдауны"""
         self._cleanup_running = False
         
-        if self._cleanup_task and not self._cleanup_task.done():
-            self._cleanup_task.cancel()
+        for task in (self._cleanup_task, self._flush_task):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        
+        if self._overflow_tasks:
+            await asyncio.gather(*self._overflow_tasks, return_exceptions=True)
+        
+        flushed = await self.flush()
+        await self.backend.close()
+        logger.info(f"Cooldown cleanup task stopped (final flush: {flushed} cooldowns)")
+    
+    async def _flush_loop(self):
+        """Цикл сброса очереди записи в БД"""
+        while self._cleanup_running:
             try:
-                await self._cleanup_task
+                await asyncio.sleep(self.flush_interval)
+                await self.flush()
             except asyncio.CancelledError:
-                pass
-        
-        logger.info("Cooldown cleanup task stopped")
+                break
+            except Exception as e:
+                logger.error(f"Error in cooldown flush loop: {e}")
     
     async def _cleanup_loop(self):
         """Цикл автоматической очистки истекших кулдаунов"""
@@ -439,33 +581,37 @@ class CooldownService:
                 logger.error(f"Error in cleanup loop: {e}")
                 await asyncio.sleep(60)
     
+    def _schedule_expiry(self, expires_at: datetime, user_id: int, command: str):
+        """Добавить срок в кучу (DAILY/WEEKLY - уже абсолютное время из _calculate_expiry)"""
+        heapq.heappush(self._expiry_heap, (expires_at, next(self._expiry_seq), user_id, command))
+    
     async def cleanup_expired(self) -> int:
-        """Очистить истекшие кулдауны"""
+        """Очистить истекшие кулдауны: из кучи извлекаются только наступившие сроки"""
         cleaned = 0
+        now = datetime.utcnow()
+        heap = self._expiry_heap
         
-        # Очистка кэша
-        for user_id in list(self._cache.keys()):
-            for command in list(self._cache[user_id].keys()):
-                data = self._cache[user_id][command]
-                if self._is_cooldown_expired(data, data['type']):
-                    del self._cache[user_id][command]
-                    cleaned += 1
+        while heap and heap[0][0] <= now:
+            expires_at, _, user_id, command = heapq.heappop(heap)
+            
+            commands = self._cache.get(user_id)
+            data = commands.get(command) if commands else None
+            
+            # Запись перезаписана или сброшена - срок устарел
+            if not data or data.get('expires_at') != expires_at:
+                continue
+            
+            del commands[command]
+            cleaned += 1
             
             # Удаляем пустые записи пользователей
-            if not self._cache[user_id]:
+            if not commands:
                 del self._cache[user_id]
         
-        # Очистка глобальных кулдаунов
-        for user_id in list(self._global_cooldowns.keys()):
-            if datetime.utcnow() >= self._global_cooldowns[user_id]:
-                del self._global_cooldowns[user_id]
-                cleaned += 1
+        # Лог использования не чистится: кольцевой буфер фиксированного размера
         
-        # Очистка старых логов (старше 7 дней)
-        cutoff = datetime.utcnow() - timedelta(days=7)
-        old_log_count = len(self._usage_log)
-        self._usage_log = [log for log in self._usage_log if log['timestamp'] >= cutoff]
-        cleaned += old_log_count - len(self._usage_log)
+        # Истекшие строки в БД
+        cleaned += await self._delete_expired_from_db()
         
         return cleaned
     
@@ -504,6 +650,7 @@ class CooldownService:
                 'set_at': datetime.utcnow(),
                 'count': 1
             }
+            self._schedule_expiry(expires_at, user_id, 'post')
     
     def get_remaining_time(self, user_id: int) -> int:
         """Legacy метод получения оставшегося времени"""
@@ -518,7 +665,7 @@ class CooldownService:
     def clear_cache(self):
         """Очистить весь кэш"""
         self._cache.clear()
-        self._global_cooldowns.clear()
+        self._expiry_heap.clear()
         logger.info("Cooldown cache cleared")
     
     def get_cache_size(self) -> int:
@@ -531,6 +678,8 @@ class CooldownService:
         
         for user_id, commands in self._cache.items():
             for command, data in commands.items():
+                if command == GLOBAL_COMMAND:
+                    continue
                 remaining = self._calculate_remaining(data)
                 if remaining > 0:
                     active.append({
@@ -546,4 +695,4 @@ class CooldownService:
 # Глобальный экземпляр сервиса
 cooldown_service = CooldownService()
 
-__all__ = ['CooldownService', 'CooldownType', 'cooldown_service']
+__all__ = ['CooldownService', 'CooldownType', 'cooldown_service', 'GLOBAL_COMMAND']
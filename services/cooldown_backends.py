@@ -0,0 +1,503 @@
+# -*- coding: utf-8 -*-
+"""
+Хранилища кулдаунов для CooldownService
+
+Выбор - Config.COOLDOWN_BACKEND:
+- memory   - словарь в процессе (по умолчанию). Переживает перезапуск за
+             счёт отложенной записи в таблицу cooldowns из CooldownService,
+             но у каждого воркера своя копия;
+- database - таблица cooldowns (PostgreSQL или SQLite) как единственный
+             источник правды, общий для всех воркеров;
+- redis    - Redis (или совместимый сервер) по REDIS_URL, ключ на пару
+             пользователь/команда с TTL до истечения.
+
+acquire - атомарная проверка с установкой: из нескольких воркеров,
+одновременно пытающихся занять один кулдаун, успевает ровно один. В
+database это INSERT ... ON CONFLICT DO UPDATE ... WHERE expires_at <= now,
+в redis - Lua-скрипт с SET NX PX.
+
+take_token - token bucket защиты от флуда в общих хранилищах (GCRA):
+корзина хранится одним сроком «когда снова полная» под командой
+flood:<вид> рядом с кулдаунами пользователя. Истёкший срок - полная
+корзина, поэтому строки и ключи чистятся так же, как кулдауны. Для
+memory корзины держит сам FloodControl.
+"""
+import asyncio
+import hashlib
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Any, List, Tuple
+from urllib.parse import urlparse
+from sqlalchemy import select, update, delete
+from config import Config
+from services.db import db, dialect_insert
+from models import Cooldown
+
+logger = logging.getLogger(__name__)
+
+# Команда, под которой хранится корзина защиты от флуда
+FLOOD_PREFIX = 'flood:'
+
+# Попыток compare-and-set корзины в database при конкурентных изменениях
+TOKEN_ATTEMPTS = 3
+
+
+def _remaining_seconds(expires_at: Optional[datetime], now: Optional[datetime] = None) -> int:
+    if not expires_at:
+        return 0
+    remaining = (expires_at - (now or datetime.utcnow())).total_seconds()
+    return max(0, int(remaining))
+
+
+class CooldownBackend(ABC):
+    """Интерфейс хранилища кулдаунов"""
+
+    # True - состояние общее для всех воркеров, локальный кэш только отражение
+    shared = False
+
+    @abstractmethod
+    async def acquire(self, user_id: int, command: str, expires_at: datetime, cooldown_type: str) -> int:
+        """Занять кулдаун, если он свободен: 0 - занят нами, иначе сколько секунд ждать"""
+
+    @abstractmethod
+    async def get_remaining(self, user_id: int, command: str) -> Optional[int]:
+        """Оставшиеся секунды; None - записи нет"""
+
+    @abstractmethod
+    async def set(self, user_id: int, command: str, expires_at: datetime, cooldown_type: str):
+        """Установить кулдаун безусловно"""
+
+    @abstractmethod
+    async def reset(self, user_id: int, command: Optional[str] = None):
+        """Сбросить кулдаун команды или все кулдауны пользователя"""
+
+    async def take_token(self, user_id: int, bucket: str, burst: float, rate: float) -> bool:
+        """Взять токен из корзины (burst токенов, rate в секунду); False - лимит исчерпан"""
+        raise NotImplementedError(f"{type(self).__name__} не хранит корзины защиты от флуда")
+
+    async def close(self):
+        pass
+
+
+def _token_interval(burst: float, rate: float) -> Tuple[timedelta, timedelta]:
+    """GCRA: время на один токен и ёмкость корзины во времени"""
+    interval = timedelta(seconds=1 / rate)
+    return interval, interval * burst
+
+
+# ============= ПАМЯТЬ =============
+
+class MemoryCooldownBackend(CooldownBackend):
+    """Словарь {user_id: {command: данные}} - тот же, что кэш CooldownService"""
+
+    def __init__(self, entries: Optional[Dict[int, Dict[str, Dict[str, Any]]]] = None):
+        self.entries = entries if entries is not None else {}
+
+    async def acquire(self, user_id: int, command: str, expires_at: datetime, cooldown_type: str) -> int:
+        # Без await между проверкой и записью - атомарно в рамках event loop
+        remaining = await self.get_remaining(user_id, command)
+        if remaining:
+            return remaining
+
+        await self.set(user_id, command, expires_at, cooldown_type)
+        return 0
+
+    async def get_remaining(self, user_id: int, command: str) -> Optional[int]:
+        data = self.entries.get(user_id, {}).get(command)
+        if data is None:
+            return None
+        return _remaining_seconds(data.get('expires_at'))
+
+    async def set(self, user_id: int, command: str, expires_at: datetime, cooldown_type: str):
+        commands = self.entries.setdefault(user_id, {})
+        commands[command] = {
+            'type': cooldown_type,
+            'expires_at': expires_at,
+            'set_at': datetime.utcnow(),
+            'count': commands.get(command, {}).get('count', 0) + 1
+        }
+
+    async def reset(self, user_id: int, command: Optional[str] = None):
+        if command:
+            self.entries.get(user_id, {}).pop(command, None)
+        else:
+            self.entries.pop(user_id, None)
+
+
+# ============= БАЗА ДАННЫХ =============
+
+class DatabaseCooldownBackend(CooldownBackend):
+    """Таблица cooldowns, чтение по первичному ключу (user_id, command)"""
+
+    shared = True
+
+    async def acquire(self, user_id: int, command: str, expires_at: datetime, cooldown_type: str) -> int:
+        now = datetime.utcnow()
+
+        statement = dialect_insert(Cooldown).values(
+            user_id=user_id,
+            command=command,
+            expires_at=expires_at,
+            type=cooldown_type,
+            count=1
+        )
+        # Существующая строка перезаписывается только если её кулдаун истёк
+        statement = statement.on_conflict_do_update(
+            index_elements=[Cooldown.user_id, Cooldown.command],
+            set_={
+                'expires_at': statement.excluded.expires_at,
+                'type': statement.excluded.type,
+                'count': Cooldown.count + 1
+            },
+            where=Cooldown.expires_at <= now
+        ).returning(Cooldown.count)
+
+        async with db.get_session() as session:
+            acquired = (await session.execute(statement)).first()
+            await session.commit()
+
+            if acquired:
+                return 0
+
+            current = await session.get(Cooldown, (user_id, command))
+            return max(1, _remaining_seconds(current.expires_at if current else None, now))
+
+    async def get_remaining(self, user_id: int, command: str) -> Optional[int]:
+        async with db.get_session() as session:
+            row = await session.get(Cooldown, (user_id, command))
+            return _remaining_seconds(row.expires_at) if row else None
+
+    async def set(self, user_id: int, command: str, expires_at: datetime, cooldown_type: str):
+        statement = dialect_insert(Cooldown).values(
+            user_id=user_id,
+            command=command,
+            expires_at=expires_at,
+            type=cooldown_type,
+            count=1
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[Cooldown.user_id, Cooldown.command],
+            set_={
+                'expires_at': statement.excluded.expires_at,
+                'type': statement.excluded.type,
+                'count': Cooldown.count + 1
+            }
+        )
+
+        async with db.get_session() as session:
+            await session.execute(statement)
+            await session.commit()
+
+    async def reset(self, user_id: int, command: Optional[str] = None):
+        query = delete(Cooldown).where(Cooldown.user_id == user_id)
+        if command:
+            query = query.where(Cooldown.command == command)
+
+        async with db.get_session() as session:
+            await session.execute(query)
+            await session.commit()
+
+    async def take_token(self, user_id: int, bucket: str, burst: float, rate: float) -> bool:
+        # expires_at - срок, когда корзина снова полная; запись - compare-and-set
+        # по прочитанному сроку (без арифметики дат в SQL, одинаково для обоих диалектов)
+        command = f"{FLOOD_PREFIX}{bucket}"
+        interval, capacity = _token_interval(burst, rate)
+
+        async with db.get_session() as session:
+            for _ in range(TOKEN_ATTEMPTS):
+                now = datetime.utcnow()
+                full_at = (await session.execute(
+                    select(Cooldown.expires_at).where(
+                        Cooldown.user_id == user_id,
+                        Cooldown.command == command
+                    )
+                )).scalar_one_or_none()
+
+                new_full_at = max(full_at or now, now) + interval
+                if new_full_at - now > capacity:
+                    await session.rollback()
+                    return False
+
+                if full_at is None:
+                    statement = dialect_insert(Cooldown).values(
+                        user_id=user_id,
+                        command=command,
+                        expires_at=new_full_at,
+                        type='flood',
+                        count=1
+                    ).on_conflict_do_nothing(index_elements=[Cooldown.user_id, Cooldown.command])
+                else:
+                    statement = (
+                        update(Cooldown)
+                        .where(
+                            Cooldown.user_id == user_id,
+                            Cooldown.command == command,
+                            Cooldown.expires_at == full_at
+                        )
+                        .values(expires_at=new_full_at, count=Cooldown.count + 1)
+                    )
+
+                result = await session.execute(statement)
+                await session.commit()
+
+                if result.rowcount == 1:
+                    return True
+
+            # Корзину всё время меняют параллельные обновления того же пользователя - это и есть флуд
+            logger.debug(f"Flood bucket {command} for user {user_id} is contended")
+            return False
+
+
+# ============= REDIS =============
+
+class RedisError(Exception):
+    """Ответ-ошибка сервера Redis"""
+
+
+class RedisClient:
+    """Минимальный клиент протокола RESP поверх asyncio (одно соединение)"""
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.timeout = timeout
+
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock = asyncio.Lock()
+
+    async def execute(self, *args):
+        """
+        Выполнить команду
+
+        Повтор на новом соединении - только если команда не ушла: не
+        удалось подключиться или записать. После отправки (таймаут, обрыв
+        при чтении ответа) команда могла выполниться - повторный EVAL занял
+        бы кулдаун или взял токен второй раз, поэтому соединение
+        закрывается (непрочитанный ответ сбил бы следующий) и ошибка
+        передаётся вызывающему.
+        """
+        async with self._lock:
+            for attempt in (1, 2):
+                try:
+                    if self._reader and self._reader.at_eof():
+                        # Сервер закрыл простаивающее соединение
+                        await self._disconnect()
+                    if not self._writer:
+                        await self._connect()
+                    self._writer.write(self._encode(args))
+                except (ConnectionError, asyncio.TimeoutError, OSError):
+                    await self._disconnect()
+                    if attempt == 2:
+                        raise
+                    continue
+
+                try:
+                    return await asyncio.wait_for(self._drain_and_read(), self.timeout)
+                except RedisError:
+                    raise
+                except BaseException:
+                    self._drop()
+                    raise
+
+    async def _connect(self):
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.timeout
+        )
+        if self.password:
+            await self._roundtrip(('AUTH', self.password))
+        if self.db:
+            await self._roundtrip(('SELECT', self.db))
+
+    async def _roundtrip(self, args):
+        self._writer.write(self._encode(args))
+        return await self._drain_and_read()
+
+    async def _drain_and_read(self):
+        await self._writer.drain()
+        return await self._read_reply()
+
+    @staticmethod
+    def _encode(args) -> bytes:
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        return b''.join(parts)
+
+    async def _read_reply(self):
+        line = await self._reader.readline()
+        if not line.endswith(b'\r\n'):
+            raise ConnectionError("Redis connection closed")
+
+        prefix, payload = line[:1], line[1:-2]
+
+        if prefix == b'+':
+            return payload.decode()
+        if prefix == b'-':
+            raise RedisError(payload.decode())
+        if prefix == b':':
+            return int(payload)
+        if prefix == b'$':
+            length = int(payload)
+            if length < 0:
+                return None
+            return (await self._reader.readexactly(length + 2))[:-2]
+        if prefix == b'*':
+            length = int(payload)
+            if length < 0:
+                return None
+            return [await self._read_reply() for _ in range(length)]
+
+        raise RedisError(f"Unexpected reply: {line!r}")
+
+    async def eval(self, script: str, keys: List[str], args: List[Any]):
+        """EVALSHA, при NOSCRIPT - EVAL (сервер закэширует скрипт)"""
+        sha = hashlib.sha1(script.encode()).hexdigest()
+        try:
+            return await self.execute('EVALSHA', sha, len(keys), *keys, *args)
+        except RedisError as e:
+            if not str(e).startswith('NOSCRIPT'):
+                raise
+            return await self.execute('EVAL', script, len(keys), *keys, *args)
+
+    def _drop(self):
+        """Закрыть соединение без ожидания (в том числе при отмене задачи)"""
+        if self._writer:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    async def _disconnect(self):
+        writer = self._writer
+        self._drop()
+        if writer:
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    async def close(self):
+        async with self._lock:
+            await self._disconnect()
+
+
+# Занять ключ, если свободен: 0 - занят, иначе оставшиеся миллисекунды
+ACQUIRE_SCRIPT = """
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return 0
+end
+local ttl = redis.call('PTTL', KEYS[1])
+if ttl < 1 then
+    ttl = 1
+end
+return ttl
+"""
+
+
+# GCRA: KEYS[1] хранит срок (мс), когда корзина снова полная; ARGV[1] -
+# время на токен, ARGV[2] - ёмкость корзины (мс). 1 - токен взят, 0 - нет.
+# Время - часы Redis (TIME), одни на всех воркеров
+TAKE_TOKEN_SCRIPT = """
+redis.replicate_commands()
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local full_at = tonumber(redis.call('GET', KEYS[1]) or now)
+if full_at < now then
+    full_at = now
+end
+full_at = full_at + tonumber(ARGV[1])
+if full_at - now > tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('SET', KEYS[1], string.format('%d', full_at), 'PX', full_at - now)
+return 1
+"""
+
+
+class RedisCooldownBackend(CooldownBackend):
+    """Ключ cooldown:<user_id>:<command> со значением-типом и TTL до истечения"""
+
+    shared = True
+
+    def __init__(self, url: str, prefix: str = 'cooldown:'):
+        self.client = RedisClient(url)
+        self.prefix = prefix
+
+    def _key(self, user_id: int, command: str) -> str:
+        return f"{self.prefix}{user_id}:{command}"
+
+    @staticmethod
+    def _ttl_ms(expires_at: datetime) -> int:
+        return max(1, int((expires_at - datetime.utcnow()).total_seconds() * 1000))
+
+    @staticmethod
+    def _ms_to_seconds(ms: int) -> int:
+        return -(-ms // 1000)
+
+    async def acquire(self, user_id: int, command: str, expires_at: datetime, cooldown_type: str) -> int:
+        remaining_ms = await self.client.eval(
+            ACQUIRE_SCRIPT,
+            [self._key(user_id, command)],
+            [cooldown_type, self._ttl_ms(expires_at)]
+        )
+        return self._ms_to_seconds(remaining_ms) if remaining_ms else 0
+
+    async def get_remaining(self, user_id: int, command: str) -> Optional[int]:
+        ttl = await self.client.execute('PTTL', self._key(user_id, command))
+        if ttl == -2:
+            return None
+        return self._ms_to_seconds(ttl) if ttl > 0 else 0
+
+    async def set(self, user_id: int, command: str, expires_at: datetime, cooldown_type: str):
+        await self.client.execute('SET', self._key(user_id, command), cooldown_type, 'PX', self._ttl_ms(expires_at))
+
+    async def reset(self, user_id: int, command: Optional[str] = None):
+        if command:
+            await self.client.execute('DEL', self._key(user_id, command))
+            return
+
+        cursor = b'0'
+        while True:
+            cursor, keys = await self.client.execute(
+                'SCAN', cursor, 'MATCH', f"{self.prefix}{user_id}:*", 'COUNT', 100
+            )
+            if keys:
+                await self.client.execute('DEL', *keys)
+            if cursor in (b'0', '0'):
+                break
+
+    async def take_token(self, user_id: int, bucket: str, burst: float, rate: float) -> bool:
+        interval, capacity = _token_interval(burst, rate)
+        taken = await self.client.eval(
+            TAKE_TOKEN_SCRIPT,
+            [self._key(user_id, f"{FLOOD_PREFIX}{bucket}")],
+            [max(1, int(interval.total_seconds() * 1000)), int(capacity.total_seconds() * 1000)]
+        )
+        return bool(taken)
+
+    async def close(self):
+        await self.client.close()
+
+
+# ============= ВЫБОР ХРАНИЛИЩА =============
+
+def create_backend(name: str, entries: Optional[Dict] = None) -> CooldownBackend:
+    """Хранилище по имени из Config.COOLDOWN_BACKEND"""
+    if name == 'database':
+        return DatabaseCooldownBackend()
+    if name == 'redis':
+        return RedisCooldownBackend(Config.REDIS_URL)
+    if name != 'memory':
+        logger.warning(f"Unknown cooldown backend '{name}', using memory")
+    return MemoryCooldownBackend(entries)
+
+
+__all__ = [
+    'CooldownBackend', 'MemoryCooldownBackend', 'DatabaseCooldownBackend',
+    'RedisCooldownBackend', 'RedisClient', 'RedisError', 'create_backend', 'FLOOD_PREFIX'
+]
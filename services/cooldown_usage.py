@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Журнал использования команд для CooldownService
+
+Два компактных хранилища фиксированного размера вместо списка словарей:
+- кольцевой буфер последних capacity вызовов (user_id, id команды, время)
+  в array - для уникальных пользователей и топа;
+- поминутные счётчики на каждую команду за 7 дней (кольцо из 10080
+  минут) - количество вызовов за любое окно до 7 дней считается по
+  корзинам, без просмотра отдельных записей.
+
+Память не растёт с трафиком: буфер перезаписывает старые записи, корзина
+чужой минуты обнуляется при первом попадании в неё.
+"""
+import time
+from array import array
+from typing import Dict, List, Any, Optional
+
+WINDOW_MINUTES = 7 * 24 * 60
+
+
+class CommandBuckets:
+    """Поминутные счётчики одной команды за WINDOW_MINUTES"""
+
+    __slots__ = ('counts', 'minutes')
+
+    def __init__(self):
+        self.counts = array('I', [0]) * WINDOW_MINUTES
+        # Номер минуты (от эпохи), к которой относится корзина; -1 - пустая
+        self.minutes = array('q', [-1]) * WINDOW_MINUTES
+
+    def add(self, minute: int):
+        slot = minute % WINDOW_MINUTES
+        if self.minutes[slot] != minute:
+            self.minutes[slot] = minute
+            self.counts[slot] = 0
+        self.counts[slot] += 1
+
+    def total(self, first_minute: int, last_minute: int) -> int:
+        """Сумма за минуты [first_minute, last_minute]"""
+        counts, minutes = self.counts, self.minutes
+        total = 0
+
+        for minute in range(first_minute, last_minute + 1):
+            slot = minute % WINDOW_MINUTES
+            if minutes[slot] == minute:
+                total += counts[slot]
+
+        return total
+
+
+class UsageLog:
+    """Кольцевой буфер вызовов и поминутные счётчики по командам"""
+
+    def __init__(self, capacity: int = 10000):
+        self.capacity = capacity
+
+        self._users = array('q', [0]) * capacity
+        self._commands = array('I', [0]) * capacity
+        self._times = array('d', [0.0]) * capacity
+        self._next = 0
+        self._size = 0
+
+        self._command_ids: Dict[str, int] = {}
+        self._command_names: List[str] = []
+        self._buckets: List[CommandBuckets] = []
+
+    def __len__(self) -> int:
+        return self._size
+
+    # ============= ЗАПИСЬ =============
+
+    def add(self, user_id: int, command: str, timestamp: Optional[float] = None):
+        """Учесть вызов команды"""
+        if timestamp is None:
+            timestamp = time.time()
+
+        command_id = self._command_ids.get(command)
+        if command_id is None:
+            command_id = len(self._command_names)
+            self._command_ids[command] = command_id
+            self._command_names.append(command)
+            self._buckets.append(CommandBuckets())
+
+        position = self._next
+        self._users[position] = user_id
+        self._commands[position] = command_id
+        self._times[position] = timestamp
+
+        self._next = (position + 1) % self.capacity
+        if self._size < self.capacity:
+            self._size += 1
+
+        self._buckets[command_id].add(int(timestamp // 60))
+
+    def clear(self):
+        """Очистить буфер и счётчики"""
+        self._next = 0
+        self._size = 0
+        self._command_ids.clear()
+        self._command_names.clear()
+        self._buckets.clear()
+
+    # ============= СТАТИСТИКА =============
+
+    def stats(self, hours: int = 24, now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Статистика за последние hours часов (не больше 7 дней)
+
+        command_counts и total_uses - точные, по поминутным корзинам.
+        unique_users и top_users - по кольцевому буферу: если он не
+        покрывает всё окно, users_complete = False.
+        """
+        if now is None:
+            now = time.time()
+
+        minutes = max(1, min(int(hours * 60), WINDOW_MINUTES))
+        last_minute = int(now // 60)
+        first_minute = last_minute - minutes + 1
+
+        command_counts = {}
+        for command_id, buckets in enumerate(self._buckets):
+            count = buckets.total(first_minute, last_minute)
+            if count:
+                command_counts[self._command_names[command_id]] = count
+
+        # Пользователи: от новых записей к старым, пока не вышли из окна
+        cutoff = first_minute * 60
+        user_counts = {}
+        users_complete = self._size < self.capacity
+
+        position = self._next
+        for _ in range(self._size):
+            position = (position - 1) % self.capacity
+            if self._times[position] < cutoff:
+                users_complete = True
+                break
+
+            user_id = self._users[position]
+            user_counts[user_id] = user_counts.get(user_id, 0) + 1
+
+        return {
+            'total_uses': sum(command_counts.values()),
+            'unique_users': len(user_counts),
+            'command_counts': command_counts,
+            'top_users': sorted(user_counts.items(), key=lambda x: x[1], reverse=True)[:10],
+            'users_complete': users_complete,
+            'hours': hours
+        }
+
+
+__all__ = ['UsageLog', 'CommandBuckets', 'WINDOW_MINUTES']
@@ -2,6 +2,8 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from datetime import datetime
 from config import Config
 from contextlib import asynccontextmanager
@@ -223,7 +225,11 @@ class Database:
             await self.engine.dispose()
             logger.info("Database connection closed")
 
+def dialect_insert(table):
+    """INSERT с поддержкой ON CONFLICT для диалекта рабочей БД"""
+    return pg_insert(table) if 'postgres' in Config.DATABASE_URL else sqlite_insert(table)
+
 # Глобальный экземпляр базы данных
 db = Database()
 
-__all__ = ['db', 'Publication', 'PiarRequest', 'Base']
+__all__ = ['db', 'dialect_insert', 'Publication', 'PiarRequest', 'Base']
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+Защита от флуда: token bucket на пользователя
+
+Обработчик регистрируется TypeHandler'ом в группе -1 и видит каждое
+обновление раньше остальных обработчиков. У пользователя три корзины -
+callback-кнопки, команды и обычные сообщения; каждая вмещает burst
+токенов и пополняется со скоростью rate в секунду. Нет токена -
+обновление останавливается (ApplicationHandlerStop) и до
+handle_all_callbacks / handle_messages и БД не доходит.
+
+Сверх лимита: на callback отвечаем коротким уведомлением (кнопка не
+«висит»), в личке раз в warn_interval пишем предупреждение. Сообщения и
+команды в группах не ограничиваются: ApplicationHandlerStop в группе -1
+остановил бы и модерацию, фильтр слов, бан/мут - флудер в группе
+обходил бы их. Модераторы не ограничиваются.
+
+Корзины живут там же, где кулдауны (Config.COOLDOWN_BACKEND): при
+memory - __slots__-объект с тремя числами и временем в процессе,
+простаивающие дольше idle_ttl (у них корзины уже полные) вытесняются;
+при database/redis - CooldownBackend.take_token, лимит общий для всех
+воркеров. Если общее хранилище недоступно, обновление пропускается.
+"""
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Any, Tuple
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+from config import Config
+from services.cooldown import cooldown_service
+from services.cooldown_backends import CooldownBackend
+
+logger = logging.getLogger(__name__)
+
+CALLBACK = 0
+COMMAND = 1
+MESSAGE = 2
+
+KIND_NAMES = ('callback', 'command', 'message')
+
+
+class UserBuckets:
+    """Токены пользователя по трём видам обновлений"""
+
+    __slots__ = ('tokens', 'updated', 'warned_at')
+
+    def __init__(self, bursts: Tuple[float, float, float], now: float):
+        self.tokens = list(bursts)
+        self.updated = now
+        self.warned_at = 0.0
+
+
+class FloodControl:
+    """Token bucket на пользователя с вытеснением неактивных"""
+
+    def __init__(
+        self,
+        limits: Optional[Dict[int, Tuple[float, float]]] = None,
+        idle_ttl: int = 600,
+        max_users: int = 50000,
+        warn_interval: int = 30,
+        backend: Optional[CooldownBackend] = None
+    ):
+        limits = limits or {
+            CALLBACK: (Config.FLOOD_CALLBACK_BURST, Config.FLOOD_CALLBACK_RATE),
+            COMMAND: (Config.FLOOD_COMMAND_BURST, Config.FLOOD_COMMAND_RATE),
+            MESSAGE: (Config.FLOOD_MESSAGE_BURST, Config.FLOOD_MESSAGE_RATE),
+        }
+        self.bursts = tuple(float(limits[kind][0]) for kind in (CALLBACK, COMMAND, MESSAGE))
+        self.rates = tuple(float(limits[kind][1]) for kind in (CALLBACK, COMMAND, MESSAGE))
+        self.idle_ttl = idle_ttl
+        self.max_users = max_users
+        self.warn_interval = warn_interval
+        # None - хранилище cooldown_service (выбирается при его создании)
+        self._backend = backend
+
+        # Порядок - по последней активности, в начале самые давние
+        self._users: OrderedDict = OrderedDict()
+
+        self.allowed = [0, 0, 0]
+        self.throttled = [0, 0, 0]
+        self.evicted = 0
+
+    @property
+    def backend(self) -> CooldownBackend:
+        return self._backend or cooldown_service.backend
+
+    # ============= TOKEN BUCKET =============
+
+    def consume(self, user_id: int, kind: int, now: Optional[float] = None) -> bool:
+        """Взять токен из корзины в процессе; False - лимит исчерпан"""
+        if now is None:
+            now = time.monotonic()
+
+        state = self._touch(user_id, now)
+
+        elapsed = now - state.updated
+        if elapsed > 0:
+            tokens = state.tokens
+            for i in (CALLBACK, COMMAND, MESSAGE):
+                tokens[i] = min(self.bursts[i], tokens[i] + elapsed * self.rates[i])
+            state.updated = now
+
+        self._evict(now)
+
+        if state.tokens[kind] < 1:
+            return self._count(kind, False)
+
+        state.tokens[kind] -= 1
+        return self._count(kind, True)
+
+    async def consume_shared(self, user_id: int, kind: int) -> bool:
+        """Взять токен из корзины в общем хранилище; False - лимит исчерпан"""
+        # Локальная запись нужна только для предупреждений и вытеснения
+        now = time.monotonic()
+        self._touch(user_id, now).updated = now
+        self._evict(now)
+
+        try:
+            taken = await self.backend.take_token(
+                user_id, KIND_NAMES[kind], self.bursts[kind], self.rates[kind]
+            )
+        except Exception as e:
+            logger.warning(f"Flood bucket unavailable for user {user_id}: {e}")
+            taken = True
+
+        return self._count(kind, taken)
+
+    def _touch(self, user_id: int, now: float) -> UserBuckets:
+        """Запись пользователя (новая - с полными корзинами), в конец очереди вытеснения"""
+        state = self._users.get(user_id)
+        if state is None:
+            state = UserBuckets(self.bursts, now)
+            self._users[user_id] = state
+        else:
+            self._users.move_to_end(user_id)
+        return state
+
+    def _count(self, kind: int, allowed: bool) -> bool:
+        if allowed:
+            self.allowed[kind] += 1
+        else:
+            self.throttled[kind] += 1
+        return allowed
+
+    def _evict(self, now: float):
+        """Убрать неактивных (и самых давних сверх max_users)"""
+        users = self._users
+        while users:
+            user_id, state = next(iter(users.items()))
+            if now - state.updated < self.idle_ttl and len(users) <= self.max_users:
+                break
+            del users[user_id]
+            self.evicted += 1
+
+    # ============= ОБРАБОТЧИК ОБНОВЛЕНИЙ =============
+
+    @staticmethod
+    def classify(update: Update) -> Optional[int]:
+        """Вид обновления или None, если не ограничиваем (всё, кроме callback и лички)"""
+        if update.callback_query:
+            return CALLBACK
+
+        message = update.message
+        if not message or message.chat.type != 'private':
+            return None
+
+        text = message.text or ''
+        return COMMAND if text.startswith('/') else MESSAGE
+
+    async def handle_update(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """TypeHandler(Update) в группе -1: пропустить или остановить обновление"""
+        user = update.effective_user
+        if not user or Config.is_moderator(user.id):
+            return
+
+        kind = self.classify(update)
+        if kind is None:
+            return
+
+        if self.backend.shared:
+            allowed = await self.consume_shared(user.id, kind)
+        else:
+            allowed = self.consume(user.id, kind)
+
+        if allowed:
+            return
+
+        try:
+            await self._notify(update, kind, user.id)
+        except Exception as e:
+            logger.debug(f"Flood notice failed for user {user.id}: {e}")
+
+        raise ApplicationHandlerStop
+
+    async def _notify(self, update: Update, kind: int, user_id: int):
+        if kind == CALLBACK:
+            await update.callback_query.answer("⏳ Слишком часто, подождите")
+            return
+
+        state = self._users.get(user_id)
+        now = time.monotonic()
+        if state and now - state.warned_at >= self.warn_interval:
+            state.warned_at = now
+            await update.message.reply_text("⏳ Слишком много сообщений, подождите немного")
+
+    # ============= СТАТИСТИКА =============
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Счётчики пропущенных и отброшенных обновлений с момента запуска"""
+        return {
+            'users': len(self._users),
+            'evicted': self.evicted,
+            'allowed': dict(zip(KIND_NAMES, self.allowed)),
+            'throttled': dict(zip(KIND_NAMES, self.throttled)),
+            'throttled_total': sum(self.throttled)
+        }
+
+
+# ============= ГЛОБАЛЬНЫЙ ЭКЗЕМПЛЯР =============
+
+flood_control = FloodControl()
+
+__all__ = ['flood_control', 'FloodControl']
@@ -0,0 +1,115 @@
+import sys
+from array import array
+from typing import Iterable, List
+
+# Порядок ленты: id фиксированной ширины (uint32, little-endian) - срез
+# страницы читается по смещению без распаковки всего списка
+ORDER_ITEM_SIZE = 4
+ORDER_TYPECODE = 'I' if array('I').itemsize == ORDER_ITEM_SIZE else 'L'
+
+# Разделитель сегментов append_ids: нулевой байт pack_ids не выдаёт
+# (дельты >= 1, старший байт многобайтного varint ненулевой)
+SEGMENT_SEPARATOR = b'\x00'
+
+
+def pack_ids(ids: Iterable[int]) -> bytes:
+    """Упаковать набор положительных id: сортировка + дельты в varint (LEB128)"""
+    result = bytearray()
+    append = result.append
+    previous = 0
+
+    for value in sorted(set(ids)):
+        delta = value - previous
+        previous = value
+
+        # Частый случай - дельта в один байт
+        if delta < 0x80:
+            append(delta)
+            continue
+
+        while delta >= 0x80:
+            append((delta & 0x7F) | 0x80)
+            delta >>= 7
+        append(delta)
+
+    return bytes(result)
+
+
+def append_ids(data: bytes, ids: Iterable[int]) -> bytes:
+    """Дописать id отдельным сегментом - уже упакованные не распаковываются"""
+    segment = pack_ids(ids)
+    if not data:
+        return segment
+    if not segment:
+        return data
+    return data + SEGMENT_SEPARATOR + segment
+
+
+def segment_count(data: bytes) -> int:
+    """Число сегментов (1 - данные плотно упакованы pack_ids)"""
+    return data.count(SEGMENT_SEPARATOR) + 1 if data else 0
+
+
+def unpack_ids(data: bytes) -> List[int]:
+    """Распаковать id, упакованные pack_ids / append_ids
+
+    Внутри сегмента id идут по возрастанию; разные сегменты могут
+    повторять id друг друга
+    """
+    ids = []
+    if not data:
+        return ids
+
+    append = ids.append
+    previous = 0
+    delta = 0
+    shift = 0
+
+    for byte in data:
+        # Частый случай - дельта в один байт
+        if byte < 0x80 and not shift:
+            if not byte:
+                # Начало следующего сегмента
+                previous = 0
+                continue
+            previous += byte
+            append(previous)
+            continue
+
+        delta |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+
+        previous += delta
+        append(previous)
+        delta = 0
+        shift = 0
+
+    return ids
+
+
+def pack_order(ids: Iterable[int]) -> bytes:
+    """Упаковать упорядоченный список id (порядок сохраняется)"""
+    packed = array(ORDER_TYPECODE, ids)
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def order_length(data: bytes) -> int:
+    """Число id в упакованном порядке"""
+    return len(data or b'') // ORDER_ITEM_SIZE
+
+
+def order_slice(data: bytes, start: int, count: int) -> List[int]:
+    """id с позиции start (не больше count) - распаковывается только срез"""
+    if not data or count <= 0:
+        return []
+
+    start = max(0, start)
+    chunk = array(ORDER_TYPECODE)
+    chunk.frombytes(data[start * ORDER_ITEM_SIZE:(start + count) * ORDER_ITEM_SIZE])
+    if sys.byteorder == 'big':
+        chunk.byteswap()
+    return chunk.tolist()